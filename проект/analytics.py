@@ -0,0 +1,257 @@
+"""
+Аналитические отчеты по снимкам базы данных
+
+Таблицы периодически выгружаются в колоночные снимки (Parquet, если установлен
+pyarrow), а отчеты считаются векторными операциями pandas по снимку, не нагружая
+рабочую базу. Снимок включает архив выполненных заявок.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import archive
+from models import RequestStatus, UserRole
+
+# Каталог снимков (по умолчанию snapshots рядом с основной базой) и период их обновления (секунды)
+SNAPSHOT_DIR = os.environ.get('REPAIR_SNAPSHOT_DIR')
+SNAPSHOT_INTERVAL = int(os.environ.get('REPAIR_SNAPSHOT_INTERVAL', 600))
+# Обновление снимков с запуска сервера только при явно заданном периоде; иначе - с первого отчета
+# (pandas и pyarrow не загружаются при запуске воркеров API)
+SNAPSHOT_ON_STARTUP = 'REPAIR_SNAPSHOT_INTERVAL' in os.environ
+
+COMPLETED_STATUS = RequestStatus.READY.value
+
+# Снимаемые таблицы: имя -> SQL (заявки и комментарии вместе с архивом)
+SNAPSHOT_QUERIES = {
+    'requests': f"SELECT {archive.REQUEST_COLUMNS} FROM {archive.union_source('requests')}",
+    'comments': f"SELECT {archive.COMMENT_COLUMNS} FROM {archive.union_source('comments')}",
+    'users': "SELECT user_id, fio, type FROM users",
+}
+
+
+def snapshot_dir(db_name: str) -> str:
+    """Каталог снимков (рядом с основной базой, если не задан REPAIR_SNAPSHOT_DIR)"""
+    return SNAPSHOT_DIR or os.path.join(os.path.dirname(os.path.abspath(db_name)), 'snapshots')
+
+
+def parquet_available() -> bool:
+    """Установлен ли pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def read_tables(db_name: str) -> Dict:
+    """Чтение таблиц в DataFrame с приведением типов"""
+    import pandas as pd
+
+    with archive.connect_with_archive(db_name) as conn:
+        frames = {name: pd.read_sql_query(query, conn) for name, query in SNAPSHOT_QUERIES.items()}
+
+    requests = frames['requests']
+    for column in ('start_date', 'completion_date'):
+        requests[column] = pd.to_datetime(requests[column], errors='coerce')
+    requests['master_id'] = requests['master_id'].astype('Int64')
+    requests['request_status'] = requests['request_status'].astype('category')
+    requests['home_tech_type'] = requests['home_tech_type'].astype('category')
+    frames['comments']['created_at'] = pd.to_datetime(frames['comments']['created_at'], errors='coerce')
+    return frames
+
+
+def write_snapshot(frames: Dict, folder: str):
+    """Запись снимка в Parquet (файлы заменяются атомарно)"""
+    os.makedirs(folder, exist_ok=True)
+    for name, frame in frames.items():
+        # Свой временный файл у каждой записи: каталог общий для всех воркеров uvicorn
+        with tempfile.NamedTemporaryFile(dir=folder, prefix=f"{name}.", suffix='.parquet.tmp', delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, os.path.join(folder, f"{name}.parquet"))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def read_snapshot(folder: str) -> Optional[Dict]:
+    """Чтение последнего снимка с диска (None, если его нет)"""
+    import pandas as pd
+
+    paths = {name: os.path.join(folder, f"{name}.parquet") for name in SNAPSHOT_QUERIES}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    return {name: pd.read_parquet(path) for name, path in paths.items()}
+
+
+def _records(frame) -> List[Dict]:
+    """Строки отчета для JSON (NaN -> None, даты -> строки)"""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict(orient='records')
+
+
+class ReportEngine:
+    """Снимок данных в памяти и отчеты по нему"""
+
+    def __init__(self, db_name: str, folder: Optional[str] = None, interval: int = SNAPSHOT_INTERVAL):
+        self.db_name = db_name
+        self.folder = folder or snapshot_dir(db_name)
+        self.interval = interval
+        self.frames = None
+        self.snapshot_at = None
+        # Одно обновление снимка за раз: остальные вызовы ждут его, а не запускают свое
+        self._refresh_lock = threading.Lock()
+        self._refresh_started: Optional[float] = None
+        self._thread_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self) -> datetime:
+        """Новый снимок из базы"""
+        requested = time.monotonic()
+        with self._refresh_lock:
+            # Пока вызов ждал, снимок обновил другой, начатый позже запроса, - он уже достаточно свежий
+            if self._refresh_started is not None and self._refresh_started >= requested:
+                return self.snapshot_at
+            self._refresh_started = time.monotonic()
+            frames = read_tables(self.db_name)
+            if parquet_available():
+                write_snapshot(frames, self.folder)
+            self.frames = frames
+            self.snapshot_at = datetime.now().replace(microsecond=0)
+            return self.snapshot_at
+
+    def get_frames(self) -> Dict:
+        """Текущий снимок (при первом обращении - с диска или из базы)"""
+        self.start()
+        if self.frames is None:
+            # Ожидание идущего обновления вместо запуска еще одного
+            with self._refresh_lock:
+                if self.frames is None and parquet_available():
+                    frames = read_snapshot(self.folder)
+                    if frames is not None:
+                        self.frames = frames
+                        self.snapshot_at = datetime.fromtimestamp(
+                            os.path.getmtime(os.path.join(self.folder, 'requests.parquet'))
+                        ).replace(microsecond=0)
+            if self.frames is None:
+                self.refresh()
+        return self.frames
+
+    def start(self):
+        """Периодическое обновление снимка в фоновом потоке"""
+        with self._thread_lock:
+            if self._thread is None and self.interval > 0:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="analytics-snapshot", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"✗ Ошибка при обновлении аналитического снимка: {e}")
+            if self._stop.wait(max(self.interval - (time.monotonic() - started), 1)):
+                break
+
+    def _requests(self, date_from=None, date_to=None):
+        """Заявки снимка за период (по дате поступления) с длительностью ремонта"""
+        import pandas as pd
+
+        requests = self.get_frames()['requests']
+        mask = pd.Series(True, index=requests.index)
+        if date_from:
+            mask &= requests['start_date'] >= pd.Timestamp(date_from)
+        if date_to:
+            mask &= requests['start_date'] < pd.Timestamp(date_to) + pd.Timedelta(days=1)
+        requests = requests[mask]
+        return requests.assign(
+            completed=requests['request_status'] == COMPLETED_STATUS,
+            repair_days=(requests['completion_date'] - requests['start_date']).dt.days,
+        )
+
+    def report_masters(self, date_from=None, date_to=None) -> List[Dict]:
+        """Нагрузка и результаты по мастерам"""
+        frames = self.get_frames()
+        requests = self._requests(date_from, date_to)
+        masters = frames['users'].loc[frames['users']['type'] == UserRole.MASTER.value, ['user_id', 'fio']]
+
+        by_master = requests.dropna(subset=['master_id']).groupby('master_id').agg(
+            total_requests=('request_id', 'size'),
+            completed_requests=('completed', 'sum'),
+            average_repair_days=('repair_days', 'mean'),
+        )
+        comments = frames['comments'].groupby('master_id').size().rename('comments')
+
+        report = (masters.set_index('user_id')
+                  .join(by_master, how='left')
+                  .join(comments, how='left')
+                  .fillna({'total_requests': 0, 'completed_requests': 0, 'comments': 0}))
+        report = report.astype({'total_requests': int, 'completed_requests': int, 'comments': int})
+        report['average_repair_days'] = report['average_repair_days'].round(2)
+        report = report.rename_axis('master_id').reset_index()
+        return _records(report.sort_values(['total_requests', 'fio'], ascending=[False, True]))
+
+    def report_tech_types(self, date_from=None, date_to=None) -> List[Dict]:
+        """Заявки по типам техники"""
+        requests = self._requests(date_from, date_to)
+        report = requests.groupby('home_tech_type', observed=True).agg(
+            total_requests=('request_id', 'size'),
+            completed_requests=('completed', 'sum'),
+            average_repair_days=('repair_days', 'mean'),
+        )
+        report['average_repair_days'] = report['average_repair_days'].round(2)
+        report = report.reset_index().sort_values('total_requests', ascending=False)
+        report['home_tech_type'] = report['home_tech_type'].astype(str)
+        return _records(report)
+
+    def report_monthly(self, date_from=None, date_to=None) -> List[Dict]:
+        """Поступившие и выполненные заявки по месяцам"""
+        import pandas as pd
+
+        requests = self._requests(date_from, date_to)
+        created = requests.groupby(requests['start_date'].dt.to_period('M')).agg(
+            created_requests=('request_id', 'size'),
+            average_repair_days=('repair_days', 'mean'),
+        )
+        done = requests[requests['completed'] & requests['completion_date'].notna()]
+        completed = done.groupby(done['completion_date'].dt.to_period('M')).size().rename('completed_requests')
+
+        report = pd.concat([created, completed], axis=1).fillna(
+            {'created_requests': 0, 'completed_requests': 0}
+        ).sort_index()
+        report = report.astype({'created_requests': int, 'completed_requests': int})
+        report['average_repair_days'] = report['average_repair_days'].round(2)
+        report.index = report.index.astype(str)
+        return _records(report.rename_axis('month').reset_index())
+
+    def report_statuses(self, date_from=None, date_to=None) -> List[Dict]:
+        """Сводная таблица: тип техники x статус"""
+        requests = self._requests(date_from, date_to)
+        report = requests.pivot_table(index='home_tech_type', columns='request_status',
+                                      values='request_id', aggfunc='size', fill_value=0, observed=True)
+        report.columns = report.columns.astype(str)
+        report.index = report.index.astype(str)
+        return _records(report.rename_axis(columns=None).reset_index())
+
+
+REPORTS = {
+    'masters': ReportEngine.report_masters,
+    'tech-types': ReportEngine.report_tech_types,
+    'monthly': ReportEngine.report_monthly,
+    'statuses': ReportEngine.report_statuses,
+}
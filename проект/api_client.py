@@ -0,0 +1,85 @@
+"""
+HTTP-клиент фронтенда: общий пул соединений с API, таймауты, ограниченные
+повторы и параллельное выполнение нескольких запросов
+"""
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+from instrumentation import HTTP, JSON, span
+
+API_URL = os.environ.get('REPAIR_API_URL', "http://localhost:8000")
+
+# Соединений к API в пуле (keep-alive; общий для всех сессий Streamlit в процессе)
+HTTP_POOL_SIZE = int(os.environ.get('REPAIR_HTTP_POOL_SIZE', 16))
+# Таймауты: установка соединения и ожидание ответа (секунды)
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('REPAIR_HTTP_CONNECT_TIMEOUT', 3))
+HTTP_READ_TIMEOUT = float(os.environ.get('REPAIR_HTTP_READ_TIMEOUT', 30))
+# Повторы при сбое соединения и ответах 502/503/504 (пауза растет: 0.3, 0.6, 1.2 с)
+HTTP_RETRIES = int(os.environ.get('REPAIR_HTTP_RETRIES', 3))
+HTTP_BACKOFF = float(os.environ.get('REPAIR_HTTP_BACKOFF', 0.3))
+# Потоков для параллельных запросов
+PARALLEL_REQUESTS = int(os.environ.get('REPAIR_PARALLEL_REQUESTS', 8))
+
+
+def _build_adapter() -> HTTPAdapter:
+    # Повторяются только идемпотентные методы (POST не повторяется, чтобы не создать запись дважды)
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    return HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+
+
+# Модуль импортируется один раз на процесс, поэтому пул и потоки переживают перезапуски скрипта
+_adapter = _build_adapter()
+_executor = ThreadPoolExecutor(max_workers=PARALLEL_REQUESTS, thread_name_prefix="api-fetch")
+
+
+class TimedResponse(requests.Response):
+    """Ответ, разбор JSON которого попадает в замеры"""
+
+    def json(self, **kwargs):
+        with span(JSON, self.request.path_url.split('?')[0]):
+            return super().json(**kwargs)
+
+
+class ApiSession(requests.Session):
+    """Сессия с общим пулом соединений и таймаутами по умолчанию"""
+
+    def __init__(self):
+        super().__init__()
+        self.mount('http://', _adapter)
+        self.mount('https://', _adapter)
+        # Сжатые ответы: объявляем только кодировки, которые urllib3 умеет распаковать
+        self.headers['Accept-Encoding'] = make_headers(accept_encoding=True)['accept-encoding']
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        with span(HTTP, f"{method} {url.replace(API_URL, '', 1)}"):
+            response = super().request(method, url, **kwargs)
+        response.__class__ = TimedResponse
+        return response
+
+    def close(self):
+        # Пул общий для всех сессий и не закрывается вместе с одной из них
+        pass
+
+
+def gather(calls: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+    """Параллельное выполнение вызовов API: время - как у самого долгого, а не сумма
+
+    calls: имя -> функция без аргументов. Исключение вызова передается вызывающему.
+    """
+    # Каждый вызов - в копии контекста, чтобы замеры попали в профиль текущего перезапуска
+    futures = {name: _executor.submit(contextvars.copy_context().run, call) for name, call in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
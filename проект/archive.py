@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Архив выполненных заявок: перенос старых закрытых заявок и их комментариев
+в отдельную базу, подключаемую через ATTACH
+
+Запуск: python archive.py [дней_после_завершения]
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from models import RequestStatus
+
+# Статус, после которого заявка может уйти в архив
+ARCHIVE_STATUS = RequestStatus.READY.value
+# Через сколько дней после завершения заявка переносится в архив
+ARCHIVE_AFTER_DAYS = int(os.environ.get('REPAIR_ARCHIVE_AFTER_DAYS', 180))
+# Имя схемы архива в соединении
+ARCHIVE_SCHEMA = 'archive'
+
+# Колонки таблиц (одинаковые в основной базе и в архиве)
+REQUEST_COLUMNS = ('request_id, start_date, home_tech_type, home_tech_model, problem_description, '
+                   'request_status, completion_date, repair_parts, master_id, client_id')
+COMMENT_COLUMNS = 'comment_id, message, master_id, request_id, created_at'
+
+
+def archive_path(db_name: str) -> str:
+    """Путь к файлу архива (рядом с основной базой, если не задан REPAIR_ARCHIVE_DB)"""
+    path = os.environ.get('REPAIR_ARCHIVE_DB')
+    if path:
+        return path
+    root, ext = os.path.splitext(db_name)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def attach_archive(conn: sqlite3.Connection, db_name: str):
+    """Подключение архива к соединению (таблицы создаются при первом подключении)"""
+    conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path(db_name),))
+    # Связи с users не объявляются: внешние ключи между базами SQLite не поддерживает
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.requests (
+            request_id INTEGER PRIMARY KEY,
+            start_date DATE NOT NULL,
+            home_tech_type TEXT NOT NULL,
+            home_tech_model TEXT NOT NULL,
+            problem_description TEXT NOT NULL,
+            request_status TEXT NOT NULL,
+            completion_date DATE,
+            repair_parts TEXT,
+            master_id INTEGER,
+            client_id INTEGER NOT NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.comments (
+            comment_id INTEGER PRIMARY KEY,
+            message TEXT NOT NULL,
+            master_id INTEGER NOT NULL,
+            request_id INTEGER NOT NULL,
+            created_at TIMESTAMP
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_requests_client ON requests(client_id)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_requests_master ON requests(master_id)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_comments_timeline '
+                 f'ON comments(request_id, created_at, comment_id)')
+
+
+def union_source(table: str) -> str:
+    """Подзапрос, объединяющий таблицу основной базы с архивной (requests или comments)"""
+    if table == 'requests':
+        # Срок (deadline) нужен только открытым заявкам - в архиве его нет
+        return (f"(SELECT {REQUEST_COLUMNS}, deadline FROM main.requests "
+                f"UNION ALL SELECT {REQUEST_COLUMNS}, NULL AS deadline FROM {ARCHIVE_SCHEMA}.requests)")
+    return (f"(SELECT {COMMENT_COLUMNS} FROM main.{table} "
+            f"UNION ALL SELECT {COMMENT_COLUMNS} FROM {ARCHIVE_SCHEMA}.{table})")
+
+
+def connect_with_archive(db_name: str) -> sqlite3.Connection:
+    """Соединение с основной базой и подключенным архивом"""
+    conn = sqlite3.connect(db_name)
+    attach_archive(conn, db_name)
+    return conn
+
+
+def archive_completed(cursor: sqlite3.Cursor, before_date: str) -> Dict[str, int]:
+    """Перенос заявок, завершенных раньше before_date, вместе с комментариями
+
+    Выполняется внутри транзакции потока записи. Сначала строки копируются
+    в архив (INSERT OR REPLACE - повторный перенос безопасен), затем удаляются
+    из основной базы.
+    """
+    cursor.execute("DROP TABLE IF EXISTS temp.archive_ids")
+    cursor.execute('''
+        CREATE TEMP TABLE archive_ids AS
+        SELECT request_id FROM main.requests
+        WHERE request_status = ? AND completion_date IS NOT NULL AND completion_date < ?
+    ''', (ARCHIVE_STATUS, before_date))
+    try:
+        return _move(cursor, 'main', ARCHIVE_SCHEMA)
+    finally:
+        cursor.execute("DROP TABLE temp.archive_ids")
+
+
+def restore_request(cursor: sqlite3.Cursor, request_id: int) -> bool:
+    """Возврат заявки и ее комментариев из архива в основную базу"""
+    cursor.execute("DROP TABLE IF EXISTS temp.archive_ids")
+    cursor.execute(f"CREATE TEMP TABLE archive_ids AS SELECT request_id FROM {ARCHIVE_SCHEMA}.requests WHERE request_id = ?",
+                   (request_id,))
+    try:
+        return _move(cursor, ARCHIVE_SCHEMA, 'main')['requests'] > 0
+    finally:
+        cursor.execute("DROP TABLE temp.archive_ids")
+
+
+def _move(cursor: sqlite3.Cursor, source: str, target: str) -> Dict[str, int]:
+    """Перенос заявок из temp.archive_ids и их комментариев между схемами"""
+    selected = "request_id IN (SELECT request_id FROM temp.archive_ids)"
+
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO {target}.requests ({REQUEST_COLUMNS})
+        SELECT {REQUEST_COLUMNS} FROM {source}.requests WHERE {selected}
+    ''')
+    moved_requests = cursor.rowcount
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO {target}.comments ({COMMENT_COLUMNS})
+        SELECT {COMMENT_COLUMNS} FROM {source}.comments WHERE {selected}
+    ''')
+    moved_comments = cursor.rowcount
+
+    cursor.execute(f"DELETE FROM {source}.comments WHERE {selected}")
+    cursor.execute(f"DELETE FROM {source}.requests WHERE {selected}")
+    return {'requests': moved_requests, 'comments': moved_comments}
+
+
+def archive_cutoff(older_than_days: Optional[int] = None) -> str:
+    """Дата, раньше которой завершенные заявки переносятся в архив"""
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def main():
+    from database import Database
+
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    db = Database()
+    try:
+        moved = db.archive_completed(days)
+    finally:
+        db.close()
+    print(f"✓ В архив перенесено заявок: {moved['requests']}, комментариев: {moved['comments']}")
+    print(f"  Архив: {archive_path(db.db_name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Автоматическое назначение мастеров на заявки с учетом загрузки
+
+Движок держит в памяти число открытых заявок каждого мастера и кучи
+(heapq) мастеров, упорядоченные по загрузке: общую и по каждому виду техники,
+с которым мастер уже работал. Выбор мастера и обновление загрузки - O(log n).
+"""
+
+import heapq
+import itertools
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from models import RequestStatus
+
+# Политики назначения
+LEAST_LOADED = 'least_loaded'
+ROUND_ROBIN = 'round_robin'
+SKILL_MATCH = 'skill_match'
+POLICIES = (LEAST_LOADED, ROUND_ROBIN, SKILL_MATCH)
+
+DEFAULT_POLICY = os.environ.get('REPAIR_ASSIGN_POLICY', SKILL_MATCH)
+
+# Статусы, после которых заявка не занимает мастера
+CLOSED_STATUSES = {RequestStatus.READY.value}
+
+
+def is_open(request: Optional[Dict]) -> bool:
+    return bool(request) and request.get('request_status') not in CLOSED_STATUSES
+
+
+class AssignmentEngine:
+    """Счетчики открытых заявок по мастерам и выбор мастера по политике"""
+
+    def __init__(self, db, default_policy: str = DEFAULT_POLICY):
+        if default_policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика назначения: {default_policy}")
+        self.db = db
+        self.default_policy = default_policy
+        self._lock = threading.Lock()
+        self._users_version = None
+        self._sequence = itertools.count()
+        self.load: Dict[int, int] = {}
+        self.skills: Dict[int, set] = {}
+        # Ключ None - все мастера, иначе вид техники -> мастера с опытом
+        self._heaps: Dict[Optional[str], List[Tuple[int, int, int]]] = {}
+        self._round_robin: List[Tuple[int, int]] = []
+
+    def reload(self):
+        """Перечитать мастеров, их загрузку и специализацию из БД"""
+        with self._lock:
+            self._load_state()
+
+    def _load_state(self):
+        masters, open_counts, skills = self.db.get_assignment_state()
+        self._users_version = self.db.users_version
+        self.load = {master_id: open_counts.get(master_id, 0) for master_id in masters}
+        self.skills = {master_id: set() for master_id in masters}
+        for master_id, tech_type in skills:
+            if master_id in self.skills:
+                self.skills[master_id].add(tech_type)
+
+        self._rebuild_heaps()
+        self._round_robin = [(next(self._sequence), master_id) for master_id in masters]
+        heapq.heapify(self._round_robin)
+
+    def _ensure_fresh(self):
+        # Состав мастеров меняется при изменении пользователей
+        if self._users_version != self.db.users_version:
+            self._load_state()
+
+    def _least_loaded(self, key: Optional[str]) -> Optional[int]:
+        """Наименее загруженный мастер из кучи (устаревшие записи отбрасываются)"""
+        heap = self._heaps.get(key)
+        while heap:
+            load, _, master_id = heap[0]
+            if self.load.get(master_id) == load:
+                return master_id
+            heapq.heappop(heap)
+        return None
+
+    def _next_round_robin(self) -> Optional[int]:
+        while self._round_robin:
+            _, master_id = heapq.heappop(self._round_robin)
+            if master_id in self.load:
+                heapq.heappush(self._round_robin, (next(self._sequence), master_id))
+                return master_id
+        return None
+
+    def _change_load(self, master_id: int, delta: int):
+        if master_id not in self.load:
+            return
+        self.load[master_id] = max(self.load[master_id] + delta, 0)
+        entry = (self.load[master_id], next(self._sequence), master_id)
+        heapq.heappush(self._heaps[None], entry)
+        for tech_type in self.skills[master_id]:
+            heapq.heappush(self._heaps[tech_type], entry)
+
+        # Куча копит устаревшие записи - перестраивается, когда их становится слишком много
+        if len(self._heaps[None]) > 4 * len(self.load) + 64:
+            self._rebuild_heaps()
+
+    def _rebuild_heaps(self):
+        """Кучи загрузки по текущим счетчикам"""
+        self._heaps = {None: []}
+        for master_id, load in self.load.items():
+            entry = (load, next(self._sequence), master_id)
+            self._heaps[None].append(entry)
+            for tech_type in self.skills[master_id]:
+                self._heaps.setdefault(tech_type, []).append(entry)
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+
+    def _choose(self, tech_type: Optional[str], policy: str) -> Optional[int]:
+        if policy == ROUND_ROBIN:
+            return self._next_round_robin()
+        if policy == SKILL_MATCH and tech_type in self._heaps:
+            master_id = self._least_loaded(tech_type)
+            if master_id is not None:
+                return master_id
+        # Нет мастеров с опытом по этой технике - самый свободный из всех
+        return self._least_loaded(None)
+
+    def assign(self, tech_type: Optional[str], policy: Optional[str] = None) -> Optional[int]:
+        """Выбор мастера для новой заявки (загрузка мастера сразу увеличивается)"""
+        policy = policy or self.default_policy
+        if policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика назначения: {policy}")
+        with self._lock:
+            self._ensure_fresh()
+            master_id = self._choose(tech_type, policy)
+            if master_id is not None:
+                self._change_load(master_id, 1)
+            return master_id
+
+    def request_updated(self, old: Optional[Dict], new: Optional[Dict]):
+        """Учет создания или изменения заявки (смена мастера, закрытие)"""
+        old_master = old.get('master_id') if is_open(old) else None
+        new_master = new.get('master_id') if is_open(new) else None
+        if old_master == new_master:
+            return
+        with self._lock:
+            if old_master is not None:
+                self._change_load(old_master, -1)
+            if new_master is not None:
+                self._change_load(new_master, 1)
+
+    def release(self, master_id: Optional[int]):
+        """Откат назначения (заявка так и не была создана)"""
+        if master_id is not None:
+            with self._lock:
+                self._change_load(master_id, -1)
+
+    def rebalance(self, policy: Optional[str] = None, include_assigned: bool = False) -> List[Tuple[int, int]]:
+        """Распределение неназначенных заявок
+
+        Открытые заявки без мастера распределяются в порядке поступления. С
+        include_assigned заново распределяются и заявки со статусом "Новая заявка",
+        у которых мастер уже есть (в том числе назначенный менеджером вручную).
+        Возвращает список (request_id, master_id) для изменившихся назначений.
+        """
+        policy = policy or self.default_policy
+        if policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика назначения: {policy}")
+
+        requests = self.db.get_requests(fields=['request_id', 'start_date', 'home_tech_type',
+                                                'request_status', 'master_id'])
+        pending = [r for r in requests if is_open(r)
+                   and (r['master_id'] is None
+                        or (include_assigned and r['request_status'] == RequestStatus.NEW.value))]
+        pending.sort(key=lambda r: (r['start_date'], r['request_id']))
+
+        with self._lock:
+            self._load_state()
+            for request in pending:
+                if request['master_id'] is not None:
+                    self._change_load(request['master_id'], -1)
+
+            changes = []
+            for request in pending:
+                master_id = self._choose(request['home_tech_type'], policy)
+                if master_id is None:
+                    break
+                self._change_load(master_id, 1)
+                if master_id != request['master_id']:
+                    changes.append((request['request_id'], master_id))
+
+        if changes:
+            self.db.assign_masters(changes)
+        return changes
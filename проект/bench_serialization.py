@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сериализации списка заявок: строк в секунду до и после быстрого пути
+
+Запуск: python bench_serialization.py [количество_заявок]
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+import fast_json
+from database import Database
+from models import RequestResponse
+
+
+def create_test_database(db_name, rows):
+    """Временная база с заданным количеством заявок"""
+    db = Database(db_name)
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, fio, phone, login, password, type) VALUES (?, ?, ?, ?, ?, ?)",
+            [(i, f"Пользователь {i}", "89990000000", f"user{i}", "x", "Мастер" if i % 2 else "Заказчик")
+             for i in range(1, 101)]
+        )
+        conn.executemany(
+            "INSERT INTO requests (start_date, home_tech_type, home_tech_model, problem_description, "
+            "request_status, master_id, client_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [("2023-06-06", "Холодильник", f"Модель {i}", "Не морозит одна из камер холодильника " * 3,
+              "В процессе ремонта", 1 + (i % 50) * 2, 2 + (i % 50) * 2) for i in range(rows)]
+        )
+        conn.commit()
+    return db
+
+
+def measure(name, func, rows, repeat=3):
+    """Лучшее время из нескольких прогонов"""
+    best = min(_timed(func) for _ in range(repeat))
+    print(f"  {name:<45} {rows / best:>12,.0f} строк/с  ({best * 1000:.1f} мс)")
+    return best
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    with tempfile.TemporaryDirectory() as folder:
+        db = create_test_database(os.path.join(folder, "bench.db"), rows)
+        data = db.get_requests()
+
+        def old_path():
+            # Прежний путь FastAPI: модель на каждую строку, jsonable_encoder, стандартный json
+            models = [RequestResponse.model_validate(row) for row in data]
+            json.dumps(jsonable_encoder(models)).encode('utf-8')
+
+        def validated_path():
+            adapter = fast_json._get_adapter(RequestResponse)
+            fast_json.dumps(adapter.dump_python(adapter.validate_python(data), mode='json'))
+
+        def fast_path():
+            fast_json.dumps(data)
+
+        print(f"Сериализация {rows} заявок (orjson: {'да' if fast_json.orjson else 'нет'})")
+        before = measure("до: модель на строку + jsonable_encoder", old_path, rows)
+        measure("TypeAdapter для всего списка", validated_path, rows)
+        after = measure("после: доверенные строки + быстрый кодировщик", fast_path, rows)
+        print(f"Ускорение сериализации: x{before / after:.1f}")
+
+        print("\nС учетом чтения из БД:")
+        measure("get_requests()", db.get_requests, rows)
+        measure("get_requests() + быстрый путь", lambda: fast_json.dumps(db.get_requests()), rows)
+
+
+if __name__ == "__main__":
+    main()
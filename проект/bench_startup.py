@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк холодного запуска API: время импорта main (python -X importtime)
+и проверка, что тяжелые модули не загружаются при запуске сервера
+
+Запуск: python bench_startup.py [бюджет_мс]
+
+Код выхода 1, если импорт main дольше бюджета или загружен запрещенный модуль
+(проверка для CI).
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+# Бюджет времени импорта main (мс)
+IMPORT_BUDGET_MS = float(os.environ.get('REPAIR_IMPORT_BUDGET_MS', 1500))
+# Модули, которых не должно быть в пути запуска сервера
+FORBIDDEN_MODULES = ('pandas', 'numpy', 'pyarrow', 'openpyxl')
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_main(workdir):
+    """Импорт main в отдельном процессе: [(модуль, вложенность, накопленное мкс)]"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=workdir, capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=PROJECT_DIR, PYTHONDONTWRITEBYTECODE='1'),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name[1:].rstrip()
+        # Вложенность импорта - по два пробела на уровень
+        level = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), level, int(cumulative_us)))
+    return modules
+
+
+def main_import_ms(modules):
+    return next(cumulative for name, level, cumulative in modules if name == 'main' and level == 0) / 1000
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else IMPORT_BUDGET_MS
+
+    # Отдельная папка: первый запуск создает схему, замеряется запуск с актуальной схемой
+    with tempfile.TemporaryDirectory() as folder:
+        import_main(folder)
+        runs = [import_main(folder) for _ in range(3)]
+
+    best = min(runs, key=main_import_ms)
+    total_ms = main_import_ms(best)
+    loaded = {name.split('.')[0] for name, _, _ in best}
+    forbidden = [module for module in FORBIDDEN_MODULES if module in loaded]
+
+    # Модули, которые main импортирует напрямую (первым)
+    print("Самые долгие импорты main (накопленное время):")
+    direct = [(name, cumulative) for name, level, cumulative in best if level == 1]
+    for name, cumulative in sorted(direct, key=lambda item: -item[1])[:10]:
+        print(f"  {name:<30} {cumulative / 1000:>8.1f} мс")
+
+    print(f"\nИмпорт main: {total_ms:.1f} мс (бюджет {budget_ms:.0f} мс)")
+    failed = False
+    if total_ms > budget_ms:
+        print("✗ Бюджет времени запуска превышен")
+        failed = True
+    if forbidden:
+        print(f"✗ При запуске сервера загружаются: {', '.join(forbidden)}")
+        failed = True
+    if not failed:
+        print("✓ Запуск в пределах бюджета, тяжелые модули не загружаются")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
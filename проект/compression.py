@@ -0,0 +1,180 @@
+"""
+Сжатие ответов API с выбором кодировки по Accept-Encoding (zstd, br, gzip)
+"""
+
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Ответы меньше порога (байт) отправляются без сжатия
+COMPRESSION_MIN_SIZE = int(os.environ.get('REPAIR_COMPRESSION_MIN_SIZE', 1024))
+# Уровни сжатия: выше - меньше трафик, больше нагрузка на CPU
+COMPRESSION_LEVELS = {
+    'zstd': int(os.environ.get('REPAIR_ZSTD_LEVEL', 3)),
+    'br': int(os.environ.get('REPAIR_BROTLI_LEVEL', 4)),
+    'gzip': int(os.environ.get('REPAIR_GZIP_LEVEL', 6)),
+}
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson',
+                      'application/javascript', 'application/xml')
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush, чтобы каждая порция потока сразу уходила клиенту
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Кодировки в порядке предпочтения сервера (только доступные в окружении)
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS['zstd'] = _ZstdEncoder
+if brotli is not None:
+    ENCODERS['br'] = _BrotliEncoder
+ENCODERS['gzip'] = _GzipEncoder
+
+
+def choose_encoding(accept_encoding: str):
+    """Выбор кодировки по заголовку Accept-Encoding"""
+    accepted = {}
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    for encoding in ENCODERS:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware сжатия ответов (в том числе потоковых)"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, levels: dict = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {**COMPRESSION_LEVELS, **(levels or {})}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self.levels[encoding], self.minimum_size)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Перехват сообщений ответа и их сжатие"""
+
+    def __init__(self, send, encoding: str, level: int, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def send(self, message):
+        message_type = message['type']
+
+        if message_type == 'http.response.start':
+            self.start_message = message
+            headers = Headers(raw=message['headers'])
+            content_type = headers.get('content-type', '')
+            # Уже сжатые или несжимаемые ответы отдаются как есть
+            if 'content-encoding' in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                self.passthrough = True
+                await self._send(message)
+            return
+
+        if message_type != 'http.response.body' or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.minimum_size:
+                # Маленький ответ целиком - сжатие не окупается
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.encoder = ENCODERS[self.encoding](self.level)
+            headers = MutableHeaders(raw=self.start_message['headers'])
+            headers['Content-Encoding'] = self.encoding
+            headers.add_vary_header('Accept-Encoding')
+
+            if not more_body:
+                compressed = self.encoder.compress(body) + self.encoder.finish()
+                headers['Content-Length'] = str(len(compressed))
+                await self._send(self.start_message)
+                await self._send({'type': 'http.response.body', 'body': compressed})
+                return
+
+            # Потоковый ответ: длина заранее неизвестна
+            del headers['Content-Length']
+            await self._send(self.start_message)
+
+        chunk = self.encoder.compress(body) if body else b''
+        if not more_body:
+            chunk += self.encoder.finish()
+        if chunk or not more_body:
+            await self._send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
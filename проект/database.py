@@ -1,171 +1,86 @@
 import sqlite3
-import pandas as pd
+import json
+from bisect import bisect_left
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-import os
+import threading
+
+from security import password_hasher, verification_cache, migrate_plaintext_passwords
+from models import RequestStatus, UserRole, parse_comment_cursor
+from writer import WriteQueue
+import archive
+import migrations
+import sla
+from query_builder import (REQUEST_FIELDS, USER_FIELDS, ConnectionPool, build_update, check_fields,
+                           count_requests_sql, request_filters, requests_page_sql, select_requests)
+
+
+# Верхняя граница для поиска по префиксу: prefix <= fio < prefix + MAX_CHAR
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+# Поля комментария для ответов API: created_at в ISO 8601, как его выводит CommentResponse
+COMMENT_SELECT = ("SELECT c.comment_id, c.message, c.master_id, c.request_id, u.fio AS master_fio, "
+                  "strftime('%Y-%m-%dT%H:%M:%S', c.created_at) AS created_at")
+
+def fetch_dicts(cursor) -> List[Dict]:
+    """Строки результата в виде словарей (быстрее, чем dict(sqlite3.Row) для каждой строки)"""
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
 
 class Database:
     def __init__(self, db_name: str = "repair_service.db"):
         self.db_name = db_name
+        # Справочник "роль -> пользователи" (строится лениво, сбрасывается при изменении пользователей)
+        self._role_directory = None
+        self._role_directory_lock = threading.Lock()
+        # Номер версии пользователей: увеличивается при каждом изменении (для кешей вне класса)
+        self.users_version = 0
         self.init_database()
+        # Постоянные соединения чтения: повторные запросы берут готовые выражения из кеша
+        self.read_pool = ConnectionPool(db_name)
+        # Все изменения данных идут через один поток записи с групповой фиксацией
+        self.writer = WriteQueue(db_name, on_connect=lambda conn: archive.attach_archive(conn, db_name))
     
-    def get_connection(self):
+    def get_connection(self, include_archived: bool = False):
+        if include_archived:
+            return archive.connect_with_archive(self.db_name)
         return sqlite3.connect(self.db_name)
     
+    def close(self):
+        """Завершение потока записи и соединений чтения"""
+        self.writer.close()
+        self.read_pool.close()
+    
     def init_database(self):
-        """Инициализация базы данных и создание таблиц"""
+        """Инициализация базы данных: применение недостающих миграций схемы"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Таблица пользователей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fio TEXT NOT NULL,
-                    phone TEXT NOT NULL,
-                    login TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    type TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Таблица заявок
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS requests (
-                    request_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    start_date DATE NOT NULL DEFAULT CURRENT_DATE,
-                    home_tech_type TEXT NOT NULL,
-                    home_tech_model TEXT NOT NULL,
-                    problem_description TEXT NOT NULL,
-                    request_status TEXT NOT NULL DEFAULT 'Новая заявка',
-                    completion_date DATE,
-                    repair_parts TEXT,
-                    master_id INTEGER,
-                    client_id INTEGER NOT NULL,
-                    FOREIGN KEY (master_id) REFERENCES users(user_id),
-                    FOREIGN KEY (client_id) REFERENCES users(user_id)
-                )
-            ''')
-            
-            # Таблица комментариев
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS comments (
-                    comment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    message TEXT NOT NULL,
-                    master_id INTEGER NOT NULL,
-                    request_id INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (master_id) REFERENCES users(user_id),
-                    FOREIGN KEY (request_id) REFERENCES requests(request_id)
-                )
-            ''')
-            
-            # Создание индексов для ускорения поиска
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_status ON requests(request_status)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_client ON requests(client_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_master ON requests(master_id)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_request ON comments(request_id)')
-            
-            conn.commit()
+            # WAL: читатели не блокируют запись и наоборот (в том числе во время миграций)
+            conn.execute('PRAGMA journal_mode=WAL')
+        # Схема описана только в migrations; при актуальной схеме - одна проверка версии
+        migrations.migrate(self.db_name)
     
     def import_from_csv(self, folder_path: str = "import_data"):
-        """Импорт данных из CSV файлов при старте сервера"""
-        print("Загрузка данных из CSV файлов...")
+        """Полная перезагрузка данных из файлов папки (CSV, TXT или XLSX)"""
+        # Подсистема импорта (и pandas) загружается только при вызове, а не при запуске сервера
+        from importers import TABLE_SPECS, find_source, import_table
         
-        # Используем функции из load_data.py или свою логику
+        print("Загрузка данных из файлов...")
         try:
             # Удаляем существующие данные
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
+            def clear_tables(cursor):
                 cursor.execute('DELETE FROM comments')
                 cursor.execute('DELETE FROM requests')
                 cursor.execute('DELETE FROM users')
-                conn.commit()
+            self.writer.execute(clear_tables)
             
-            # Загружаем пользователей
-            users_file = os.path.join(folder_path, "InputDataUsers.csv")
-            if os.path.exists(users_file):
-                df_users = pd.read_csv(users_file, sep=';')
-                with self.get_connection() as conn:
-                    for _, row in df_users.iterrows():
-                        cursor = conn.cursor()
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO users (user_id, fio, phone, login, password, type)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (
-                            int(row['userID']),
-                            str(row['fio']),
-                            str(row['phone']),
-                            str(row['login']),
-                            str(row['password']),
-                            str(row['type'])
-                        ))
-                    conn.commit()
-                print(f"✓ Загружено {len(df_users)} пользователей")
-            
-            # Загружаем заявки
-            requests_file = os.path.join(folder_path, "InputDataRequests.csv")
-            if os.path.exists(requests_file):
-                df_requests = pd.read_csv(requests_file, sep=';')
-                with self.get_connection() as conn:
-                    for _, row in df_requests.iterrows():
-                        cursor = conn.cursor()
-                        
-                        # Преобразуем даты
-                        start_date = datetime.strptime(str(row['startDate']), '%Y-%m-%d').date()
-                        
-                        completion_date = None
-                        if str(row['completionDate']) != 'null' and pd.notna(row['completionDate']):
-                            try:
-                                completion_date = datetime.strptime(str(row['completionDate']), '%Y-%m-%d').date()
-                            except:
-                                completion_date = None
-                        
-                        master_id = None
-                        if str(row['masterID']) != 'null' and pd.notna(row['masterID']):
-                            master_id = int(row['masterID'])
-                        
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO requests 
-                            (request_id, start_date, home_tech_type, home_tech_model, 
-                            problem_description, request_status, completion_date, 
-                            repair_parts, master_id, client_id)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            int(row['requestID']),
-                            start_date,
-                            str(row['homeTechType']),
-                            str(row['homeTechModel']),
-                            str(row['problemDescryption']),
-                            str(row['requestStatus']),
-                            completion_date,
-                            str(row['repairParts']) if str(row['repairParts']) != 'null' else None,
-                            master_id,
-                            int(row['clientID'])
-                        ))
-                    conn.commit()
-                print(f"✓ Загружено {len(df_requests)} заявок")
-            
-            # Загружаем комментарии
-            comments_file = os.path.join(folder_path, "InputDataComments.csv")
-            if os.path.exists(comments_file):
-                df_comments = pd.read_csv(comments_file, sep=';')
-                with self.get_connection() as conn:
-                    for _, row in df_comments.iterrows():
-                        cursor = conn.cursor()
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO comments (comment_id, message, master_id, request_id)
-                            VALUES (?, ?, ?, ?)
-                        ''', (
-                            int(row['commentID']),
-                            str(row['message']),
-                            int(row['masterID']),
-                            int(row['requestID'])
-                        ))
-                    conn.commit()
-                print(f"✓ Загружено {len(df_comments)} комментариев")
+            for table, spec in TABLE_SPECS.items():
+                path = find_source(folder_path, spec['source'])
+                if path:
+                    result = import_table(table, path, self.db_name)
+                    print(f"✓ {table}: загружено {result['inserted'] + result['updated']}, "
+                          f"отклонено {result['skipped']}")
             
+            self._invalidate_role_directory()
             print("✓ Данные успешно загружены")
             return True
             
@@ -178,12 +93,36 @@ class Database:
         with self.get_connection() as conn:
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
+            # Поиск только по уникальному индексу login, пароль сверяется отдельно
             cursor.execute(
-                "SELECT user_id, fio, phone, login, type FROM users WHERE login = ? AND password = ?",
-                (login, password)
+                "SELECT user_id, fio, phone, login, type, password FROM users WHERE login = ?",
+                (login,)
             )
             user = cursor.fetchone()
-            return dict(user) if user else None
+            if not user:
+                return None
+            
+            user = dict(user)
+            stored = user.pop('password')
+        
+        if verification_cache.contains(login, password, stored):
+            return user
+        
+        ok, needs_rehash = password_hasher.verify(password, stored)
+        if not ok:
+            return None
+            
+        if needs_rehash:
+            # Ленивая миграция: открытый текст или устаревшие параметры -> актуальный хеш
+            new_hash = password_hasher.hash(password)
+            self.writer.execute(lambda cursor: cursor.execute(
+                "UPDATE users SET password = ? WHERE user_id = ? AND password = ?",
+                (new_hash, user['user_id'], stored)
+            ))
+            stored = new_hash
+        
+        verification_cache.add(login, password, stored)
+        return user
     
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Получение пользователя по ID"""
@@ -196,8 +135,10 @@ class Database:
     
     def create_user(self, user_data: Dict) -> int:
         """Создание нового пользователя"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        # Хеш считается до постановки в очередь, чтобы не задерживать поток записи
+        password_hash = password_hasher.hash(user_data['password'])
+        
+        def insert_user(cursor):
             cursor.execute('''
                 INSERT INTO users (fio, phone, login, password, type)
                 VALUES (?, ?, ?, ?, ?)
@@ -205,16 +146,18 @@ class Database:
                 user_data['fio'],
                 user_data['phone'],
                 user_data['login'],
-                user_data['password'],
+                password_hash,
                 user_data['type']
             ))
-            conn.commit()
             return cursor.lastrowid
+        
+        user_id = self.writer.execute(insert_user)
+        self._invalidate_role_directory()
+        return user_id
     
     def create_request(self, request_data: Dict) -> int:
         """Создание новой заявки"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        def insert_request(cursor):
             cursor.execute('''
                 INSERT INTO requests 
                 (home_tech_type, home_tech_model, problem_description, client_id, master_id)
@@ -226,75 +169,68 @@ class Database:
                 request_data['client_id'],
                 request_data.get('master_id')
             ))
-            conn.commit()
             return cursor.lastrowid
+        
+        return self.writer.execute(insert_request)
     
-    def get_requests(self, filters: Dict = None) -> List[Dict]:
-        """Получение списка заявок с фильтрами"""
-        with self.get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            query = '''
-                SELECT r.*, 
-                       c.fio as client_fio,
-                       m.fio as master_fio
-                FROM requests r
-                LEFT JOIN users c ON r.client_id = c.user_id
-                LEFT JOIN users m ON r.master_id = m.user_id
-                WHERE 1=1
-            '''
-            params = []
-            
-            if filters:
-                if filters.get('request_id'):
-                    query += " AND r.request_id = ?"
-                    params.append(filters['request_id'])
-                if filters.get('client_id'):
-                    query += " AND r.client_id = ?"
-                    params.append(filters['client_id'])
-                if filters.get('master_id'):
-                    query += " AND r.master_id = ?"
-                    params.append(filters['master_id'])
-                if filters.get('status'):
-                    query += " AND r.request_status = ?"
-                    params.append(filters['status'])
-                if filters.get('search'):
-                    query += " AND (r.home_tech_type LIKE ? OR r.home_tech_model LIKE ? OR r.problem_description LIKE ?)"
-                    search_term = f"%{filters['search']}%"
-                    params.extend([search_term, search_term, search_term])
-            
-            query += " ORDER BY r.start_date DESC"
-            cursor.execute(query, params)
-            return [dict(row) for row in cursor.fetchall()]
+    def get_requests(self, filters: Dict = None, fields: Optional[List[str]] = None,
+                     include_archived: bool = False, limit: Optional[int] = None,
+                     offset: int = 0) -> List[Dict]:
+        """Получение списка заявок с фильтрами (только запрошенные поля, постранично)"""
+        fields = check_fields(fields, REQUEST_FIELDS)
+        filter_shape, params = request_filters(filters)
+        # Архив подключается только по запросу, иначе читается лишь основная таблица
+        query = requests_page_sql(tuple(fields), filter_shape, include_archived, bool(limit))
+        if limit:
+            params.extend([limit, offset])
+        
+        cursor = self.read_pool.get(include_archived).execute(query, params)
+        return fetch_dicts(cursor)
+    
+    def count_requests(self, filters: Dict = None, include_archived: bool = False) -> int:
+        """Число заявок, подходящих под фильтры (для постраничного вывода)"""
+        filter_shape, params = request_filters(filters)
+        conn = self.read_pool.get(include_archived)
+        return conn.execute(count_requests_sql(filter_shape, include_archived), params).fetchone()[0]
+    
+    def get_overdue_requests(self, as_of: Optional[str] = None, limit: Optional[int] = None,
+                             fields: Optional[List[str]] = None, due_after: Optional[str] = None) -> List[Dict]:
+        """Открытые заявки с истекшим сроком (срок < as_of), самые давние первыми
+        
+        Читается только частичный индекс idx_requests_open_deadline; due_after
+        ограничивает окно снизу (срок >= due_after) для инкрементальной проверки.
+        """
+        fields = check_fields(fields, REQUEST_FIELDS)
+        query = select_requests(fields) + f" WHERE r.{sla.OPEN_CONDITION} AND r.deadline < ?"
+        params = [as_of or datetime.now().date().isoformat()]
+        if due_after:
+            query += " AND r.deadline >= ?"
+            params.append(due_after)
+        query += " ORDER BY r.deadline, r.request_id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        return fetch_dicts(self.read_pool.get().execute(query, params))
+    
+    def count_overdue_requests(self, as_of: Optional[str] = None) -> int:
+        """Число просроченных открытых заявок (только по индексу)"""
+        return self.read_pool.get().execute(
+            f"SELECT COUNT(*) FROM requests WHERE {sla.OPEN_CONDITION} AND deadline < ?",
+            (as_of or datetime.now().date().isoformat(),)
+        ).fetchone()[0]
     
     def update_request(self, request_id: int, update_data: Dict) -> bool:
-        """Обновление заявки"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            set_clause = []
-            params = []
-            
-            for key, value in update_data.items():
-                if value is not None:
-                    set_clause.append(f"{key} = ?")
-                    params.append(value)
-            
-            if not set_clause:
-                return False
-            
-            params.append(request_id)
-            query = f"UPDATE requests SET {', '.join(set_clause)} WHERE request_id = ?"
-            
-            cursor.execute(query, params)
-            conn.commit()
-            return cursor.rowcount > 0
+        """Обновление заявки (только разрешенные колонки, иначе ValueError)"""
+        statement = build_update('requests', request_id, update_data)
+        if statement is None:
+            return False
+        query, params = statement
+        return self.writer.execute(lambda cursor: cursor.execute(query, params).rowcount > 0)
     
     def add_comment(self, comment_data: Dict) -> int:
         """Добавление комментария к заявке"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        def insert_comment(cursor):
             cursor.execute('''
                 INSERT INTO comments (message, master_id, request_id)
                 VALUES (?, ?, ?)
@@ -303,22 +239,82 @@ class Database:
                 comment_data['master_id'],
                 comment_data['request_id']
             ))
-            conn.commit()
             return cursor.lastrowid
+        
+        return self.writer.execute(insert_comment)
+    
+    def get_comments(self, request_id: int, include_archived: bool = False, limit: Optional[int] = None,
+                     before: Optional[str] = None, since: Optional[str] = None) -> List[Dict]:
+        """Получение комментариев к заявке, новые первыми
+        
+        before и since - курсоры (см. parse_comment_cursor): страница более ранних
+        комментариев и только комментарии, появившиеся после уже загруженных.
+        """
+        source = archive.union_source('comments') if include_archived else 'comments'
+        query = f'''
+            {COMMENT_SELECT}
+            FROM {source} c
+            JOIN users u ON c.master_id = u.user_id
+            WHERE c.request_id = ?
+        '''
+        params = [request_id]
+        # Сравнение пар (created_at, comment_id) идет по индексу idx_comments_timeline
+        if before:
+            query += " AND (c.created_at, c.comment_id) < (?, ?)"
+            params.extend(parse_comment_cursor(before))
+        if since:
+            query += " AND (c.created_at, c.comment_id) > (?, ?)"
+            params.extend(parse_comment_cursor(since))
+        query += " ORDER BY c.created_at DESC, c.comment_id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        return fetch_dicts(self.read_pool.get(include_archived).execute(query, params))
+    
+    def get_comments_bulk(self, request_ids: List[int], include_archived: bool = False) -> List[Dict]:
+        """Комментарии к нескольким заявкам одним запросом (по заявкам, новые первыми)"""
+        source = archive.union_source('comments') if include_archived else 'comments'
+        cursor = self.read_pool.get(include_archived).execute(f'''
+            {COMMENT_SELECT}
+            FROM {source} c
+            JOIN users u ON c.master_id = u.user_id
+            WHERE c.request_id IN (SELECT value FROM json_each(?))
+            ORDER BY c.request_id, c.created_at DESC, c.comment_id DESC
+        ''', (json.dumps(request_ids),))
+        return fetch_dicts(cursor)
     
-    def get_comments(self, request_id: int) -> List[Dict]:
-        """Получение комментариев к заявке"""
+    def get_assignment_state(self):
+        """Мастера, число их открытых заявок и виды техники, с которыми они работали"""
+        masters = [user['user_id'] for user in self.get_users_by_role(UserRole.MASTER.value, fields=['user_id'])]
         with self.get_connection() as conn:
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT c.*, u.fio as master_fio
-                FROM comments c
-                JOIN users u ON c.master_id = u.user_id
-                WHERE c.request_id = ?
-                ORDER BY c.created_at DESC
-            ''', (request_id,))
-            return [dict(row) for row in cursor.fetchall()]
+                SELECT master_id, COUNT(*) FROM requests
+                WHERE master_id IS NOT NULL AND request_status != ?
+                GROUP BY master_id
+            ''', (RequestStatus.READY.value,))
+            open_counts = dict(cursor.fetchall())
+            cursor.execute(
+                "SELECT DISTINCT master_id, home_tech_type FROM requests WHERE master_id IS NOT NULL"
+            )
+            skills = cursor.fetchall()
+        return masters, open_counts, skills
+    
+    def assign_masters(self, assignments: List[tuple]) -> int:
+        """Пакетное назначение мастеров: список (request_id, master_id)"""
+        params = [(master_id, request_id) for request_id, master_id in assignments]
+        return self.writer.execute(
+            lambda cursor: cursor.executemany("UPDATE requests SET master_id = ? WHERE request_id = ?", params).rowcount
+        )
+    
+    def archive_completed(self, older_than_days: Optional[int] = None) -> Dict[str, int]:
+        """Перенос давно выполненных заявок и их комментариев в архив"""
+        return self.writer.execute(archive.archive_completed, archive.archive_cutoff(older_than_days))
+    
+    def restore_request(self, request_id: int) -> bool:
+        """Возврат заявки из архива"""
+        return self.writer.execute(archive.restore_request, request_id)
     
     def get_statistics(self) -> Dict:
         """Получение статистики"""
@@ -367,59 +363,95 @@ class Database:
                 'requests_by_tech_type': tech_stats
             }
     
-    def get_users_by_role(self, role: str) -> List[Dict]:
-        """Получение пользователей по роли"""
-        with self.get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE type = ? ORDER BY fio", (role,))
-            return [dict(row) for row in cursor.fetchall()]
-         
     def update_user(self, user_id: int, update_data: Dict) -> bool:
-        """Обновление данных пользователя"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            set_clause = []
-            params = []
-            
-            for key, value in update_data.items():
-                if value is not None:
-                    set_clause.append(f"{key} = ?")
-                    params.append(value)
-            
-            if not set_clause:
-                return False
-            
-            params.append(user_id)
-            query = f"UPDATE users SET {', '.join(set_clause)} WHERE user_id = ?"
-            
-            cursor.execute(query, params)
-            conn.commit()
-            return cursor.rowcount > 0
+        """Обновление данных пользователя (только разрешенные колонки, иначе ValueError)"""
+        if update_data.get('password'):
+            update_data = dict(update_data, password=password_hasher.hash(update_data['password']))
+        
+        statement = build_update('users', user_id, update_data)
+        if statement is None:
+            return False
+        query, params = statement
+        
+        updated = self.writer.execute(lambda cursor: cursor.execute(query, params).rowcount > 0)
+        self._invalidate_role_directory()
+        return updated
 
     def delete_user(self, user_id: int) -> bool:
         """Удаление пользователя"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
-            conn.commit()
-            return cursor.rowcount > 0
+        deleted = self.writer.execute(
+            lambda cursor: cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,)).rowcount > 0
+        )
+        self._invalidate_role_directory()
+        return deleted
         
-    def get_all_users(self):
-        """Получение всех пользователей"""
-        with self.get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT user_id, fio, phone, login, type FROM users ORDER BY fio")
-            results = cursor.fetchall()
-            return [dict(row) for row in results]
+    def get_all_users(self, fio_prefix: Optional[str] = None, role: Optional[str] = None,
+                      limit: Optional[int] = None, offset: int = 0,
+                      fields: Optional[List[str]] = None) -> List[Dict]:
+        """Получение пользователей с поиском по началу ФИО и пагинацией"""
+        if role:
+            return self.get_users_by_role(role, fio_prefix, limit, offset, fields)
+        
+        fields = check_fields(fields, USER_FIELDS)
+        query = f"SELECT {', '.join(fields)} FROM users"
+        params = []
+        if fio_prefix:
+            # Диапазон вместо LIKE, чтобы использовался индекс idx_users_fio
+            query += " WHERE fio >= ? AND fio < ?"
+            params.extend([fio_prefix, fio_prefix + PREFIX_UPPER_BOUND])
+        query += " ORDER BY fio LIMIT ? OFFSET ?"
+        params.extend([limit if limit is not None else -1, offset])
         
-    def get_users_by_role(self, role: str) -> List[Dict]:
-        """Получение пользователей по роли"""
         with self.get_connection() as conn:
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            cursor.execute("SELECT user_id, fio, phone, login, type FROM users WHERE type = ? ORDER BY fio", (role,))
-            results = cursor.fetchall()
-            return [dict(row) for row in results]
\ No newline at end of file
+            cursor.execute(query, params)
+            return fetch_dicts(cursor)
+        
+    def get_users_by_role(self, role: str, fio_prefix: Optional[str] = None,
+                          limit: Optional[int] = None, offset: int = 0,
+                          fields: Optional[List[str]] = None) -> List[Dict]:
+        """Получение пользователей по роли (из справочника в памяти)"""
+        fields = check_fields(fields, USER_FIELDS)
+        fios, users = self._get_role_directory().get(role, ([], []))
+        
+        start, end = 0, len(users)
+        if fio_prefix:
+            start = bisect_left(fios, fio_prefix)
+            end = bisect_left(fios, fio_prefix + PREFIX_UPPER_BOUND)
+        start += offset
+        if limit is not None:
+            end = min(end, start + limit)
+        
+        # Копии, чтобы вызывающий код не испортил справочник
+        return [{field: user[field] for field in fields} for user in users[start:end]]
+    
+    def migrate_passwords(self) -> int:
+        """Перевод паролей, хранящихся открытым текстом, в хеши"""
+        return migrate_plaintext_passwords(self.db_name)
+    
+    def _get_role_directory(self) -> Dict[str, tuple]:
+        """Справочник роль -> (отсортированные ФИО, пользователи)"""
+        directory = self._role_directory
+        if directory is not None:
+            return directory
+        
+        with self._role_directory_lock:
+            if self._role_directory is None:
+                directory = {}
+                with self.get_connection() as conn:
+                    conn.row_factory = sqlite3.Row
+                    cursor = conn.cursor()
+                    # Один проход по индексу idx_users_type_fio вместо запроса на каждую роль
+                    cursor.execute("SELECT user_id, fio, phone, login, type FROM users ORDER BY type, fio")
+                    for row in cursor.fetchall():
+                        fios, users = directory.setdefault(row['type'], ([], []))
+                        fios.append(row['fio'])
+                        users.append(dict(row))
+                self._role_directory = directory
+            return self._role_directory
+    
+    def _invalidate_role_directory(self):
+        """Сброс справочника ролей после изменения пользователей"""
+        with self._role_directory_lock:
+            self._role_directory = None
+            self.users_version += 1
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Потоковая выгрузка заявок и комментариев в CSV, NDJSON и Parquet
+"""
+
+import csv
+import io
+import json
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Сколько строк читается из курсора за один раз
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Колонки в формате InputData*.csv: (заголовок файла, колонка БД, значение для NULL)
+REQUEST_COLUMNS = [
+    ('requestID', 'request_id', ''),
+    ('startDate', 'start_date', ''),
+    ('homeTechType', 'home_tech_type', ''),
+    ('homeTechModel', 'home_tech_model', ''),
+    ('problemDescryption', 'problem_description', ''),
+    ('requestStatus', 'request_status', ''),
+    ('completionDate', 'completion_date', 'null'),
+    ('repairParts', 'repair_parts', ''),
+    ('masterID', 'master_id', 'null'),
+    ('clientID', 'client_id', ''),
+]
+
+COMMENT_COLUMNS = [
+    ('commentID', 'comment_id', ''),
+    ('message', 'message', ''),
+    ('masterID', 'master_id', ''),
+    ('requestID', 'request_id', ''),
+    ('createdAt', 'created_at', ''),
+]
+
+# Типы колонок для Parquet (остальные - строки)
+INTEGER_COLUMNS = {'request_id', 'comment_id', 'master_id', 'client_id'}
+DATE_COLUMNS = {'start_date', 'completion_date'}
+
+
+def parquet_available() -> bool:
+    """Установлен ли pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _iter_batches(db_name: str, query: str, params: list) -> Iterator[List[tuple]]:
+    """Чтение строк из курсора порциями (память не зависит от объема выгрузки)"""
+    conn = sqlite3.connect(db_name)
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def _build_query(table: str, columns: List[tuple], filters: Dict) -> Tuple[str, list]:
+    """SQL для выгрузки с фильтрами по статусу и периоду"""
+    date_column = 'start_date' if table == 'requests' else 'created_at'
+    query = f"SELECT {', '.join(column for _, column, _ in columns)} FROM {table} WHERE 1=1"
+    params = []
+
+    if filters.get('status') and table == 'requests':
+        query += " AND request_status = ?"
+        params.append(filters['status'])
+    if filters.get('date_from'):
+        query += f" AND {date_column} >= ?"
+        params.append(str(filters['date_from']))
+    if filters.get('date_to'):
+        query += f" AND {date_column} < date(?, '+1 day')"
+        params.append(str(filters['date_to']))
+
+    # Порядок по первичному ключу: чтение идет по B-дереву таблицы без сортировки
+    query += f" ORDER BY {columns[0][1]}"
+    return query, params
+
+
+def _stream_csv(batches: Iterator[List[tuple]], columns: List[tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';', lineterminator='\n')
+    writer.writerow([header for header, _, _ in columns])
+    null_values = [null for _, _, null in columns]
+
+    for rows in batches:
+        writer.writerows(
+            [null if value is None else value for value, null in zip(row, null_values)]
+            for row in rows
+        )
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _stream_ndjson(batches: Iterator[List[tuple]], columns: List[tuple]) -> Iterator[bytes]:
+    names = [column for _, column, _ in columns]
+    for rows in batches:
+        chunk = ''.join(
+            json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n'
+            for row in rows
+        )
+        yield chunk.encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Файл только для записи, отдающий накопленные байты порциями"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _stream_parquet(batches: Iterator[List[tuple]], columns: List[tuple]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    names = [column for _, column, _ in columns]
+    schema = pa.schema([
+        (name, pa.int64() if name in INTEGER_COLUMNS else pa.date32() if name in DATE_COLUMNS else pa.string())
+        for name in names
+    ])
+
+    sink = _ChunkSink()
+    # Каждая порция строк становится отдельной row group
+    with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema) as writer:
+        for rows in batches:
+            arrays = []
+            for index, field in enumerate(schema):
+                values = pa.array([row[index] for row in rows],
+                                  type=pa.string() if field.type == pa.date32() else field.type)
+                arrays.append(values.cast(field.type))
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+_STREAMERS = {
+    'csv': _stream_csv,
+    'ndjson': _stream_ndjson,
+    'parquet': _stream_parquet,
+}
+
+
+def export_table(db_name: str, table: str, export_format: str,
+                 filters: Optional[Dict] = None) -> Iterator[bytes]:
+    """Генератор байтов выгрузки таблицы requests или comments"""
+    columns = REQUEST_COLUMNS if table == 'requests' else COMMENT_COLUMNS
+    query, params = _build_query(table, columns, filters or {})
+    return _STREAMERS[export_format](_iter_batches(db_name, query, params), columns)
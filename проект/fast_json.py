@@ -0,0 +1,62 @@
+"""
+Быстрая отдача списков строк из БД в JSON
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter, create_model
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Проверять строки моделями ответа перед отправкой (для отладки).
+# По умолчанию строки из БД считаются доверенными: схема таблиц совпадает с моделями.
+VALIDATE_RESPONSES = os.environ.get('REPAIR_VALIDATE_RESPONSES') == '1'
+
+_adapters = {}
+
+
+def dumps(data) -> bytes:
+    """Сериализация в JSON (orjson, если установлен)"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(Response):
+    """JSON-ответ без jsonable_encoder и стандартного json-кодировщика"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _partial_model(model):
+    """Модель с теми же полями, все необязательные (для ответов с выбранными полями)"""
+    return create_model(f"Partial{model.__name__}",
+                        **{name: (Optional[field.annotation], None) for name, field in model.model_fields.items()})
+
+
+def _get_adapter(model, partial: bool = False) -> TypeAdapter:
+    adapter = _adapters.get((model, partial))
+    if adapter is None:
+        adapter = _adapters[(model, partial)] = TypeAdapter(List[_partial_model(model) if partial else model])
+    return adapter
+
+
+def rows_response(rows: List[Dict], model, headers: Optional[Dict] = None,
+                  partial: bool = False) -> FastJSONResponse:
+    """Ответ со списком строк из БД в обход поэлементной валидации FastAPI
+
+    partial - в строках только часть полей модели (параметр fields), отсутствующие не проверяются.
+    """
+    if VALIDATE_RESPONSES:
+        # Одна проверка всего списка вместо модели на каждую строку
+        adapter = _get_adapter(model, partial)
+        rows = adapter.dump_python(adapter.validate_python(rows), mode='json', exclude_unset=partial)
+    return FastJSONResponse(rows, headers=headers)
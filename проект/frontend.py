@@ -6,6 +6,12 @@ import qrcode
 from PIL import Image
 import io
 import time
+import os
+
+from api_client import API_URL, ApiSession, gather
+import instrumentation
+from instrumentation import span
+from models import Action, Permission, UserRole, comment_cursor, parse_comment_cursor
 
 # Настройки страницы
 st.set_page_config(
@@ -59,12 +65,49 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# API URL
-API_URL = "http://localhost:8000"
+# Поля заявок, нужные спискам (остальное запрашивается только в деталях)
+DASHBOARD_FIELDS = ['request_id', 'home_tech_type', 'home_tech_model', 'request_status',
+                    'problem_description', 'client_fio', 'master_fio', 'start_date']
+TABLE_FIELDS = ['request_id', 'home_tech_type', 'home_tech_model',
+                'request_status', 'client_fio', 'start_date']
+
+# Панель замеров времени видна всегда (иначе - только по адресу с ?debug=1)
+DEBUG_PANEL = os.environ.get('REPAIR_FRONTEND_DEBUG') == '1'
+# Этапы в панели замеров
+TIMING_LABELS = {
+    'http': "Запросы к API (сеть)",
+    'json': "Разбор JSON",
+    'api': "Методы клиента API",
+    'dataframe': "Построение DataFrame",
+    'render': "Отрисовка страницы",
+    'page': "Страницы show_* всего",
+}
+
+# Значение списка мастеров "назначить автоматически"
+AUTO_ASSIGN = "auto"
+
+# Комментариев на странице ленты (более ранние подгружаются по кнопке)
+COMMENTS_PAGE_SIZE = 20
+
+# Заявок на странице таблицы (с сервера загружается только текущая страница)
+REQUESTS_PAGE_SIZE = 50
+
+# Заголовки колонок таблиц заявок
+REQUEST_COLUMN_LABELS = {
+    'request_id': "ID",
+    'home_tech_type': "Техника",
+    'home_tech_model': "Модель",
+    'request_status': "Статус",
+    'problem_description': "Описание проблемы",
+    'client_fio': "Клиент",
+    'master_fio': "Мастер",
+    'start_date': "Дата",
+}
 
 class RepairServiceApp:
     def __init__(self):
-        self.session = requests.Session()
+        # Пул соединений, таймауты и повторы - в api_client
+        self.session = ApiSession()
         self.current_user = None
     
     def login(self, login, password):
@@ -75,27 +118,37 @@ class RepairServiceApp:
                 json={"login": login, "password": password}
             )
             if response.status_code == 200:
-                self.current_user = response.json()
+                self.set_current_user(response.json())
                 st.session_state['user'] = self.current_user
                 st.success(f"Добро пожаловать, {self.current_user['fio']}!")
                 return True
             else:
                 st.error("Неверный логин или пароль")
                 return False
-        except requests.exceptions.ConnectionError:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             st.error("Не удалось подключиться к серверу. Убедитесь, что сервер запущен.")
             return False
     
+    def set_current_user(self, user):
+        """Установка текущего пользователя и его токена для запросов к API"""
+        self.current_user = user
+        if user and user.get('access_token'):
+            self.session.headers['Authorization'] = f"Bearer {user['access_token']}"
+        else:
+            self.session.headers.pop('Authorization', None)
+    
     def logout(self):
         """Выход из системы"""
-        self.current_user = None
+        self.set_current_user(None)
         st.session_state.clear()
         st.success("Вы успешно вышли из системы")
     
-    def get_requests(self, filters=None):
-        """Получение списка заявок"""
+    def get_requests(self, filters=None, fields=None):
+        """Получение списка заявок (fields - только нужные поля)"""
         try:
-            params = filters or {}
+            params = dict(filters or {})
+            if fields:
+                params['fields'] = ','.join(fields)
             response = self.session.get(f"{API_URL}/requests/", params=params)
             if response.status_code == 200:
                 return response.json()
@@ -103,9 +156,25 @@ class RepairServiceApp:
         except:
             return []
     
-    def create_request(self, request_data):
+    def get_requests_page(self, filters=None, fields=None, page=0):
+        """Страница заявок (нумерация с 0) и общее число найденных"""
+        params = dict(filters or {})
+        if fields:
+            params['fields'] = ','.join(fields)
+        params['limit'] = REQUESTS_PAGE_SIZE
+        params['offset'] = page * REQUESTS_PAGE_SIZE
+        try:
+            response = self.session.get(f"{API_URL}/requests/", params=params)
+        except requests.RequestException:
+            return [], 0
+        if response.status_code == 200:
+            return response.json(), int(response.headers.get('X-Total-Count', 0))
+        return [], 0
+    
+    def create_request(self, request_data, auto_assign=False):
         """Создание новой заявки"""
-        response = self.session.post(f"{API_URL}/requests/", json=request_data)
+        params = {"auto_assign": "true"} if auto_assign else None
+        response = self.session.post(f"{API_URL}/requests/", json=request_data, params=params)
         return response
     
     def update_request(self, request_id, update_data):
@@ -119,7 +188,7 @@ class RepairServiceApp:
             return None
         
         # Проверяем, может ли пользователь добавлять комментарии
-        if not self.can_add_comments():
+        if not self.can(Action.ADD_COMMENTS):
             st.warning("У вас нет прав для добавления комментариев")
             return None
         
@@ -140,12 +209,17 @@ class RepairServiceApp:
             print(f"Ошибка при добавлении комментария: {e}")
             return None
     
-    def get_comments(self, request_id):
-        """Получение комментариев к заявке"""
-        response = self.session.get(f"{API_URL}/comments/{request_id}")
+    def get_comments(self, request_id, before=None, since=None):
+        """Страница комментариев к заявке и курсор следующей (более ранней) страницы"""
+        params = {"limit": COMMENTS_PAGE_SIZE}
+        if before:
+            params["before"] = before
+        if since:
+            params["since"] = since
+        response = self.session.get(f"{API_URL}/comments/{request_id}", params=params)
         if response.status_code == 200:
-            return response.json()
-        return []
+            return response.json(), response.headers.get("X-Next-Cursor")
+        return [], None
     
     def get_statistics(self):
         """Получение статистики"""
@@ -154,6 +228,13 @@ class RepairServiceApp:
             return response.json()
         return None
     
+    def get_request_full(self, request_id):
+        """Карточка заявки одним запросом: заявка, комментарии, мастера и клиенты"""
+        response = self.session.get(f"{API_URL}/requests/{request_id}/full")
+        if response.status_code == 200:
+            return response.json()
+        return None
+    
     def get_users_by_role(self, role):
         """Получение пользователей по роли"""
         response = self.session.get(f"{API_URL}/users/role/{role}")
@@ -186,60 +267,24 @@ class RepairServiceApp:
         response = self.session.delete(f"{API_URL}/users/{user_id}")
         return response
     
-    # Методы проверки прав
-    def can_create_request(self):
-        """Может ли пользователь создавать заявки"""
-        if not self.current_user:
-            return False
-        return self.current_user['type'] in ['Заказчик', 'Менеджер', 'Оператор']
-
-    def can_edit_requests(self):
-        """Может ли пользователь редактировать заявки"""
-        if not self.current_user:
-            return False
-        return self.current_user['type'] in ['Менеджер', 'Оператор', 'Менеджер по качеству']
-
-    def can_manage_users(self):
-        """Может ли пользователь управлять пользователями"""
+    # Методы проверки прав (матрица прав общая с backend, см. models.Permission)
+    def can(self, *actions):
+        """Разрешены ли текущему пользователю все перечисленные действия"""
         if not self.current_user:
             return False
-        return self.current_user['type'] in ['Менеджер']
-
-    def can_view_all_requests(self):
-        """Может ли пользователь просматривать все заявки"""
-        if not self.current_user:
-            return False
-        return self.current_user['type'] in ['Менеджер', 'Оператор', 'Менеджер по качеству', 'Мастер']
+        return Permission.check(self.current_user['type'], *actions)
 
     def is_client(self):
         """Является ли пользователь клиентом"""
         if not self.current_user:
             return False
-        return self.current_user['type'] == 'Заказчик'
+        return self.current_user['type'] == UserRole.CLIENT
 
     def is_master(self):
         """Является ли пользователь мастером"""
         if not self.current_user:
             return False
-        return self.current_user['type'] == 'Мастер'
-
-    def can_add_comments(self):
-        """Может ли пользователь добавлять комментарии"""
-        if not self.current_user:
-            return False
-        return self.current_user['type'] in ['Мастер', 'Менеджер', 'Оператор', 'Менеджер по качеству']
-    
-    def can_view_statistics(self):
-        """Может ли пользователь просматривать статистику"""
-        if not self.current_user:
-            return False
-        return self.current_user['type'] in ['Менеджер', 'Оператор', 'Менеджер по качеству']
-
-    def can_search_requests(self):
-        """Может ли пользователь искать заявки"""
-        if not self.current_user:
-            return False
-        return self.current_user['type'] in ['Менеджер', 'Оператор', 'Менеджер по качеству', 'Мастер']
+        return self.current_user['type'] == UserRole.MASTER
 
     def get_role_badge(self):
         """Получение бейджа роли"""
@@ -262,13 +307,51 @@ class RepairServiceApp:
         
         return f'<span class="role-badge {role_class}">{role_display}</span>'
 def main():
+    # Замеры перезапуска: API, DataFrame и страницы (панель - по адресу с ?debug=1)
+    profile = instrumentation.start_rerun()
+    try:
+        run_app()
+    finally:
+        history = st.session_state.setdefault('_timings', [])
+        record = instrumentation.finish_rerun(profile, history, page=st.session_state.get('menu'))
+    
+    if DEBUG_PANEL or st.query_params.get('debug') == '1':
+        render_debug_panel(record, history)
+
+def render_debug_panel(record, history):
+    """Скрытая панель отладки: разбивка времени последнего перезапуска и выгрузка истории"""
+    with st.sidebar.expander("Замеры времени", expanded=False):
+        breakdown = record['breakdown']
+        st.markdown(f"**Перезапуск:** {breakdown['total']:.0f} мс")
+        st.dataframe(
+            pd.DataFrame(
+                [(name, breakdown[category]) for category, name in TIMING_LABELS.items()],
+                columns=['Этап', 'мс']
+            ),
+            hide_index=True, use_container_width=True
+        )
+        
+        spans = pd.DataFrame(record['spans'], columns=['category', 'name', 'ms', 'depth', 'outer'])
+        if not spans.empty:
+            st.markdown("**Самые долгие вызовы**")
+            st.dataframe(spans.nlargest(10, 'ms')[['category', 'name', 'ms']],
+                         hide_index=True, use_container_width=True)
+        
+        if len(history) > 1:
+            st.markdown("**Последние перезапуски**")
+            st.line_chart(pd.DataFrame([r['breakdown'] for r in history])[['total', 'api', 'dataframe', 'render']])
+        
+        st.download_button("Выгрузить замеры (NDJSON)", instrumentation.to_ndjson(history),
+                           file_name="frontend_timings.ndjson", mime="application/x-ndjson")
+
+def run_app():
     app = RepairServiceApp()
     
     # Инициализация сессии
     if 'user' not in st.session_state:
         st.session_state.user = None
     else:
-        app.current_user = st.session_state.user
+        app.set_current_user(st.session_state.user)
     
     # Главный заголовок
     st.markdown('<h1 class="main-header"> Система учета заявок на ремонт техники</h1>', unsafe_allow_html=True)
@@ -321,23 +404,23 @@ def show_main_interface(app):
         if app.is_client():
             # Меню для клиента
             menu_options = ["Мои заявки"]
-            if app.can_create_request():
+            if app.can(Action.CREATE_REQUEST):
                 menu_options.append("Новая заявка")
             menu_options.append("Оценка качества")
         else:
             # Меню для других ролей
             menu_options = ["Дашборд"]
-            if app.can_search_requests():
+            if app.can(Action.SEARCH_REQUESTS):
                 menu_options.append("Поиск заявок")
-            if app.can_view_statistics():
+            if app.can(Action.VIEW_STATISTICS):
                 menu_options.append("Статистика")
-            if app.can_create_request():
+            if app.can(Action.CREATE_REQUEST):
                 menu_options.insert(1, "Новая заявка")
-            if app.can_manage_users():
+            if app.can(Action.MANAGE_USERS):
                 menu_options.append("Управление пользователями")
             menu_options.append("Оценка качества")
         
-        selected_menu = st.radio("Меню", menu_options)
+        selected_menu = st.radio("Меню", menu_options, key="menu")
         
         st.markdown("---")
         
@@ -351,17 +434,17 @@ def show_main_interface(app):
     elif selected_menu == "Новая заявка":
         show_new_request_form(app)
     elif selected_menu == "Поиск заявок":
-        if app.can_search_requests():
+        if app.can(Action.SEARCH_REQUESTS):
             show_search_requests(app)
         else:
             st.warning("У вас нет прав для поиска заявок")
     elif selected_menu == "Статистика":
-        if app.can_view_statistics():
+        if app.can(Action.VIEW_STATISTICS):
             show_statistics(app)
         else:
             st.warning("У вас нет прав для просмотра статистики")
     elif selected_menu == "Управление пользователями":
-        if app.can_manage_users():
+        if app.can(Action.MANAGE_USERS):
             show_user_management(app)
         else:
             st.warning("У вас нет прав для управления пользователями")
@@ -375,28 +458,18 @@ def show_dashboard(app):
     else:
         st.markdown('<h2 class="sub-header">Активные заявки</h2>', unsafe_allow_html=True)
     
-    # Получение заявок в зависимости от роли
+    # Фильтры применяются на сервере, таблица получает только текущую страницу
+    filters = {}
     if app.is_client():
         # Клиент видит только свои заявки
-        requests_data = app.get_requests({"client_id": app.current_user['user_id']})
-        
-        if not requests_data:
-            # Если нет заявок, показываем сообщение
-            st.markdown('<div class="no-requests">', unsafe_allow_html=True)
-            st.markdown("### У вас пока нет заявок")
-            st.markdown("Нажмите **'+ Новая заявка'** в меню, чтобы создать первую заявку")
-            st.markdown("</div>", unsafe_allow_html=True)
-            return
+        filters['client_id'] = app.current_user['user_id']
     elif app.is_master():
         # Мастер видит только назначенные ему заявки
         st.info("Вы видите только назначенные вам заявки")
-        requests_data = app.get_requests({"master_id": app.current_user['user_id']})
-    elif app.can_view_all_requests():
-        # Остальные роли видят все заявки
-        requests_data = app.get_requests()
-    else:
-        requests_data = []
+        filters['master_id'] = app.current_user['user_id']
+    elif not app.can(Action.VIEW_ALL_REQUESTS):
         st.warning("У вас нет прав для просмотра заявок")
+        return
     
     # Для не-клиентов показываем фильтры
     if not app.is_client():
@@ -409,66 +482,21 @@ def show_dashboard(app):
         with col2:
             search_term = st.text_input("Поиск по названию или модели")
         
-        # Применение фильтров
         if status_filter != "Все":
-            filtered_requests = [r for r in requests_data if r['request_status'] == status_filter]
-        else:
-            filtered_requests = requests_data
-        
+            filters['status'] = status_filter
         if search_term:
-            filtered_requests = [
-                r for r in filtered_requests 
-                if search_term.lower() in r['home_tech_type'].lower() 
-                or search_term.lower() in r['home_tech_model'].lower()
-            ]
-    else:
-        # Для клиента не показываем фильтры
-        filtered_requests = requests_data
+            filters['search'] = search_term
     
-    # Отображение заявок
-    if not filtered_requests:
-        if app.is_client():
-            st.info("У вас пока нет заявок")
-        else:
-            st.info("Заявки не найдены")
-    else:
-        # Показываем счетчик
-        if app.is_client():
-            st.info(f"У вас {len(filtered_requests)} заявок")
-        else:
-            st.info(f"Найдено заявок: {len(filtered_requests)}")
-        
-        for request in filtered_requests[:20]:  # Показываем первые 20
-            with st.container():
-                col1, col2, col3 = st.columns([3, 2, 1])
-                
-                with col1:
-                    status_class = {
-                        "Новая заявка": "status-new",
-                        "В процессе ремонта": "status-in-progress",
-                        "Готова к выдаче": "status-ready",
-                        "Ожидание запчастей": "status-waiting"
-                    }.get(request['request_status'], "")
-                    
-                    st.markdown(f"**{request['home_tech_type']}** - {request['home_tech_model']}")
-                    st.markdown(f"<span class='{status_class}'>{request['request_status']}</span>", unsafe_allow_html=True)
-                    st.markdown(f"*{request['problem_description'][:100]}...*" if len(request['problem_description']) > 100 else f"*{request['problem_description']}*")
-                
-                with col2:
-                    if not app.is_client():
-                        st.markdown(f"**Клиент:** {request['client_fio'] or 'Не указан'}")
-                    st.markdown(f"**Мастер:** {request['master_fio'] or 'Не назначен'}")
-                    st.markdown(f"**Дата:** {request['start_date']}")
-                
-                with col3:
-                    if st.button("Подробнее", key=f"view_{request['request_id']}"):
-                        st.session_state['selected_request'] = request['request_id']
-                
-                st.markdown("---")
-        
-        # Пагинация
-        if len(filtered_requests) > 20:
-            st.info(f"Показано 20 из {len(filtered_requests)} заявок")
+    total = show_requests_grid(app, filters, DASHBOARD_FIELDS, key="dashboard")
+    if not total:
+        if app.is_client() and not filters.get('status') and not filters.get('search'):
+            # Если нет заявок, показываем сообщение
+            st.markdown('<div class="no-requests">', unsafe_allow_html=True)
+            st.markdown("### У вас пока нет заявок")
+            st.markdown("Нажмите **'+ Новая заявка'** в меню, чтобы создать первую заявку")
+            st.markdown("</div>", unsafe_allow_html=True)
+            return
+        st.info("Заявки не найдены")
     
     # Детальный просмотр заявки
     if 'selected_request' in st.session_state:
@@ -497,8 +525,12 @@ def show_new_request_form(app):
                 st.info("Мастер будет назначен позже оператором сервиса")
                 master_id = None
             else:
-                # Получение списка клиентов для менеджера/оператора
-                clients = app.get_users_by_role("Заказчик")
+                # Списки клиентов и мастеров загружаются параллельно
+                directories = gather({
+                    'clients': lambda: app.get_users_by_role("Заказчик"),
+                    'masters': lambda: app.get_users_by_role("Мастер"),
+                })
+                clients = directories['clients']
                 client_options = {c['user_id']: f"{c['fio']} ({c['phone']})" for c in clients}
                 
                 if client_options:
@@ -508,10 +540,10 @@ def show_new_request_form(app):
                     st.warning("Клиенты не найдены в системе")
                     client_id = None
                 
-                # Получение списка мастеров для менеджера/оператора
-                masters = app.get_users_by_role("Мастер")
+                masters = directories['masters']
                 master_options = {m['user_id']: m['fio'] for m in masters}
                 master_options[None] = "Не назначен"
+                master_options[AUTO_ASSIGN] = "Назначить автоматически (по загрузке)"
                 
                 master_id = st.selectbox("Мастер (опционально)", options=list(master_options.keys()),
                                        format_func=lambda x: master_options[x])
@@ -529,11 +561,11 @@ def show_new_request_form(app):
                     "home_tech_model": home_tech_model,
                     "problem_description": problem_description,
                     "client_id": client_id,
-                    "master_id": master_id if master_id != None else None
+                    "master_id": master_id if master_id != AUTO_ASSIGN else None
                 }
                 
                 with st.spinner("Создание заявки..."):
-                    response = app.create_request(request_data)
+                    response = app.create_request(request_data, auto_assign=master_id == AUTO_ASSIGN)
                     
                     if response.status_code == 201:
                         st.success("Заявка успешно создана!")
@@ -552,6 +584,7 @@ def show_search_requests(app):
     
     col1, col2 = st.columns(2)
     
+    # Условия поиска сохраняются: таблица листается и выбирается строка без повторного нажатия
     with col1:
         search_by = st.radio("Искать по:", ["ID заявки", "Типу техники", "Статусу", "Клиенту"])
     
@@ -559,27 +592,18 @@ def show_search_requests(app):
         if search_by == "ID заявки":
             request_id = st.number_input("ID заявки", min_value=1, step=1, value=1)
             if st.button("Найти по ID"):
-                requests = app.get_requests({"request_id": int(request_id)})
-                if requests:
-                    show_requests_table(requests, app)
-                else:
-                    st.info("Заявка не найдена")
+                st.session_state['search_filters'] = {"request_id": int(request_id)}
         
         elif search_by == "Типу техники":
             tech_type = st.text_input("Тип техники", placeholder="Например: Холодильник")
             if st.button("Найти по типу"):
-                requests = app.get_requests({"search": tech_type})
-                show_requests_table(requests, app)
+                st.session_state['search_filters'] = {"search": tech_type}
         
         elif search_by == "Статусу":
             status_options = ["Все", "Новая заявка", "В процессе ремонта", "Ожидание запчастей", "Готова к выдаче"]
             selected_status = st.selectbox("Статус", status_options)
             if st.button("Найти по статусу"):
-                if selected_status != "Все":
-                    requests = app.get_requests({"status": selected_status})
-                else:
-                    requests = app.get_requests()
-                show_requests_table(requests, app)
+                st.session_state['search_filters'] = {"status": selected_status} if selected_status != "Все" else {}
         
         elif search_by == "Клиенту":
             clients = app.get_users_by_role("Клиент")
@@ -588,58 +612,82 @@ def show_search_requests(app):
                 selected_client = st.selectbox("Выберите клиента", options=list(client_options.keys()),
                                              format_func=lambda x: client_options[x])
                 if st.button("Найти по клиенту"):
-                    requests = app.get_requests({"client_id": selected_client})
-                    show_requests_table(requests, app)
+                    st.session_state['search_filters'] = {"client_id": selected_client}
             else:
                 st.info("Клиенты не найдены")
+    
+    if 'search_filters' in st.session_state:
+        if not show_requests_grid(app, st.session_state['search_filters'], TABLE_FIELDS, key="search"):
+            st.info("Заявки не найдены")
+        if 'selected_request' in st.session_state:
+            show_request_details(app, st.session_state['selected_request'])
 
-def show_requests_table(requests, app):
-    """Отображение заявок в таблице"""
-    if requests:
-        df = pd.DataFrame(requests)
-        # Выбор нужных колонок
-        display_columns = ['request_id', 'home_tech_type', 'home_tech_model', 
-                          'request_status', 'client_fio', 'start_date']
-        df_display = df[display_columns]
-        
-        # Форматирование статуса
-        def format_status(status):
-            if status == "Новая заявка":
-                return "" + status
-            elif status == "В процессе ремонта":
-                return "" + status
-            elif status == "Готова к выдаче":
-                return "" + status
-            elif status == "Ожидание запчастей":
-                return "" + status
-            return status
-        
-        df_display['request_status'] = df_display['request_status'].apply(format_status)
-        
-        st.dataframe(df_display, use_container_width=True, height=400)
-        
-        # Кнопки для детального просмотра
-        st.markdown("### Выберите заявку для детального просмотра:")
-        cols = st.columns(3)
-        for idx, request in enumerate(requests[:9]):  # Показываем максимум 9 кнопок
-            with cols[idx % 3]:
-                if st.button(f"Заявка #{request['request_id']}", key=f"detail_{request['request_id']}"):
-                    st.session_state['selected_request'] = request['request_id']
-                    st.rerun()
-    else:
-        st.info("Заявки не найдены")
+def show_requests_grid(app, filters, fields, key):
+    """Таблица заявок: одна страница с сервера, выбор строки открывает детали
+    
+    Возвращает общее число найденных заявок.
+    """
+    page_key = f"{key}_page"
+    # Новые условия - с первой страницы
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = dict(filters)
+        st.session_state[page_key] = 1
+    
+    page = st.session_state.get(page_key, 1)
+    rows, total = app.get_requests_page(filters, fields, page - 1)
+    if not total:
+        return 0
+    pages = (total + REQUESTS_PAGE_SIZE - 1) // REQUESTS_PAGE_SIZE
+    if page > pages:
+        # Число заявок уменьшилось - последняя существующая страница
+        page = st.session_state[page_key] = pages
+        rows, total = app.get_requests_page(filters, fields, page - 1)
+    
+    # Форматирование целыми колонками, без обработки по строкам
+    with span(instrumentation.DATAFRAME, f"{key}_grid"):
+        frame = pd.DataFrame(rows, columns=fields)
+        if 'problem_description' in frame:
+            frame['problem_description'] = frame['problem_description'].str.slice(0, 100)
+        if 'client_fio' in frame:
+            frame['client_fio'] = frame['client_fio'].fillna("Не указан")
+        if 'master_fio' in frame:
+            frame['master_fio'] = frame['master_fio'].fillna("Не назначен")
+    
+    event = st.dataframe(
+        frame,
+        hide_index=True,
+        use_container_width=True,
+        column_config={field: REQUEST_COLUMN_LABELS.get(field, field) for field in fields},
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"{key}_grid"
+    )
+    
+    # Выбор строки открывает детали один раз (после "Закрыть детали" выбор не повторяется)
+    selected = [int(frame['request_id'].iloc[row]) for row in event.selection.rows]
+    if selected and selected != st.session_state.get(f"{key}_selected"):
+        st.session_state['selected_request'] = selected[0]
+    st.session_state[f"{key}_selected"] = selected
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        st.number_input(f"Страница (всего {pages})", min_value=1, max_value=pages, key=page_key)
+    with col2:
+        st.caption(f"Найдено заявок: {total}. Выберите строку, чтобы открыть заявку")
+    return total
 
 def show_request_details(app, request_id):
     """Детальное отображение заявки"""
     st.markdown("---")
     st.markdown("### Детали заявки")
     
-    requests = app.get_requests({"request_id": request_id})
-    if not requests:
+    # Заявка, комментарии и справочники приходят одним запросом
+    details = app.get_request_full(request_id)
+    if not details:
         st.error("Заявка не найдена")
         return
     
-    request = requests[0]
+    request = details['request']
     
     # Проверка прав доступа
     if app.is_client() and request['client_id'] != app.current_user['user_id']:
@@ -676,19 +724,24 @@ def show_request_details(app, request_id):
     
     # Комментарии
     st.markdown("### Комментарии")
-    comments = app.get_comments(request_id)
+    timeline = load_comment_timeline(app, request_id, details['comments'], details['next_cursor'])
+    comments = timeline['comments']
     
     if comments:
         for comment in comments:
             with st.container():
-                st.markdown(f"**{comment['master_fio']}** ({comment['created_at']}):")
+                st.markdown(f"**{comment['master_fio']}** ({comment['created_at'].replace('T', ' ')}):")
                 st.markdown(f"> {comment['message']}")
                 st.markdown("---")
+        if timeline['next_cursor'] and st.button("Показать более ранние комментарии"):
+            page, timeline['next_cursor'] = app.get_comments(request_id, before=timeline['next_cursor'])
+            comments.extend(page)
+            st.rerun()
     else:
         st.info("Комментариев пока нет")
     
     # Форма добавления комментария
-    if app.can_add_comments():
+    if app.can(Action.ADD_COMMENTS):
         st.markdown("### Добавить комментарий")
         with st.form(f"add_comment_{request_id}"):
             new_comment = st.text_area("Текст комментария", height=100)
@@ -705,8 +758,8 @@ def show_request_details(app, request_id):
                     st.warning("Введите текст комментария")
     
     # Полное изменение заявки (для Менеджера, Оператора, Менеджера по качеству)
-    if app.can_edit_requests():
-        show_full_update_form(app, request_id, request)
+    if app.can(Action.EDIT_REQUEST):
+        show_full_update_form(app, request_id, request, details['masters'], details['clients'])
     else:
         st.info("Только менеджер, оператор или менеджер по качеству могут редактировать заявки")
     
@@ -714,7 +767,30 @@ def show_request_details(app, request_id):
         st.session_state.pop('selected_request', None)
         st.rerun()
 
-def show_full_update_form(app, request_id, request):
+def load_comment_timeline(app, request_id, first_page, next_cursor):
+    """Лента комментариев заявки из session_state
+    
+    first_page - свежая первая страница (из карточки заявки): при повторном показе
+    из нее берутся только новые комментарии, остальные запрашиваются лишь если
+    новых больше страницы.
+    """
+    key = f"comments_{request_id}"
+    timeline = st.session_state.get(key)
+    if not timeline or not timeline['comments']:
+        timeline = st.session_state[key] = {'comments': first_page, 'next_cursor': next_cursor}
+        return timeline
+    
+    newest = comment_cursor(timeline['comments'][0])
+    newest_key = parse_comment_cursor(newest)
+    new_comments = [c for c in first_page if parse_comment_cursor(comment_cursor(c)) > newest_key]
+    before = next_cursor if len(new_comments) == len(first_page) else None
+    while before:
+        page, before = app.get_comments(request_id, before=before, since=newest)
+        new_comments.extend(page)
+    timeline['comments'][:0] = new_comments
+    return timeline
+
+def show_full_update_form(app, request_id, request, masters, clients):
     """Полная форма обновления заявки"""
     st.markdown("### Полное изменение заявки")
     
@@ -742,7 +818,6 @@ def show_full_update_form(app, request_id, request):
         
         with col2:
             # Выбор клиента
-            clients = app.get_users_by_role("Заказчик")  # Используем "Заказчик" для поиска
             client_options = {c['user_id']: f"{c['fio']} ({c['phone']})" for c in clients}
             current_client_id = request.get('client_id')
             
@@ -757,7 +832,6 @@ def show_full_update_form(app, request_id, request):
                                        index=default_client_index)
             
             # Выбор мастера
-            masters = app.get_users_by_role("Мастер")
             master_options = {m['user_id']: m['fio'] for m in masters}
             master_options[None] = "Не назначен"
             
@@ -902,34 +976,36 @@ def show_statistics(app):
 
 def show_user_management(app):
     """Управление пользователями"""
-    if not app.can_manage_users():
+    if not app.can(Action.MANAGE_USERS):
         st.warning("У вас нет прав для управления пользователями")
         return
     
     st.markdown('<h2 class="sub-header">Управление пользователями</h2>', unsafe_allow_html=True)
     
     tab1, tab2, tab3 = st.tabs(["Список пользователей", "Добавить пользователя", "Редактировать пользователя"])
+    # Содержимое всех вкладок строится при каждом запуске - список загружается один раз
+    users = app.get_all_users()
     
     with tab1:
         st.markdown("### Все пользователи системы")
-        users = app.get_all_users()
         
         if users:
             # Создаем DataFrame с пользователями
-            df = pd.DataFrame(users)
-            
-            # Добавляем цвет для ролей
-            def format_role(role):
-                role_colors = {
-                    'Менеджер': '🟡',
-                    'Мастер': '🔵', 
-                    'Оператор': '🟢',
-                    'Клиент': '🟣',
-                    'Менеджер по качеству': '🔴'
-                }
-                return f"{role_colors.get(role, '⚪')} {role}"
-            
-            df['type'] = df['type'].apply(format_role)
+            with span(instrumentation.DATAFRAME, "users"):
+                df = pd.DataFrame(users)
+                
+                # Добавляем цвет для ролей
+                def format_role(role):
+                    role_colors = {
+                        'Менеджер': '🟡',
+                        'Мастер': '🔵', 
+                        'Оператор': '🟢',
+                        'Клиент': '🟣',
+                        'Менеджер по качеству': '🔴'
+                    }
+                    return f"{role_colors.get(role, '⚪')} {role}"
+                
+                df['type'] = df['type'].apply(format_role)
             
             # Отображаем таблицу
             st.dataframe(df[['user_id', 'fio', 'type', 'phone', 'login']], 
@@ -997,7 +1073,6 @@ def show_user_management(app):
     with tab3:
         st.markdown("### Редактирование пользователя")
         
-        users = app.get_all_users()
         if not users:
             st.info("Нет пользователей для редактирования")
         else:
@@ -1138,5 +1213,10 @@ def show_quality_assessment():
     st.markdown("---")
     st.markdown(f"[Или перейдите по ссылке]({qr_url})")
 
+# Замеры: методы клиента API и функции страниц (после всех определений)
+instrumentation.instrument_class(RepairServiceApp, instrumentation.API,
+                                 exclude=('set_current_user', 'is_client', 'is_master', 'can', 'get_role_badge'))
+instrumentation.instrument_functions(globals(), 'show_', instrumentation.PAGE)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
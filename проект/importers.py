@@ -0,0 +1,322 @@
+"""
+Импорт данных из CSV, TXT и XLSX: определение формата, потоковое чтение
+порциями и общая типизированная загрузка в SQLite
+"""
+
+import csv
+import hashlib
+import os
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from models import RequestStatus, UserRole
+
+# Сколько строк файла обрабатывается и записывается за один раз
+IMPORT_BATCH_SIZE = int(os.environ.get('REPAIR_IMPORT_BATCH_SIZE', 5000))
+
+# Сколько примеров ошибок сохраняется в результате (все - в файле отклоненных строк)
+MAX_SAMPLE_ERRORS = 20
+
+# Поддерживаемые форматы в порядке предпочтения, если найдено несколько файлов
+SOURCE_EXTENSIONS = ('.csv', '.txt', '.xlsx')
+
+# Описание таблиц: (заголовок файла, колонка БД, тип int/date/text, обязательное),
+# допустимые значения, ссылки на другие таблицы и уникальные колонки
+TABLE_SPECS = {
+    'users': {
+        'source': 'InputDataUsers',
+        'key': 'user_id',
+        'columns': [
+            ('userID', 'user_id', 'int', True),
+            ('fio', 'fio', 'text', True),
+            ('phone', 'phone', 'text', True),
+            ('login', 'login', 'text', True),
+            ('password', 'password', 'text', True),
+            ('type', 'type', 'text', True),
+        ],
+        'choices': {'type': [role.value for role in UserRole]},
+        'unique': ['login'],
+    },
+    'requests': {
+        'source': 'InputDataRequests',
+        'key': 'request_id',
+        'columns': [
+            ('requestID', 'request_id', 'int', True),
+            ('startDate', 'start_date', 'date', True),
+            ('homeTechType', 'home_tech_type', 'text', True),
+            ('homeTechModel', 'home_tech_model', 'text', True),
+            ('problemDescryption', 'problem_description', 'text', True),
+            ('requestStatus', 'request_status', 'text', True),
+            ('completionDate', 'completion_date', 'date', False),
+            ('repairParts', 'repair_parts', 'text', False),
+            ('masterID', 'master_id', 'int', False),
+            ('clientID', 'client_id', 'int', True),
+        ],
+        'choices': {'request_status': [status.value for status in RequestStatus]},
+        'references': {'client_id': ('users', 'user_id'), 'master_id': ('users', 'user_id')},
+    },
+    'comments': {
+        'source': 'InputDataComments',
+        'key': 'comment_id',
+        'columns': [
+            ('commentID', 'comment_id', 'int', True),
+            ('message', 'message', 'text', True),
+            ('masterID', 'master_id', 'int', True),
+            ('requestID', 'request_id', 'int', True),
+        ],
+        'references': {'master_id': ('users', 'user_id'), 'request_id': ('requests', 'request_id')},
+    },
+}
+
+
+def find_source(folder: str, name: str) -> Optional[str]:
+    """Поиск файла таблицы без учета регистра имени (inputDataUsers.xlsx, InputDataUsers.csv, ...)"""
+    if not os.path.isdir(folder):
+        return None
+    candidates = {}
+    for file_name in os.listdir(folder):
+        stem, ext = os.path.splitext(file_name)
+        if stem.lower() == name.lower() and ext.lower() in SOURCE_EXTENSIONS:
+            candidates[ext.lower()] = os.path.join(folder, file_name)
+    for ext in SOURCE_EXTENSIONS:
+        if ext in candidates:
+            return candidates[ext]
+    return None
+
+
+def _read_delimited(path: str, batch_size: int) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """Построчное чтение CSV/TXT (разделитель определяется по заголовку)"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        header_line = f.readline()
+        delimiter = max(';,\t', key=header_line.count)
+        header = next(csv.reader([header_line], delimiter=delimiter))
+        reader = csv.reader(f, delimiter=delimiter)
+        batch = []
+        for row in reader:
+            if not any(row):
+                continue
+            batch.append(tuple(row))
+            if len(batch) >= batch_size:
+                yield header, batch
+                batch = []
+        if batch:
+            yield header, batch
+
+
+def _read_xlsx(path: str, batch_size: int) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """Чтение первого листа XLSX в режиме read-only (книга не загружается в память целиком)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Для импорта XLSX требуется пакет openpyxl")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield header, batch
+                batch = []
+        if batch:
+            yield header, batch
+    finally:
+        workbook.close()
+
+
+_READERS = {
+    '.csv': _read_delimited,
+    '.txt': _read_delimited,
+    '.xlsx': _read_xlsx,
+}
+
+
+def read_batches(path: str, batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """Порции (заголовок, строки) из файла любого поддерживаемого формата"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in _READERS:
+        raise ValueError(f"Неподдерживаемый формат файла: {ext}")
+    return _READERS[ext](path, batch_size)
+
+
+def _existing_keys(cursor: sqlite3.Cursor, table: str, key: str, values: List) -> set:
+    """Какие из значений ключа уже есть в таблице"""
+    found = set()
+    # Ограничение SQLite на число параметров запроса
+    for start in range(0, len(values), 900):
+        chunk = values[start:start + 900]
+        cursor.execute(f"SELECT {key} FROM {table} WHERE {key} IN ({', '.join('?' * len(chunk))})", chunk)
+        found.update(row[0] for row in cursor.fetchall())
+    return found
+
+
+def _ensure_manifest(cursor: sqlite3.Cursor):
+    """Таблицы манифеста импорта: хеши файлов и хеши импортированных строк"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_files (
+            table_name TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            file_hash TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_rows (
+            table_name TEXT NOT NULL,
+            row_key INTEGER NOT NULL,
+            row_hash TEXT NOT NULL,
+            PRIMARY KEY (table_name, row_key)
+        ) WITHOUT ROWID
+    ''')
+
+
+def file_hash(path: str) -> str:
+    """Хеш содержимого файла (читается блоками)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_hash(record: tuple) -> str:
+    """Хеш строки после приведения типов (не зависит от формата файла)"""
+    return hashlib.blake2b(repr(record).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _rejected_keys(spec: Dict, rejected) -> List[int]:
+    """Ключи отклоненных строк, которые удалось разобрать (такие строки не удаляются при синхронизации)"""
+    key_header = next(file_header for file_header, column, _, _ in spec['columns'] if column == spec['key'])
+    source = next((name for name in rejected.columns if name.lower() == key_header.lower()), None)
+    if source is None:
+        return []
+    keys = []
+    for value in rejected[source].dropna():
+        try:
+            keys.append(int(float(value)))
+        except ValueError:
+            pass
+    return keys
+
+
+def import_table(table: str, path: str, db_name: str = "repair_service.db",
+                 batch_size: int = IMPORT_BATCH_SIZE, incremental: bool = False) -> Dict:
+    """Импорт файла в таблицу с обновлением существующих строк по ключу
+
+    Каждая порция сначала проверяется целиком (validation.validate_batch), в БД
+    пишутся только прошедшие проверку строки, остальные - в <файл>.rejected.csv.
+
+    Хеши файла и строк сохраняются в манифесте (import_files, import_rows).
+    В режиме incremental неизмененный файл пропускается целиком, записываются
+    только новые и измененные строки, а строки, ранее импортированные из файла
+    и исчезнувшие из него, удаляются. Строки, созданные не импортом, не трогаются.
+    """
+    from validation import rejected_path, validate_batch, write_rejected
+
+    spec = TABLE_SPECS[table]
+    columns = [column for _, column, _, _ in spec['columns']]
+    key = spec['key']
+    key_index = columns.index(key)
+    upsert = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT({key}) DO UPDATE SET "
+        + ', '.join(f"{column} = excluded.{column}" for column in columns if column != key)
+    )
+
+    result = {'total': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0,
+              'skipped': 0, 'errors': [], 'rejected_file': None, 'file_unchanged': False}
+    source_hash = file_hash(path)
+
+    conn = sqlite3.connect(db_name)
+    try:
+        cursor = conn.cursor()
+        _ensure_manifest(cursor)
+        cursor.execute("SELECT file_hash FROM import_files WHERE table_name = ?", (table,))
+        previous = cursor.fetchone()
+        if incremental and previous and previous[0] == source_hash:
+            result['file_unchanged'] = True
+            return result
+
+        reject_file = rejected_path(path)
+        if os.path.exists(reject_file):
+            os.remove(reject_file)
+
+        # Ключи связанных таблиц и занятые уникальные значения читаются один раз
+        references = {}
+        for column, (ref_table, ref_key) in spec.get('references', {}).items():
+            cursor.execute(f"SELECT {ref_key} FROM {ref_table}")
+            references[column] = {row[0] for row in cursor.fetchall()}
+        unique = {}
+        for column in spec.get('unique', []):
+            cursor.execute(f"SELECT {column}, {key} FROM {table}")
+            unique[column] = dict(cursor.fetchall())
+
+        known_hashes = {}
+        if incremental:
+            cursor.execute("SELECT row_key, row_hash FROM import_rows WHERE table_name = ?", (table,))
+            known_hashes = dict(cursor.fetchall())
+        seen = set()
+
+        # Строка 1 - заголовок
+        line = 2
+        for header, rows in read_batches(path, batch_size):
+            records, rejected = validate_batch(spec, header, rows, line, references, unique)
+            line += len(rows)
+            result['total'] += len(rows)
+
+            if len(rejected):
+                write_rejected(rejected, reject_file, append=result['skipped'] > 0)
+                result['rejected_file'] = reject_file
+                result['skipped'] += len(rejected)
+                if len(result['errors']) < MAX_SAMPLE_ERRORS:
+                    result['errors'].extend(
+                        rejected[['line', 'reason']].head(MAX_SAMPLE_ERRORS).itertuples(index=False, name=None)
+                    )
+                seen.update(_rejected_keys(spec, rejected))
+
+            hashes = [row_hash(r) for r in records]
+            seen.update(r[key_index] for r in records)
+            if incremental:
+                changed = [i for i, r in enumerate(records) if known_hashes.get(r[key_index]) != hashes[i]]
+                result['unchanged'] += len(records) - len(changed)
+                records = [records[i] for i in changed]
+                hashes = [hashes[i] for i in changed]
+
+            if not records:
+                continue
+            existing = _existing_keys(cursor, table, key, [r[key_index] for r in records])
+            cursor.executemany(upsert, records)
+            cursor.executemany(
+                "INSERT OR REPLACE INTO import_rows (table_name, row_key, row_hash) VALUES (?, ?, ?)",
+                [(table, r[key_index], h) for r, h in zip(records, hashes)]
+            )
+            result['updated'] += sum(1 for r in records if r[key_index] in existing)
+            result['inserted'] += sum(1 for r in records if r[key_index] not in existing)
+            for column in unique:
+                index = columns.index(column)
+                unique[column].update((r[index], r[key_index]) for r in records)
+
+        if incremental:
+            # Удаляются только строки, которые раньше пришли из этого файла
+            removed = [row_key for row_key in known_hashes if row_key not in seen]
+            for start in range(0, len(removed), 900):
+                chunk = removed[start:start + 900]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f"DELETE FROM {table} WHERE {key} IN ({placeholders})", chunk)
+                cursor.execute(f"DELETE FROM import_rows WHERE table_name = ? AND row_key IN ({placeholders})",
+                               [table, *chunk])
+            result['deleted'] = len(removed)
+
+        cursor.execute(
+            "INSERT OR REPLACE INTO import_files (table_name, path, file_hash, row_count) VALUES (?, ?, ?, ?)",
+            (table, path, source_hash, result['total'])
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return result
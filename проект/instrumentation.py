@@ -0,0 +1,149 @@
+"""
+Замеры времени фронтенда по каждому перезапуску скрипта Streamlit: вызовы API
+(сеть и разбор JSON), построение DataFrame и функции страниц show_*.
+Итоги пишутся в журнал (NDJSON) и выгружаются для сравнения между версиями.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# Журнал замеров (NDJSON, по строке на перезапуск); пусто - не писать
+TIMINGS_LOG = os.environ.get('REPAIR_TIMINGS_LOG', '')
+# Метка версии в записях журнала (для сравнения версий между собой)
+RELEASE = os.environ.get('REPAIR_RELEASE', '')
+# Сколько последних перезапусков хранится в сессии для панели отладки
+HISTORY_SIZE = 200
+
+# Категории замеров
+API = 'api'              # метод RepairServiceApp целиком
+HTTP = 'http'            # запрос к серверу (включая загрузку тела ответа)
+JSON = 'json'            # разбор JSON ответа
+DATAFRAME = 'dataframe'  # построение и форматирование DataFrame
+PAGE = 'page'            # функция страницы show_*
+
+# Профиль текущего перезапуска (contextvars: у каждой сессии Streamlit свой поток)
+_current: contextvars.ContextVar = contextvars.ContextVar('rerun_profile', default=None)
+# Категории охватывающих замеров (для определения вложенности)
+_parents: contextvars.ContextVar = contextvars.ContextVar('span_parents', default=())
+_log_lock = threading.Lock()
+
+
+class RerunProfile:
+    """Замеры одного перезапуска скрипта"""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.total_ms: Optional[float] = None
+        self.spans: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, category: str, name: str, duration_ms: float, parents: tuple):
+        # outer - замер не вложен в замер той же категории (вложенные не суммируются дважды)
+        with self._lock:
+            self.spans.append({'category': category, 'name': name, 'ms': round(duration_ms, 2),
+                               'depth': len(parents), 'outer': category not in parents})
+
+    def finish(self):
+        self.total_ms = round((time.perf_counter() - self._started) * 1000, 2)
+
+    def breakdown(self) -> Dict[str, float]:
+        """Время по категориям; render - время страниц без API и DataFrame
+
+        Параллельные вызовы API суммируются, поэтому api может превышать их общее время.
+        """
+        totals = {category: 0.0 for category in (API, HTTP, JSON, DATAFRAME, PAGE)}
+        for span in self.spans:
+            if span['outer']:
+                totals[span['category']] += span['ms']
+        totals = {category: round(ms, 2) for category, ms in totals.items()}
+        totals['render'] = round(max(totals[PAGE] - totals[API] - totals[DATAFRAME], 0.0), 2)
+        totals['total'] = self.total_ms
+        return totals
+
+    def to_record(self, page: Optional[str] = None) -> Dict:
+        return {
+            'started_at': self.started_at.isoformat(timespec='milliseconds'),
+            'release': RELEASE,
+            'page': page,
+            'breakdown': self.breakdown(),
+            'spans': self.spans,
+        }
+
+
+def start_rerun() -> RerunProfile:
+    profile = RerunProfile()
+    _current.set(profile)
+    return profile
+
+
+def finish_rerun(profile: RerunProfile, history: list, page: Optional[str] = None) -> Dict:
+    """Завершение замеров: запись в историю сессии и в журнал"""
+    profile.finish()
+    _current.set(None)
+    record = profile.to_record(page)
+    history.append(record)
+    del history[:-HISTORY_SIZE]
+    if TIMINGS_LOG:
+        line = json.dumps(record, ensure_ascii=False)
+        with _log_lock, open(TIMINGS_LOG, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    return record
+
+
+@contextmanager
+def span(category: str, name: str):
+    """Замер участка кода (без активного профиля - без накладных расходов)"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+
+    parents = _parents.get()
+    token = _parents.set(parents + (category,))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _parents.reset(token)
+        profile.add(category, name, (time.perf_counter() - started) * 1000, parents)
+
+
+def timed(category: str, name: Optional[str] = None):
+    """Декоратор: замер каждого вызова функции"""
+    def decorator(func: Callable):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(category, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument_class(cls, category: str, exclude=()):
+    """Замер всех открытых методов класса (кроме exclude)"""
+    for attr, value in list(vars(cls).items()):
+        if callable(value) and not attr.startswith('_') and attr not in exclude:
+            setattr(cls, attr, timed(category, f"{cls.__name__}.{attr}")(value))
+    return cls
+
+
+def instrument_functions(namespace: Dict, prefix: str, category: str):
+    """Замер функций модуля с заданным префиксом (вызовы идут через глобальные имена)"""
+    for attr, value in list(namespace.items()):
+        if attr.startswith(prefix) and callable(value):
+            namespace[attr] = timed(category)(value)
+
+
+def to_ndjson(history: List[Dict]) -> str:
+    """История замеров для выгрузки"""
+    return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in history)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Проверка целостности базы данных: набор подключаемых правил, выполняемых
+параллельно на соединениях только для чтения, с ограничением по времени
+
+Запуск: python integrity.py [база] [--full] [--rules имя,имя] [--timeout сек] [--json отчет.json]
+
+Код выхода: 0 - нарушений нет, 1 - только предупреждения, 2 - есть ошибки,
+3 - часть проверок не выполнена (ошибка или превышено время).
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from models import RequestStatus, UserRole
+
+# Сколько строк-примеров сохраняется для каждого нарушенного правила
+SAMPLE_LIMIT = 10
+# Ограничение времени на всю проверку (секунды)
+CHECK_TIMEOUT = float(os.environ.get('REPAIR_CHECK_TIMEOUT', 300))
+# Число параллельных соединений
+CHECK_WORKERS = int(os.environ.get('REPAIR_CHECK_WORKERS', min(8, (os.cpu_count() or 1) + 1)))
+
+EXIT_OK = 0
+EXIT_WARNINGS = 1
+EXIT_ERRORS = 2
+EXIT_INCOMPLETE = 3
+
+# Реестр правил: имя -> описание правила
+RULES: Dict[str, Dict] = {}
+
+
+class CheckTimeout(Exception):
+    pass
+
+
+def rule(name: str, description: str, severity: str = 'error', full_only: bool = False, quick_only: bool = False):
+    """Регистрация правила-функции check(conn) -> (число нарушений, примеры[, число точное])
+
+    Если число неточное, это нижняя граница (правило остановилось на первых нарушениях).
+    """
+    def decorator(func: Callable):
+        RULES[name] = {'name': name, 'description': description, 'severity': severity,
+                       'check': func, 'full_only': full_only, 'quick_only': quick_only}
+        return func
+    return decorator
+
+
+def sql_rule(name: str, description: str, query: str, params: tuple = (), severity: str = 'error'):
+    """Регистрация правила в виде SQL-запроса, возвращающего строки-нарушения"""
+    def check(conn: sqlite3.Connection):
+        # Один проход: строка сверх примеров лишь показывает, что нарушений больше
+        cursor = conn.execute(f"{query} LIMIT {SAMPLE_LIMIT + 1}", params)
+        names = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+        samples = [dict(zip(names, row)) for row in rows[:SAMPLE_LIMIT]]
+        return len(samples), samples, len(rows) <= SAMPLE_LIMIT
+    rule(name, description, severity)(check)
+
+
+def _placeholders(values) -> str:
+    return ', '.join('?' * len(values))
+
+
+# ========== Встроенные правила ==========
+
+def _pragma_check(conn: sqlite3.Connection, pragma: str):
+    messages = [row[0] for row in conn.execute(f"PRAGMA {pragma}({SAMPLE_LIMIT})")]
+    if messages == ['ok']:
+        return 0, []
+    return len(messages), [{'message': message} for message in messages], len(messages) < SAMPLE_LIMIT
+
+
+@rule('quick_check', "Структура файла БД (PRAGMA quick_check)", quick_only=True)
+def check_quick(conn):
+    return _pragma_check(conn, 'quick_check')
+
+
+@rule('integrity_check', "Полная проверка файла БД и индексов (PRAGMA integrity_check)", full_only=True)
+def check_integrity(conn):
+    return _pragma_check(conn, 'integrity_check')
+
+
+@rule('foreign_keys', "Ссылки на несуществующие записи (PRAGMA foreign_key_check)")
+def check_foreign_keys(conn):
+    rows = conn.execute("PRAGMA foreign_key_check").fetchall()
+    samples = [{'table': table, 'rowid': rowid, 'parent': parent} for table, rowid, parent, _ in rows[:SAMPLE_LIMIT]]
+    return len(rows), samples
+
+
+sql_rule('completion_before_start', "Дата завершения раньше даты поступления",
+         "SELECT request_id, start_date, completion_date FROM requests "
+         "WHERE completion_date IS NOT NULL AND completion_date < start_date")
+
+sql_rule('completed_without_date', "Заявка выдана, но дата завершения не указана",
+         "SELECT request_id, request_status FROM requests "
+         "WHERE request_status = ? AND completion_date IS NULL",
+         (RequestStatus.READY.value,))
+
+sql_rule('completion_date_on_open', "Дата завершения у незавершенной заявки",
+         "SELECT request_id, request_status, completion_date FROM requests "
+         "WHERE request_status != ? AND completion_date IS NOT NULL",
+         (RequestStatus.READY.value,), severity='warning')
+
+sql_rule('unknown_status', "Недопустимый статус заявки",
+         f"SELECT request_id, request_status FROM requests "
+         f"WHERE request_status NOT IN ({_placeholders(RequestStatus)})",
+         tuple(status.value for status in RequestStatus))
+
+sql_rule('unknown_role', "Недопустимая роль пользователя",
+         f"SELECT user_id, login, type FROM users WHERE type NOT IN ({_placeholders(UserRole)})",
+         tuple(role.value for role in UserRole))
+
+sql_rule('duplicate_logins', "Логины, совпадающие без учета регистра",
+         "SELECT lower(login) AS login, COUNT(*) AS users FROM users "
+         "GROUP BY lower(login) HAVING COUNT(*) > 1")
+
+sql_rule('master_not_master', "Заявка назначена пользователю, не являющемуся мастером",
+         "SELECT r.request_id, r.master_id, u.type FROM requests r "
+         "JOIN users u ON u.user_id = r.master_id WHERE u.type != ?",
+         (UserRole.MASTER.value,), severity='warning')
+
+sql_rule('plaintext_passwords', "Пароли, хранящиеся открытым текстом",
+         "SELECT user_id, login FROM users "
+         "WHERE password NOT LIKE 'scrypt$%' AND password NOT LIKE 'pbkdf2_sha256$%'",
+         severity='warning')
+
+
+# ========== Выполнение ==========
+
+def connect_readonly(db_name: str) -> sqlite3.Connection:
+    """Соединение только для чтения (проверка не блокирует запись в WAL)"""
+    return sqlite3.connect(f"file:{os.path.abspath(db_name)}?mode=ro", uri=True, check_same_thread=False)
+
+
+def connect_bounded(db_name: str, deadline: float) -> sqlite3.Connection:
+    """Соединение только для чтения, запросы которого прерываются по истечении общего времени проверки"""
+    conn = connect_readonly(db_name)
+    conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 10000)
+    return conn
+
+
+def _run_rule(db_name: str, spec: Dict, deadline: float) -> Dict:
+    started = time.perf_counter()
+    result = {'rule': spec['name'], 'description': spec['description'], 'severity': spec['severity']}
+
+    conn = connect_bounded(db_name, deadline)
+    try:
+        if time.monotonic() > deadline:
+            raise CheckTimeout()
+        violations, samples, *exact = spec['check'](conn)
+        result.update(status='ok' if violations == 0 else 'failed', violations=violations,
+                      violations_exact=exact[0] if exact else True, samples=samples)
+    except (CheckTimeout, sqlite3.OperationalError) as e:
+        if time.monotonic() > deadline:
+            result.update(status='timeout', violations=None, samples=[])
+        else:
+            result.update(status='error', violations=None, samples=[], error=str(e))
+    except Exception as e:
+        result.update(status='error', violations=None, samples=[], error=str(e))
+    finally:
+        conn.close()
+
+    result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def _table_counts(db_name: str, deadline: float) -> Dict[str, Optional[int]]:
+    """Число строк по таблицам; None - подсчет не завершен за отведенное время"""
+    conn = connect_bounded(db_name, deadline)
+    # COUNT(*) - одна операция VDBE (обработчик прогресса не вызывается), поэтому прерывается по таймеру
+    timer = threading.Timer(max(deadline - time.monotonic(), 0), conn.interrupt)
+    timer.start()
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        counts = {}
+        for table in tables:
+            try:
+                if time.monotonic() > deadline:
+                    raise CheckTimeout()
+                counts[table] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            except (CheckTimeout, sqlite3.OperationalError):
+                if time.monotonic() <= deadline:
+                    raise
+                counts[table] = None
+        return counts
+    finally:
+        timer.cancel()
+        conn.close()
+
+
+def run_checks(db_name: str = "repair_service.db", full: bool = False, rules: Optional[List[str]] = None,
+               timeout: float = CHECK_TIMEOUT, workers: int = CHECK_WORKERS) -> Dict:
+    """Выполнение правил и отчет в виде словаря (пригоден для JSON)"""
+    if not os.path.exists(db_name):
+        raise FileNotFoundError(f"База данных {db_name} не найдена")
+
+    if rules:
+        unknown = [name for name in rules if name not in RULES]
+        if unknown:
+            raise ValueError(f"Неизвестные правила: {', '.join(unknown)}")
+        selected = [RULES[name] for name in rules]
+    else:
+        selected = [spec for spec in RULES.values()
+                    if not (spec['full_only'] and not full) and not (spec['quick_only'] and full)]
+
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        counts = executor.submit(_table_counts, db_name, deadline)
+        results = list(executor.map(lambda spec: _run_rule(db_name, spec, deadline), selected))
+
+    errors = sum(1 for r in results if r['status'] == 'failed' and r['severity'] == 'error')
+    warnings = sum(1 for r in results if r['status'] == 'failed' and r['severity'] != 'error')
+    tables = counts.result()
+    incomplete = sum(1 for r in results if r['status'] in ('error', 'timeout'))
+    # Неподсчитанные таблицы - тоже невыполненная часть проверки
+    incomplete += any(count is None for count in tables.values())
+
+    if incomplete:
+        exit_code = EXIT_INCOMPLETE
+    elif errors:
+        exit_code = EXIT_ERRORS
+    elif warnings:
+        exit_code = EXIT_WARNINGS
+    else:
+        exit_code = EXIT_OK
+
+    return {
+        'database': db_name,
+        'checked_at': datetime.now().replace(microsecond=0).isoformat(),
+        'mode': 'full' if full else 'quick',
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+        'tables': tables,
+        'results': results,
+        'summary': {'errors': errors, 'warnings': warnings, 'incomplete': incomplete},
+        'exit_code': exit_code,
+    }
+
+
+def print_report(report: Dict):
+    """Отчет в читаемом виде"""
+    print(f"\nТаблицы в базе данных ({len(report['tables'])}):")
+    for table, count in report['tables'].items():
+        if count is None:
+            print(f"  ⚠ {table}: не подсчитано за отведенное время")
+        else:
+            print(f"  - {table}: {count} записей")
+
+    print(f"\nПравила ({report['mode']}, {report['duration_ms']} мс):")
+    for result in report['results']:
+        if result['status'] == 'ok':
+            print(f"  ✓ {result['description']}")
+        elif result['status'] == 'failed':
+            mark = '✗' if result['severity'] == 'error' else '⚠'
+            more = '' if result.get('violations_exact', True) else '+'
+            print(f"  {mark} {result['description']}: {result['violations']}{more}")
+            for sample in result['samples'][:3]:
+                print(f"      {sample}")
+        elif result['status'] == 'timeout':
+            print(f"  ⚠ {result['description']}: не завершено за отведенное время")
+        else:
+            print(f"  ✗ {result['description']}: ошибка проверки ({result.get('error')})")
+
+    summary = report['summary']
+    print(f"\nОшибок: {summary['errors']}, предупреждений: {summary['warnings']}, "
+          f"не выполнено: {summary['incomplete']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка целостности базы данных")
+    parser.add_argument('database', nargs='?', default="repair_service.db")
+    parser.add_argument('--full', action='store_true', help="integrity_check вместо quick_check")
+    parser.add_argument('--rules', help="Только указанные правила (через запятую)")
+    parser.add_argument('--timeout', type=float, default=CHECK_TIMEOUT, help="Ограничение времени, сек")
+    parser.add_argument('--json', dest='json_path', help="Сохранить отчет в JSON ('-' - вывести)")
+    args = parser.parse_args()
+
+    try:
+        report = run_checks(args.database, full=args.full,
+                            rules=args.rules.split(',') if args.rules else None, timeout=args.timeout)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"✗ {e}", file=sys.stderr)
+        sys.exit(EXIT_INCOMPLETE)
+
+    if args.json_path == '-':
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+        if args.json_path:
+            with open(args.json_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"✓ Отчет сохранен: {args.json_path}")
+    sys.exit(report['exit_code'])
+
+
+if __name__ == "__main__":
+    main()
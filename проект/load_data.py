@@ -1,17 +1,17 @@
 #!/usr/bin/env python3
 """
-Скрипт для загрузки данных в базу данных из CSV файлов
+Скрипт для загрузки данных в базу данных из файлов CSV, TXT и XLSX
 """
 
-import pandas as pd
 import sqlite3
 import os
+import sys
 from datetime import datetime
-import numpy as np
-import warnings
 
-# Отключаем предупреждения о deprecated date adapter
-warnings.filterwarnings('ignore', message='The default date adapter is deprecated')
+from importers import TABLE_SPECS, find_source, import_table
+from integrity import EXIT_OK, EXIT_WARNINGS, print_report, run_checks
+from security import migrate_plaintext_passwords
+import migrations
 
 def create_database(db_name="repair_service.db"):
     """Создание базы данных и таблиц"""
@@ -22,377 +22,61 @@ def create_database(db_name="repair_service.db"):
     cursor.execute('DROP TABLE IF EXISTS comments')
     cursor.execute('DROP TABLE IF EXISTS requests')
     cursor.execute('DROP TABLE IF EXISTS users')
-    conn.commit()
-    
-    # Таблица пользователей
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            fio TEXT NOT NULL,
-            phone TEXT NOT NULL,
-            login TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            type TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Таблица заявок
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS requests (
-            request_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            start_date DATE NOT NULL DEFAULT CURRENT_DATE,
-            home_tech_type TEXT NOT NULL,
-            home_tech_model TEXT NOT NULL,
-            problem_description TEXT NOT NULL,
-            request_status TEXT NOT NULL DEFAULT 'Новая заявка',
-            completion_date DATE,
-            repair_parts TEXT,
-            master_id INTEGER,
-            client_id INTEGER NOT NULL,
-            FOREIGN KEY (master_id) REFERENCES users(user_id),
-            FOREIGN KEY (client_id) REFERENCES users(user_id)
-        )
-    ''')
-    
-    # Таблица комментариев
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS comments (
-            comment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            message TEXT NOT NULL,
-            master_id INTEGER NOT NULL,
-            request_id INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (master_id) REFERENCES users(user_id),
-            FOREIGN KEY (request_id) REFERENCES requests(request_id)
-        )
-    ''')
-    
-    # Создание индексов
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_status ON requests(request_status)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_client ON requests(client_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_master ON requests(master_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_request ON comments(request_id)')
-    
+    # Манифест инкрементального импорта относится к удаляемым данным
+    cursor.execute('DROP TABLE IF EXISTS import_rows')
+    cursor.execute('DROP TABLE IF EXISTS import_files')
+    # Версии схемы относятся к удаленным таблицам: миграции применяются заново
+    cursor.execute('DROP TABLE IF EXISTS schema_version')
     conn.commit()
     conn.close()
     
+    # Таблицы, индексы и триггеры сроков - из общих миграций (как при запуске сервера)
+    migrations.migrate(db_name)
+    
     print(f"✓ База данных {db_name} создана успешно")
     return db_name
 
-def clean_dataframe(df):
-    """Очистка данных в DataFrame"""
-    # Создаем копию DataFrame
-    df = df.copy()
-    
-    # Замена NaN и 'null' на None
-    df = df.replace({np.nan: None, 'null': None, 'None': None, '': None})
-    
-    # Для числовых колонок преобразуем в int, если возможно
-    for col in df.columns:
-        if 'ID' in col or 'id' in col.lower() or col.endswith('ID'):
-            # Преобразуем в строку, затем в числовой формат
-            df[col] = df[col].astype(str).str.strip()
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            # Преобразуем в целые числа, если нет NaN
-            df[col] = df[col].apply(lambda x: int(x) if pd.notnull(x) else None)
-    
-    return df
+# Названия таблиц для сообщений: (именительный, родительный падеж)
+TABLE_TITLES = {
+    'users': ('Пользователи', 'пользователей'),
+    'requests': ('Заявки', 'заявок'),
+    'comments': ('Комментарии', 'комментариев'),
+}
 
-def import_users_from_csv(file_path, db_name="repair_service.db"):
-    """Импорт пользователей из CSV файла"""
+def import_from_file(table, file_path, db_name="repair_service.db", incremental=False):
+    """Импорт таблицы из файла CSV, TXT или XLSX"""
+    title, title_genitive = TABLE_TITLES[table]
     try:
-        # Чтение CSV файла
-        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
-        print(f"Найдено {len(df)} записей пользователей")
-        
-        # Очистка данных
-        df = clean_dataframe(df)
-        
-        # Переименование колонок для единообразия
-        df = df.rename(columns={
-            'userID': 'user_id',
-            'fio': 'fio',
-            'phone': 'phone',
-            'login': 'login',
-            'password': 'password',
-            'type': 'type'
-        })
-        
-        # Подключение к базе данных
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        
-        # Вставка данных
-        inserted_count = 0
-        skipped_count = 0
-        
-        for _, row in df.iterrows():
-            try:
-                # Проверяем, существует ли уже пользователь с таким ID
-                cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (int(row['user_id']),))
-                exists = cursor.fetchone()
-                
-                if exists:
-                    # Обновляем существующего пользователя
-                    cursor.execute('''
-                        UPDATE users 
-                        SET fio = ?, phone = ?, login = ?, password = ?, type = ?
-                        WHERE user_id = ?
-                    ''', (
-                        str(row['fio']),
-                        str(row['phone']),
-                        str(row['login']),
-                        str(row['password']),
-                        str(row['type']),
-                        int(row['user_id'])
-                    ))
-                    skipped_count += 1
-                else:
-                    # Вставляем нового пользователя
-                    cursor.execute('''
-                        INSERT INTO users (user_id, fio, phone, login, password, type)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        int(row['user_id']),
-                        str(row['fio']),
-                        str(row['phone']),
-                        str(row['login']),
-                        str(row['password']),
-                        str(row['type'])
-                    ))
-                    inserted_count += 1
-                    
-            except Exception as e:
-                print(f"  Ошибка при импорте пользователя ID {row.get('user_id', 'N/A')}: {e}")
-                skipped_count += 1
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"✓ Пользователи импортированы: {inserted_count} новых, {skipped_count} обновлено/пропущено")
-        return True
-        
-    except FileNotFoundError:
-        print(f"✗ Файл {file_path} не найден")
-        return False
-    except Exception as e:
-        print(f"✗ Ошибка при импорте пользователей: {e}")
-        return False
-
-def import_requests_from_csv(file_path, db_name="repair_service.db"):
-    """Импорт заявок из CSV файла"""
-    try:
-        # Чтение CSV файла
-        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
-        print(f"Найдено {len(df)} записей заявок")
-        
-        # Очистка данных
-        df = clean_dataframe(df)
-        
-        # Переименование колонок
-        df = df.rename(columns={
-            'requestID': 'request_id',
-            'startDate': 'start_date',
-            'homeTechType': 'home_tech_type',
-            'homeTechModel': 'home_tech_model',
-            'problemDescryption': 'problem_description',
-            'requestStatus': 'request_status',
-            'completionDate': 'completion_date',
-            'repairParts': 'repair_parts',
-            'masterID': 'master_id',
-            'clientID': 'client_id'
-        })
-        
-        # Функция для безопасного преобразования дат
-        def safe_date_conversion(date_str):
-            if pd.isna(date_str) or date_str is None or str(date_str).strip() == '':
-                return None
-            try:
-                return datetime.strptime(str(date_str).strip(), '%Y-%m-%d').date()
-            except:
-                return None
-        
-        # Преобразование дат
-        df['start_date'] = df['start_date'].apply(safe_date_conversion)
-        df['completion_date'] = df['completion_date'].apply(safe_date_conversion)
-        
-        # Подключение к базе данных
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        
-        # Вставка данных
-        inserted_count = 0
-        skipped_count = 0
-        
-        for _, row in df.iterrows():
-            try:
-                # Проверяем, существует ли уже заявка с таким ID
-                cursor.execute('SELECT request_id FROM requests WHERE request_id = ?', (int(row['request_id']),))
-                exists = cursor.fetchone()
-                
-                # Получаем значения с проверкой на None
-                master_id = int(row['master_id']) if pd.notnull(row['master_id']) else None
-                client_id = int(row['client_id']) if pd.notnull(row['client_id']) else None
-                
-                if exists:
-                    # Обновляем существующую заявку
-                    cursor.execute('''
-                        UPDATE requests 
-                        SET start_date = ?, home_tech_type = ?, home_tech_model = ?, 
-                            problem_description = ?, request_status = ?, completion_date = ?,
-                            repair_parts = ?, master_id = ?, client_id = ?
-                        WHERE request_id = ?
-                    ''', (
-                        row['start_date'],
-                        str(row['home_tech_type']),
-                        str(row['home_tech_model']),
-                        str(row['problem_description']),
-                        str(row['request_status']),
-                        row['completion_date'],
-                        str(row['repair_parts']) if pd.notnull(row['repair_parts']) else None,
-                        master_id,
-                        client_id,
-                        int(row['request_id'])
-                    ))
-                    skipped_count += 1
-                else:
-                    # Вставляем новую заявку
-                    cursor.execute('''
-                        INSERT INTO requests 
-                        (request_id, start_date, home_tech_type, home_tech_model, 
-                         problem_description, request_status, completion_date, 
-                         repair_parts, master_id, client_id)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        int(row['request_id']),
-                        row['start_date'],
-                        str(row['home_tech_type']),
-                        str(row['home_tech_model']),
-                        str(row['problem_description']),
-                        str(row['request_status']),
-                        row['completion_date'],
-                        str(row['repair_parts']) if pd.notnull(row['repair_parts']) else None,
-                        master_id,
-                        client_id
-                    ))
-                    inserted_count += 1
-                    
-            except Exception as e:
-                print(f"  Ошибка при импорте заявки ID {row.get('request_id', 'N/A')}: {e}")
-                skipped_count += 1
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"✓ Заявки импортированы: {inserted_count} новых, {skipped_count} обновлено/пропущено")
-        return True
-        
+        result = import_table(table, file_path, db_name, incremental=incremental)
     except FileNotFoundError:
         print(f"✗ Файл {file_path} не найден")
         return False
     except Exception as e:
-        print(f"✗ Ошибка при импорте заявок: {e}")
+        print(f"✗ Ошибка при импорте {title_genitive}: {e}")
         return False
-
-def import_comments_from_csv(file_path, db_name="repair_service.db"):
-    """Импорт комментариев из CSV файла"""
-    try:
-        # Чтение CSV файла
-        df = pd.read_csv(file_path, sep=';', encoding='utf-8')
-        print(f"Найдено {len(df)} записей комментариев")
-        
-        # Очистка данных
-        df = clean_dataframe(df)
-        
-        # Переименование колонок
-        df = df.rename(columns={
-            'commentID': 'comment_id',
-            'message': 'message',
-            'masterID': 'master_id',
-            'requestID': 'request_id'
-        })
-        
-        # Проверяем существование заявок перед импортом комментариев
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT request_id FROM requests")
-        existing_requests = {row[0] for row in cursor.fetchall()}
-        conn.close()
-        
-        # Фильтруем комментарии только для существующих заявок
-        valid_comments = []
-        invalid_comments = []
-        
-        for _, row in df.iterrows():
-            request_id = int(row['request_id']) if pd.notnull(row['request_id']) else None
-            if request_id in existing_requests:
-                valid_comments.append(row)
-            else:
-                invalid_comments.append(row['comment_id'])
-        
-        if invalid_comments:
-            print(f"  Пропущено {len(invalid_comments)} комментариев (заявки не существуют): {invalid_comments}")
-        
-        # Подключение к базе данных для вставки
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        
-        # Вставка данных
-        inserted_count = 0
-        skipped_count = 0
-        
-        for row in valid_comments:
-            try:
-                # Проверяем, существует ли уже комментарий с таким ID
-                cursor.execute('SELECT comment_id FROM comments WHERE comment_id = ?', (int(row['comment_id']),))
-                exists = cursor.fetchone()
-                
-                if exists:
-                    # Обновляем существующий комментарий
-                    cursor.execute('''
-                        UPDATE comments 
-                        SET message = ?, master_id = ?, request_id = ?
-                        WHERE comment_id = ?
-                    ''', (
-                        str(row['message']),
-                        int(row['master_id']),
-                        int(row['request_id']),
-                        int(row['comment_id'])
-                    ))
-                    skipped_count += 1
-                else:
-                    # Вставляем новый комментарий
-                    cursor.execute('''
-                        INSERT INTO comments (comment_id, message, master_id, request_id)
-                        VALUES (?, ?, ?, ?)
-                    ''', (
-                        int(row['comment_id']),
-                        str(row['message']),
-                        int(row['master_id']),
-                        int(row['request_id'])
-                    ))
-                    inserted_count += 1
-                    
-            except Exception as e:
-                print(f"  Ошибка при импорте комментария ID {row.get('comment_id', 'N/A')}: {e}")
-                skipped_count += 1
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"✓ Комментарии импортированы: {inserted_count} новых, {skipped_count} обновлено/пропущено")
+    
+    if result['file_unchanged']:
+        print("✓ Файл не изменился с прошлого импорта, пропущен")
         return True
-        
-    except FileNotFoundError:
-        print(f"✗ Файл {file_path} не найден")
-        return False
-    except Exception as e:
-        print(f"✗ Ошибка при импорте комментариев: {e}")
-        return False
+    
+    print(f"Найдено {result['total']} записей {title_genitive}")
+    for line, reason in result['errors']:
+        print(f"  Отклонена строка {line}: {reason}")
+    if result['skipped'] > len(result['errors']):
+        print(f"  ... и еще {result['skipped'] - len(result['errors'])}")
+    if result['rejected_file']:
+        print(f"  Отклоненные строки с причинами: {result['rejected_file']}")
+    
+    if incremental:
+        print(f"✓ {title} синхронизированы: {result['inserted']} новых, {result['updated']} изменено, "
+              f"{result['unchanged']} без изменений, {result['deleted']} удалено, {result['skipped']} пропущено")
+    else:
+        print(f"✓ {title} импортированы: {result['inserted']} новых, "
+              f"{result['updated']} обновлено, {result['skipped']} пропущено")
+    return True
 
 def load_all_data(data_folder="import_data", db_name="repair_service.db"):
-    """Загрузка всех данных из CSV файлов"""
+    """Загрузка всех данных из файлов import_data"""
     print("=" * 60)
     print("ЗАГРУЗКА ДАННЫХ В БАЗУ ДАННЫХ")
     print("=" * 60)
@@ -405,30 +89,20 @@ def load_all_data(data_folder="import_data", db_name="repair_service.db"):
         print(f"База данных {db_name} уже существует, удаляю и создаю заново...")
         create_database(db_name)  # Это пересоздаст базу данных с чистыми таблицами
     
-    # Пути к файлам
-    users_file = os.path.join(data_folder, "InputDataUsers.csv")
-    requests_file = os.path.join(data_folder, "InputDataRequests.csv")
-    comments_file = os.path.join(data_folder, "InputDataComments.csv")
-    
     # Проверка существования папки
     if not os.path.exists(data_folder):
         print(f"\nПапка {data_folder} не найдена. Создание папки...")
         os.makedirs(data_folder)
         print(f"✓ Папка {data_folder} создана")
-        print("\nПожалуйста, поместите CSV файлы в папку import_data и запустите скрипт снова.")
+        print("\nПожалуйста, поместите файлы с данными в папку import_data и запустите скрипт снова.")
         return False
     
-    # Проверка существования файлов
-    missing_files = []
-    if not os.path.exists(users_file):
-        missing_files.append("InputDataUsers.csv")
-    if not os.path.exists(requests_file):
-        missing_files.append("InputDataRequests.csv")
-    if not os.path.exists(comments_file):
-        missing_files.append("InputDataComments.csv")
+    # Поиск файлов без учета регистра имени: CSV, TXT или XLSX
+    sources = {table: find_source(data_folder, spec['source']) for table, spec in TABLE_SPECS.items()}
+    missing_files = [TABLE_SPECS[table]['source'] for table, path in sources.items() if path is None]
     
     if missing_files:
-        print(f"\n✗ Отсутствуют файлы: {', '.join(missing_files)}")
+        print(f"\n✗ Отсутствуют файлы: {', '.join(missing_files)} (.csv, .txt или .xlsx)")
         print("Создаю примеры файлов...")
         create_sample_files(data_folder)
         print("\nТеперь файлы созданы. Пожалуйста, проверьте их и запустите скрипт снова.")
@@ -439,29 +113,23 @@ def load_all_data(data_folder="import_data", db_name="repair_service.db"):
     # Загрузка данных в правильном порядке (сначала пользователи, потом заявки, потом комментарии)
     success_count = 0
     
-    print(f"\n1. Загрузка пользователей из {users_file}")
-    if import_users_from_csv(users_file, db_name):
-        success_count += 1
-    else:
-        print("✗ Не удалось загрузить пользователей")
-    
-    print(f"\n2. Загрузка заявок из {requests_file}")
-    if import_requests_from_csv(requests_file, db_name):
-        success_count += 1
-    else:
-        print("✗ Не удалось загрузить заявки")
-    
-    print(f"\n3. Загрузка комментариев из {comments_file}")
-    if import_comments_from_csv(comments_file, db_name):
-        success_count += 1
-    else:
-        print("✗ Не удалось загрузить комментарии")
+    for step, table in enumerate(TABLE_SPECS, start=1):
+        title, title_genitive = TABLE_TITLES[table]
+        print(f"\n{step}. Загрузка {title_genitive} из {sources[table]}")
+        if import_from_file(table, sources[table], db_name):
+            success_count += 1
+        else:
+            print(f"✗ Не удалось загрузить {title_genitive}")
     
     # Сводка
     print("\n" + "=" * 60)
     print("ЗАГРУЗКА ДАННЫХ ЗАВЕРШЕНА")
     print("=" * 60)
     
+    if success_count > 0:
+        migrated = migrate_plaintext_passwords(db_name)
+        print(f"✓ Пароли захешированы: {migrated}")
+    
     if success_count == 3:
         print("✓ Все файлы успешно загружены (3/3)")
         verify_database(db_name)
@@ -474,6 +142,41 @@ def load_all_data(data_folder="import_data", db_name="repair_service.db"):
         print("✗ Загрузка не удалась: 0/3 файлов загружено")
         return False
 
+def sync_all_data(data_folder="import_data", db_name="repair_service.db"):
+    """Инкрементальная синхронизация: без удаления таблиц, только изменившиеся файлы и строки"""
+    print("=" * 60)
+    print("СИНХРОНИЗАЦИЯ ДАННЫХ")
+    print("=" * 60)
+    
+    if not os.path.exists(db_name):
+        print("База данных не найдена, создание новой...")
+        create_database(db_name)
+    
+    sources = {table: find_source(data_folder, spec['source']) for table, spec in TABLE_SPECS.items()}
+    missing_files = [TABLE_SPECS[table]['source'] for table, path in sources.items() if path is None]
+    if missing_files:
+        # Без файла нельзя отличить удаленные строки от отсутствующей выгрузки - ничего не трогаем
+        print(f"\n✗ Отсутствуют файлы: {', '.join(missing_files)} (.csv, .txt или .xlsx)")
+        return False
+    
+    success_count = 0
+    for step, table in enumerate(TABLE_SPECS, start=1):
+        title, title_genitive = TABLE_TITLES[table]
+        print(f"\n{step}. Синхронизация {title_genitive} из {sources[table]}")
+        if import_from_file(table, sources[table], db_name, incremental=True):
+            success_count += 1
+        else:
+            print(f"✗ Не удалось синхронизировать {title_genitive}")
+    
+    migrated = migrate_plaintext_passwords(db_name)
+    if migrated:
+        print(f"\n✓ Пароли захешированы: {migrated}")
+    
+    print("\n" + "=" * 60)
+    print(f"СИНХРОНИЗАЦИЯ ЗАВЕРШЕНА ({success_count}/3)")
+    print("=" * 60)
+    return success_count == 3
+
 def backup_database(db_name="repair_service.db"):
     """Создание резервной копии базы данных"""
     try:
@@ -501,74 +204,24 @@ def backup_database(db_name="repair_service.db"):
         print(f"✗ Ошибка при создании резервной копии: {e}")
         return None
 
-def verify_database(db_name="repair_service.db"):
-    """Проверка целостности базы данных"""
+def verify_database(db_name="repair_service.db", full=False):
+    """Проверка целостности базы данных (правила из integrity.py)"""
+    print("\n" + "=" * 60)
+    print("ПРОВЕРКА ЦЕЛОСТНОСТИ БАЗЫ ДАННЫХ")
+    print("=" * 60)
+    
     try:
-        if not os.path.exists(db_name):
-            print(f"✗ База данных {db_name} не найдена")
-            return False
-        
-        conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        
-        print("\n" + "=" * 60)
-        print("ПРОВЕРКА ЦЕЛОСТНОСТИ БАЗЫ ДАННЫХ")
-        print("=" * 60)
-        
-        # Проверка таблиц
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-        tables = cursor.fetchall()
-        
-        print(f"\nТаблицы в базе данных ({len(tables)}):")
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-            count = cursor.fetchone()[0]
-            print(f"  - {table_name}: {count} записей")
-        
-        # Проверка внешних ключей
-        cursor.execute("PRAGMA foreign_key_check")
-        fk_errors = cursor.fetchall()
-        
-        if fk_errors:
-            print(f"\n⚠ Найдены ошибки внешних ключей: {len(fk_errors)}")
-            for error in fk_errors:
-                print(f"  - Таблица: {error[0]}, строка: {error[1]}, таблица ссылки: {error[2]}, id: {error[3]}")
-        else:
-            print("\n✓ Внешние ключи в порядке")
-        
-        # Проверка индексов
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name NOT LIKE 'sqlite_%'")
-        indexes = cursor.fetchall()
-        
-        print(f"\nИндексы в базе данных ({len(indexes)}):")
-        for index in indexes:
-            print(f"  - {index[0]}")
-        
-        # Пример данных
-        print("\nПример данных из таблиц:")
-        
-        print("\nПользователи (первые 3):")
-        cursor.execute("SELECT user_id, fio, type FROM users LIMIT 3")
-        for row in cursor.fetchall():
-            print(f"  ID: {row[0]}, ФИО: {row[1]}, Роль: {row[2]}")
-        
-        print("\nЗаявки (первые 3):")
-        cursor.execute("SELECT request_id, home_tech_type, request_status FROM requests LIMIT 3")
-        for row in cursor.fetchall():
-            print(f"  ID: {row[0]}, Техника: {row[1]}, Статус: {row[2]}")
-        
-        print("\nКомментарии (первые 3):")
-        cursor.execute("SELECT comment_id, request_id, message FROM comments LIMIT 3")
-        for row in cursor.fetchall():
-            print(f"  ID: {row[0]}, Заявка: {row[1]}, Сообщение: {row[2][:30]}...")
-        
-        conn.close()
-        print("\n✓ Проверка базы данных завершена успешно.")
-        return True
+        report = run_checks(db_name, full=full)
     except Exception as e:
         print(f"✗ Ошибка при проверке базы данных: {e}")
         return False
+    
+    print_report(report)
+    if report['exit_code'] in (EXIT_OK, EXIT_WARNINGS):
+        print("\n✓ Проверка базы данных завершена успешно.")
+        return True
+    print("\n✗ В базе данных найдены ошибки (подробнее: python integrity.py --json -)")
+    return False
 
 def create_sample_files(data_folder="import_data"):
     """Создание примеров CSV файлов из данных в ТЗ"""
@@ -609,26 +262,26 @@ def create_sample_files(data_folder="import_data"):
 5;Очень странно, будем разбираться!;3;6
 """
     
-    # Сохранение файлов
+    # Сохранение файлов (если нет файла таблицы ни в одном формате, с любым регистром имени)
     users_file = os.path.join(data_folder, "InputDataUsers.csv")
     requests_file = os.path.join(data_folder, "InputDataRequests.csv")
     comments_file = os.path.join(data_folder, "InputDataComments.csv")
     
     files_created = 0
     
-    if not os.path.exists(users_file):
+    if find_source(data_folder, "InputDataUsers") is None:
         with open(users_file, 'w', encoding='utf-8-sig') as f:
             f.write(users_data)
         print(f"✓ Создан файл: {users_file}")
         files_created += 1
     
-    if not os.path.exists(requests_file):
+    if find_source(data_folder, "InputDataRequests") is None:
         with open(requests_file, 'w', encoding='utf-8-sig') as f:
             f.write(requests_data)
         print(f"✓ Создан файл: {requests_file}")
         files_created += 1
     
-    if not os.path.exists(comments_file):
+    if find_source(data_folder, "InputDataComments") is None:
         with open(comments_file, 'w', encoding='utf-8-sig') as f:
             f.write(comments_data)
         print(f"✓ Создан файл: {comments_file}")
@@ -646,6 +299,10 @@ if __name__ == "__main__":
     DATA_FOLDER = "import_data"
     DB_NAME = "repair_service.db"
     
+    # Неинтерактивная синхронизация (для ночного запуска): python load_data.py --sync [папка]
+    if len(sys.argv) > 1 and sys.argv[1] == "--sync":
+        sys.exit(0 if sync_all_data(sys.argv[2] if len(sys.argv) > 2 else DATA_FOLDER, DB_NAME) else 1)
+    
     print("=" * 60)
     print("СКРИПТ ЗАГРУЗКИ ДАННЫХ")
     print("Система учета заявок на ремонт бытовой техники")
@@ -653,15 +310,16 @@ if __name__ == "__main__":
     
     print("\nДоступные действия:")
     print("1. Создать новую базу данных и загрузить данные")
-    print("2. Только загрузить данные из CSV файлов")
+    print("2. Только загрузить данные из файлов (CSV, TXT, XLSX)")
     print("3. Только создать примеры CSV файлов")
     print("4. Проверить целостность базы данных")
     print("5. Создать резервную копию базы данных")
     print("6. Выполнить все операции (создание + загрузка + проверка + резервная копия)")
-    print("7. Выход")
+    print("7. Синхронизировать изменения (без пересоздания базы)")
+    print("8. Выход")
     
     try:
-        choice = input("\nВыберите действие (1-7): ").strip()
+        choice = input("\nВыберите действие (1-8): ").strip()
         
         if choice == "1":
             print("\n" + "=" * 60)
@@ -673,7 +331,7 @@ if __name__ == "__main__":
             
         elif choice == "2":
             print("\n" + "=" * 60)
-            print("ЗАГРУЗКА ДАННЫХ ИЗ CSV ФАЙЛОВ")
+            print("ЗАГРУЗКА ДАННЫХ ИЗ ФАЙЛОВ")
             print("=" * 60)
             load_all_data(DATA_FOLDER, DB_NAME)
             
@@ -711,10 +369,13 @@ if __name__ == "__main__":
             print("\n✓ Все операции выполнены успешно!")
             
         elif choice == "7":
+            sync_all_data(DATA_FOLDER, DB_NAME)
+            
+        elif choice == "8":
             print("\nВыход из программы...")
             
         else:
-            print("\n✗ Неверный выбор. Пожалуйста, выберите от 1 до 7.")
+            print("\n✗ Неверный выбор. Пожалуйста, выберите от 1 до 8.")
             
     except KeyboardInterrupt:
         print("\n\nПрограмма прервана пользователем.")
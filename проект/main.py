@@ -1,11 +1,20 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import JSONResponse, StreamingResponse
 from datetime import date, datetime
 import uvicorn
 from typing import List, Optional
 from models import *
 from database import Database
+import export
+import analytics
+from assignment import AssignmentEngine, POLICIES
+from sla import SlaMonitor
+from compression import CompressionMiddleware
+from fast_json import rows_response, FastJSONResponse
+import security
+from security import run_in_kdf_pool, issue_token, decode_token, TokenError
 from models import CommentCreateRequest
 
 app = FastAPI(
@@ -21,29 +30,115 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
+# Сжатие ответов (zstd / br / gzip по Accept-Encoding)
+app.add_middleware(CompressionMiddleware)
+
 # Инициализация базы данных
 db = Database()
+# Отчеты считаются по периодически обновляемому снимку, а не по рабочей базе
+reports = analytics.ReportEngine(db.db_name)
+# Счетчики загрузки мастеров для автоматического назначения
+assigner = AssignmentEngine(db)
+# Фоновый поиск заявок с истекшим сроком
+sla_monitor = SlaMonitor(db)
+
+# Размер страницы ленты комментариев по умолчанию
+COMMENTS_PAGE_SIZE = 20
+# Наибольшее число ID в пакетных запросах
+MAX_BULK_IDS = 500
 
-# Функция для получения текущего пользователя (упрощенная версия)
-def get_current_user(auth_header: Optional[str] = None):
-    """Упрощенная функция для получения текущего пользователя"""
-    # В реальном приложении здесь была бы проверка JWT токена
-    # Для упрощения используем заглушку
-    async def dummy_dependency():
-        # Возвращаем None, так как реальная аутентификация будет через отдельный эндпоинт
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)
+) -> CurrentUser:
+    """Получение текущего пользователя из подписанного токена (без обращения к БД)"""
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Требуется авторизация",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    try:
+        claims = decode_token(credentials.credentials)
+    except TokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    return CurrentUser(user_id=claims['sub'], fio=claims['fio'], type=claims['role'])
+
+def require_permission(*actions: Action):
+    """Зависимость, проверяющая права доступа по роли из токена"""
+    required = Permission.mask(*actions)
+    
+    async def permission_dependency(user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+        if not Permission.check(user.type, required):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Недостаточно прав для выполнения операции"
+            )
+        return user
+    
+    return permission_dependency
+
+def parse_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    """Разбор параметра fields= (через запятую) с проверкой по полям модели ответа"""
+    if not fields:
         return None
     
-    return dummy_dependency
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестные поля: {', '.join(unknown)}"
+        )
+    return names
+
+def parse_ids(ids: str) -> List[int]:
+    """Разбор списка ID через запятую (не больше MAX_BULK_IDS)"""
+    try:
+        values = list(dict.fromkeys(int(value) for value in ids.split(',') if value.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ID должны быть целыми числами через запятую"
+        )
+    if not values or len(values) > MAX_BULK_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Укажите от 1 до {MAX_BULK_IDS} ID"
+        )
+    return values
 
 @app.on_event("startup")
 async def startup_event():
     """Инициализация при запуске"""
+    if not security.SECRET_KEY:
+        print("⚠ REPAIR_SECRET_KEY не задан, токены будут действительны только до перезапуска сервера")
+    # Без явного REPAIR_SNAPSHOT_INTERVAL снимки обновляются с первого запроса отчета
+    if analytics.SNAPSHOT_ON_STARTUP:
+        reports.start()
+    assigner.reload()
+    sla_monitor.start()
     print("Сервер запущен")
 
-# ========== Аутентификация (без зависимости get_current_user) ==========
-@app.post("/auth/login", response_model=UserResponse)
+@app.on_event("shutdown")
+def shutdown_event():
+    """Завершение потока записи в БД и фоновых потоков"""
+    sla_monitor.stop()
+    reports.stop()
+    db.close()
+
+# ========== Аутентификация ==========
+@app.post("/auth/login", response_model=LoginResponse)
 async def login(login_data: dict):
     """Аутентификация пользователя"""
     login_str = login_data.get('login')
@@ -55,18 +150,27 @@ async def login(login_data: dict):
             detail="Требуется логин и пароль"
         )
     
-    user = db.authenticate_user(login_str, password)
+    # KDF выполняется в отдельном пуле, чтобы не блокировать event loop
+    user = await run_in_kdf_pool(db.authenticate_user, login_str, password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный логин или пароль"
         )
     
-    return user
+    return {
+        **user,
+        "access_token": issue_token(user),
+        "token_type": "bearer",
+        "expires_in": security.TOKEN_TTL
+    }
 
 # ========== Пользователи ==========
+# Изменяющие обработчики объявлены через def: FastAPI выполняет их в пуле потоков,
+# и ожидание очереди записи не блокирует event loop
 @app.post("/users/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_user(user: UserCreate):
+def create_user(user: UserCreate,
+                current_user: CurrentUser = Depends(require_permission(Action.MANAGE_USERS))):
     """Создание нового пользователя"""
     try:
         user_id = db.create_user(user.dict())
@@ -79,7 +183,7 @@ async def create_user(user: UserCreate):
         )
 
 @app.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int):
+async def get_user(user_id: int, current_user: CurrentUser = Depends(get_current_user)):
     """Получение пользователя по ID"""
     user = db.get_user_by_id(user_id)
     if not user:
@@ -90,15 +194,33 @@ async def get_user(user_id: int):
     return user
 
 @app.get("/users/role/{role}", response_model=List[UserResponse])
-async def get_users_by_role(role: str):
+async def get_users_by_role(
+    role: str,
+    fio_prefix: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Список полей через запятую"),
+    current_user: CurrentUser = Depends(get_current_user)
+):
     """Получение пользователей по роли"""
-    users = db.get_users_by_role(role)
-    return users
+    users = db.get_users_by_role(role, fio_prefix=fio_prefix, limit=limit, offset=offset,
+                                 fields=parse_fields(fields, UserResponse))
+    return rows_response(users, UserResponse, partial=fields is not None)
 
-# ========== Заявки (упрощенная версия без проверки прав) ==========
+# ========== Заявки ==========
 @app.post("/requests/", response_model=RequestResponse, status_code=status.HTTP_201_CREATED)
-async def create_request(request: RequestCreate):
+def create_request(request: RequestCreate,
+                   auto_assign: bool = Query(False, description="Назначить мастера автоматически"),
+                   policy: Optional[str] = Query(None, pattern=f"^({'|'.join(POLICIES)})$"),
+                   current_user: CurrentUser = Depends(require_permission(Action.CREATE_REQUEST))):
     """Создание новой заявки"""
+    # Клиент может создавать заявки только от своего имени
+    if current_user.type == UserRole.CLIENT and request.client_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Клиент может создавать заявки только от своего имени"
+        )
+    
     try:
         # Проверка существования клиента
         client = db.get_user_by_id(request.client_id)
@@ -118,7 +240,16 @@ async def create_request(request: RequestCreate):
                 )
         
         request_data = request.dict()
-        request_id = db.create_request(request_data)
+        auto_master_id = None
+        if auto_assign and not request.master_id:
+            auto_master_id = assigner.assign(request.home_tech_type, policy)
+            request_data['master_id'] = auto_master_id
+        
+        try:
+            request_id = db.create_request(request_data)
+        except Exception:
+            assigner.release(auto_master_id)
+            raise
         
         # Получение созданной заявки
         requests = db.get_requests({'request_id': request_id})
@@ -128,6 +259,9 @@ async def create_request(request: RequestCreate):
                 detail="Ошибка при получении созданной заявки"
             )
         
+        # Назначенный вручную мастер тоже учитывается в загрузке
+        if auto_master_id is None:
+            assigner.request_updated(None, requests[0])
         return requests[0]
     except HTTPException:
         raise
@@ -143,9 +277,21 @@ async def get_requests(
     client_id: Optional[int] = None,
     master_id: Optional[int] = None,
     status: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Список полей через запятую"),
+    include_archived: bool = Query(False, description="Включить заявки из архива"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Размер страницы"),
+    offset: int = Query(0, ge=0),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Получение списка заявок с фильтрами"""
+    """Получение списка заявок с фильтрами
+    
+    При указании limit общее число найденных заявок передается в заголовке X-Total-Count.
+    """
+    # Клиент видит только свои заявки
+    if not Permission.check(current_user.type, Action.VIEW_ALL_REQUESTS):
+        client_id = current_user.user_id
+    
     filters = {}
     if request_id:
         filters['request_id'] = request_id
@@ -158,13 +304,54 @@ async def get_requests(
     if search:
         filters['search'] = search
     
-    requests = db.get_requests(filters)
-    return requests
+    requests = db.get_requests(filters, fields=parse_fields(fields, RequestResponse),
+                               include_archived=include_archived, limit=limit, offset=offset)
+    headers = {}
+    if limit:
+        headers['X-Total-Count'] = str(db.count_requests(filters, include_archived=include_archived))
+    return rows_response(requests, RequestResponse, headers=headers, partial=fields is not None)
+
+@app.get("/requests/bulk", response_model=List[RequestResponse])
+async def get_requests_bulk(
+    ids: str = Query(..., description="ID заявок через запятую"),
+    fields: Optional[str] = Query(None, description="Список полей через запятую"),
+    include_archived: bool = False,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Несколько заявок одним запросом"""
+    filters = {'request_ids': parse_ids(ids)}
+    if not Permission.check(current_user.type, Action.VIEW_ALL_REQUESTS):
+        filters['client_id'] = current_user.user_id
+    
+    requests = db.get_requests(filters, fields=parse_fields(fields, RequestResponse),
+                               include_archived=include_archived)
+    return rows_response(requests, RequestResponse, partial=fields is not None)
+
+@app.get("/requests/overdue", response_model=List[RequestResponse])
+async def get_overdue_requests(
+    as_of: Optional[date] = Query(None, description="Дата проверки (по умолчанию - сегодня)"),
+    limit: int = Query(100, ge=1, le=10000),
+    fields: Optional[str] = Query(None, description="Список полей через запятую"),
+    current_user: CurrentUser = Depends(require_permission(Action.VIEW_ALL_REQUESTS))
+):
+    """Открытые заявки с истекшим сроком, самые давние первыми"""
+    requests = db.get_overdue_requests(as_of.isoformat() if as_of else None, limit=limit,
+                                       fields=parse_fields(fields, RequestResponse))
+    return rows_response(requests, RequestResponse, partial=fields is not None)
+
+@app.get("/sla/status")
+async def get_sla_status(current_user: CurrentUser = Depends(require_permission(Action.VIEW_ALL_REQUESTS))):
+    """Результат последней фоновой проверки сроков"""
+    return sla_monitor.status()
 
 @app.get("/requests/{request_id}", response_model=RequestResponse)
-async def get_request(request_id: int):
+async def get_request(request_id: int, include_archived: bool = False,
+                      current_user: CurrentUser = Depends(get_current_user)):
     """Получение заявки по ID"""
-    requests = db.get_requests({'request_id': request_id})
+    requests = db.get_requests({'request_id': request_id}, include_archived=include_archived)
+    if requests and not Permission.check(current_user.type, Action.VIEW_ALL_REQUESTS) \
+            and requests[0]['client_id'] != current_user.user_id:
+        requests = []
     if not requests:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -172,8 +359,43 @@ async def get_request(request_id: int):
         )
     return requests[0]
 
+@app.get("/requests/{request_id}/full")
+async def get_request_full(request_id: int, include_archived: bool = False,
+                           current_user: CurrentUser = Depends(get_current_user)):
+    """Все данные для карточки заявки за один запрос: заявка, первая страница
+    комментариев и справочники мастеров и клиентов (для тех, кто может редактировать)"""
+    requests = db.get_requests({'request_id': request_id}, include_archived=include_archived)
+    if requests and not Permission.check(current_user.type, Action.VIEW_ALL_REQUESTS) \
+            and requests[0]['client_id'] != current_user.user_id:
+        requests = []
+    if not requests:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Заявка не найдена"
+        )
+    
+    comments = db.get_comments(request_id, include_archived=include_archived, limit=COMMENTS_PAGE_SIZE + 1)
+    next_cursor = None
+    if len(comments) > COMMENTS_PAGE_SIZE:
+        comments = comments[:COMMENTS_PAGE_SIZE]
+        next_cursor = comment_cursor(comments[-1])
+    
+    masters, clients = [], []
+    if Permission.check(current_user.type, Action.EDIT_REQUEST):
+        masters = db.get_users_by_role(UserRole.MASTER.value, fields=['user_id', 'fio'])
+        clients = db.get_users_by_role(UserRole.CLIENT.value, fields=['user_id', 'fio', 'phone'])
+    
+    return FastJSONResponse({
+        "request": requests[0],
+        "comments": comments,
+        "next_cursor": next_cursor,
+        "masters": masters,
+        "clients": clients
+    })
+
 @app.put("/requests/{request_id}", response_model=RequestResponse)
-async def update_request(request_id: int, update_data: RequestUpdate):
+def update_request(request_id: int, update_data: RequestUpdate,
+                   current_user: CurrentUser = Depends(require_permission(Action.EDIT_REQUEST))):
     """Обновление заявки"""
     # Проверка существования заявки
     existing_request = db.get_requests({'request_id': request_id})
@@ -195,7 +417,14 @@ async def update_request(request_id: int, update_data: RequestUpdate):
     # Обновление заявки
     update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
     
-    if not db.update_request(request_id, update_dict):
+    try:
+        updated = db.update_request(request_id, update_dict)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if not updated:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Не удалось обновить заявку"
@@ -203,12 +432,37 @@ async def update_request(request_id: int, update_data: RequestUpdate):
     
     # Получение обновленной заявки
     updated_request = db.get_requests({'request_id': request_id})[0]
+    assigner.request_updated(existing_request[0], updated_request)
     return updated_request
 
+@app.post("/assignment/rebalance")
+def rebalance_requests(policy: Optional[str] = Query(None, pattern=f"^({'|'.join(POLICIES)})$"),
+                       include_assigned: bool = False,
+                       current_user: CurrentUser = Depends(require_permission(Action.EDIT_REQUEST))):
+    """Распределение неназначенных заявок между мастерами (include_assigned - и новых с мастером)"""
+    changes = assigner.rebalance(policy, include_assigned)
+    return {
+        "message": f"Переназначено заявок: {len(changes)}",
+        "assignments": [{"request_id": request_id, "master_id": master_id} for request_id, master_id in changes]
+    }
+
+@app.get("/assignment/workload")
+async def get_workload(current_user: CurrentUser = Depends(require_permission(Action.EDIT_REQUEST))):
+    """Текущая загрузка мастеров (открытые заявки)"""
+    return {"policy": assigner.default_policy, "workload": assigner.load}
+
 # ========== Комментарии ==========
 @app.post("/comments/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
-async def create_comment(comment: CommentCreateRequest):
+def create_comment(comment: CommentCreateRequest,
+                   current_user: CurrentUser = Depends(require_permission(Action.ADD_COMMENTS))):
     """Добавление комментария к заявке"""
+    # Комментарий оставляется от имени текущего пользователя (роль уже проверена по токену)
+    if comment.master_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Нельзя добавлять комментарии от имени другого пользователя"
+        )
+    
     # Проверка существования заявки
     request = db.get_requests({'request_id': comment.request_id})
     if not request:
@@ -217,22 +471,6 @@ async def create_comment(comment: CommentCreateRequest):
             detail="Заявка не найдена"
         )
     
-    # Проверка пользователя (может быть мастером, менеджером, оператором и т.д.)
-    user = db.get_user_by_id(comment.master_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    # Проверяем, может ли пользователь добавлять комментарии
-    allowed_roles = ['Мастер', 'Менеджер', 'Оператор', 'Менеджер по качеству']
-    if user['type'] not in allowed_roles:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="У вас нет прав для добавления комментариев"
-        )
-    
     try:
         comment_data = comment.dict()
         comment_id = db.add_comment(comment_data)
@@ -254,19 +492,146 @@ async def create_comment(comment: CommentCreateRequest):
             detail=f"Ошибка при создании комментария: {str(e)}"
         )
     
+@app.get("/comments/bulk", response_model=List[CommentResponse])
+async def get_comments_bulk(
+    request_ids: str = Query(..., description="ID заявок через запятую"),
+    include_archived: bool = False,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Комментарии к нескольким заявкам одним запросом (по заявкам, новые первыми)"""
+    ids = parse_ids(request_ids)
+    # Клиент видит комментарии только к своим заявкам
+    if not Permission.check(current_user.type, Action.VIEW_ALL_REQUESTS):
+        own = db.get_requests({'request_ids': ids, 'client_id': current_user.user_id},
+                              fields=['request_id'], include_archived=include_archived)
+        ids = [request['request_id'] for request in own]
+    
+    comments = db.get_comments_bulk(ids, include_archived=include_archived) if ids else []
+    return rows_response(comments, CommentResponse)
+
 @app.get("/comments/{request_id}", response_model=List[CommentResponse])
-async def get_request_comments(request_id: int):
-    """Получение комментариев к заявке"""
-    comments = db.get_comments(request_id)
-    return comments
+async def get_request_comments(
+    request_id: int,
+    limit: int = Query(COMMENTS_PAGE_SIZE, ge=1, le=500),
+    before: Optional[str] = Query(None, description="Курсор: комментарии раньше указанного"),
+    since: Optional[str] = Query(None, description="Курсор или момент времени: только более новые"),
+    include_archived: bool = False,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Комментарии к заявке постранично, новые первыми
+    
+    Курсор следующей (более ранней) страницы передается в заголовке X-Next-Cursor.
+    """
+    try:
+        comments = db.get_comments(request_id, include_archived=include_archived,
+                                   limit=limit + 1, before=before, since=since)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    headers = {}
+    if len(comments) > limit:
+        comments = comments[:limit]
+        headers['X-Next-Cursor'] = comment_cursor(comments[-1])
+    return rows_response(comments, CommentResponse, headers=headers)
+
+# ========== Архив ==========
+@app.post("/archive/run")
+def run_archive(older_than_days: Optional[int] = Query(None, ge=0),
+                current_user: CurrentUser = Depends(require_permission(Action.ARCHIVE_REQUESTS))):
+    """Перенос давно выполненных заявок в архив"""
+    moved = db.archive_completed(older_than_days)
+    return {"message": "Архивация выполнена", "archived": moved}
+
+@app.post("/archive/{request_id}/restore", response_model=RequestResponse)
+def restore_request(request_id: int,
+                    current_user: CurrentUser = Depends(require_permission(Action.ARCHIVE_REQUESTS))):
+    """Возврат заявки из архива"""
+    if not db.restore_request(request_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Заявка не найдена в архиве"
+        )
+    return db.get_requests({'request_id': request_id})[0]
 
 # ========== Статистика ==========
 @app.get("/statistics/", response_model=StatisticsResponse)
-async def get_statistics():
+async def get_statistics(current_user: CurrentUser = Depends(require_permission(Action.VIEW_STATISTICS))):
     """Получение статистики"""
     stats = db.get_statistics()
     return stats
 
+# ========== Выгрузка данных ==========
+def _export_response(table: str, export_format: str, filters: dict) -> StreamingResponse:
+    """Потоковый ответ с выгрузкой таблицы"""
+    if export_format == 'parquet' and not export.parquet_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Для выгрузки в Parquet требуется пакет pyarrow"
+        )
+    
+    return StreamingResponse(
+        export.export_table(db.db_name, table, export_format, filters),
+        media_type=export.EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{export_format}"'}
+    )
+
+@app.get("/export/requests")
+async def export_requests(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: CurrentUser = Depends(require_permission(Action.EXPORT_DATA))
+):
+    """Выгрузка заявок (фильтр по статусу и дате начала)"""
+    return _export_response('requests', format, {
+        'status': status, 'date_from': date_from, 'date_to': date_to
+    })
+
+@app.get("/export/comments")
+async def export_comments(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: CurrentUser = Depends(require_permission(Action.EXPORT_DATA))
+):
+    """Выгрузка комментариев (фильтр по дате создания)"""
+    return _export_response('comments', format, {
+        'date_from': date_from, 'date_to': date_to
+    })
+
+# ========== Аналитические отчеты ==========
+@app.post("/reports/refresh")
+def refresh_reports(current_user: CurrentUser = Depends(require_permission(Action.VIEW_STATISTICS))):
+    """Внеочередное обновление аналитического снимка"""
+    snapshot_at = reports.refresh()
+    return {"message": "Снимок обновлен", "snapshot_at": snapshot_at}
+
+@app.get("/reports/{report_name}")
+def get_report(
+    report_name: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: CurrentUser = Depends(require_permission(Action.VIEW_STATISTICS))
+):
+    """Отчет по снимку данных (masters, tech-types, monthly, statuses)"""
+    build = analytics.REPORTS.get(report_name)
+    if build is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Неизвестный отчет. Доступны: {', '.join(analytics.REPORTS)}"
+        )
+    
+    rows = build(reports, date_from, date_to)
+    return FastJSONResponse({
+        "report": report_name,
+        "snapshot_at": reports.snapshot_at.isoformat(),
+        "rows": rows
+    })
+
 # ========== QR код для оценки ==========
 @app.get("/qrcode/")
 async def get_qrcode_info():
@@ -279,13 +644,22 @@ async def get_qrcode_info():
 
 # ========== Управление пользователями (простые версии) ==========
 @app.get("/users/", response_model=List[UserResponse])
-async def get_all_users():
-    """Получение списка всех пользователей"""
-    users = db.get_all_users()
-    return users
+async def get_all_users(
+    fio_prefix: Optional[str] = None,
+    role: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Список полей через запятую"),
+    current_user: CurrentUser = Depends(require_permission(Action.MANAGE_USERS))
+):
+    """Получение списка пользователей (поиск по началу ФИО, пагинация)"""
+    users = db.get_all_users(fio_prefix=fio_prefix, role=role, limit=limit, offset=offset,
+                             fields=parse_fields(fields, UserResponse))
+    return rows_response(users, UserResponse, partial=fields is not None)
 
 @app.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(user_id: int, user_update: dict):
+def update_user(user_id: int, user_update: UserUpdate,
+                current_user: CurrentUser = Depends(require_permission(Action.MANAGE_USERS))):
     """Обновление данных пользователя"""
     # Проверка существования пользователя
     user = db.get_user_by_id(user_id)
@@ -296,7 +670,14 @@ async def update_user(user_id: int, user_update: dict):
         )
     
     # Обновление пользователя
-    if not db.update_user(user_id, user_update):
+    try:
+        updated = db.update_user(user_id, {k: v for k, v in user_update.dict().items() if v is not None})
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if not updated:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Не удалось обновить пользователя"
@@ -307,7 +688,8 @@ async def update_user(user_id: int, user_update: dict):
     return updated_user
 
 @app.delete("/users/{user_id}")
-async def delete_user(user_id: int):
+def delete_user(user_id: int,
+                current_user: CurrentUser = Depends(require_permission(Action.MANAGE_USERS))):
     """Удаление пользователя"""
     # Удаление пользователя
     if not db.delete_user(user_id):
@@ -324,6 +706,7 @@ async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None),
     )
 
 @app.exception_handler(Exception)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Версионные миграции схемы основной базы: единственное описание таблиц и индексов
+для сервера (Database) и скрипта загрузки (load_data)
+
+Каждая миграция - шаг схемы в короткой транзакции и, при необходимости,
+заполнение данных порциями: каждая порция - отдельная транзакция, между
+порциями запись доступна другим соединениям. Примененные версии хранятся в
+таблице schema_version; прерванное заполнение продолжается при следующем запуске.
+
+Миграции написаны идемпотентно (IF NOT EXISTS), поэтому базы, созданные до
+появления schema_version, приводятся к актуальной схеме применением всех шагов.
+
+Запуск: python migrations.py [база] [--status]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import sla
+
+# Строк в одной порции заполнения данных
+MIGRATION_BATCH_SIZE = int(os.environ.get('REPAIR_MIGRATION_BATCH_SIZE', 5000))
+# Пауза между порциями (секунды): окно для записи других соединений
+MIGRATION_BATCH_PAUSE = float(os.environ.get('REPAIR_MIGRATION_BATCH_PAUSE', 0.01))
+# Ожидание блокировки записи (мс)
+MIGRATION_BUSY_TIMEOUT = 30000
+
+# Реестр миграций: версия -> описание миграции
+MIGRATIONS: Dict[int, Dict] = {}
+
+
+def migration(version: int, description: str, backfill: Optional[Callable] = None):
+    """Регистрация шага схемы schema(cursor); backfill(conn) заполняет данные порциями"""
+    def decorator(func: Callable):
+        if version in MIGRATIONS:
+            raise ValueError(f"Миграция {version} уже зарегистрирована")
+        MIGRATIONS[version] = {'version': version, 'description': description,
+                               'schema': func, 'backfill': backfill}
+        return func
+    return decorator
+
+
+def backfill_in_batches(conn: sqlite3.Connection, table: str, assignment: str, condition: str,
+                        batch_size: int = MIGRATION_BATCH_SIZE, pause: float = MIGRATION_BATCH_PAUSE) -> int:
+    """UPDATE table SET assignment WHERE condition диапазонами rowid по batch_size строк
+
+    Блокировка записи держится только на время одной порции. Возвращает число
+    измененных строк.
+    """
+    last_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+    updated = 0
+    for start in range(0, last_rowid, batch_size):
+        with conn:
+            updated += conn.execute(
+                f"UPDATE {table} SET {assignment} WHERE rowid > ? AND rowid <= ? AND ({condition})",
+                (start, start + batch_size)
+            ).rowcount
+        if pause:
+            time.sleep(pause)
+    return updated
+
+
+# ========== Миграции ==========
+
+@migration(1, "Таблицы пользователей, заявок и комментариев")
+def create_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fio TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            login TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            type TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS requests (
+            request_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_date DATE NOT NULL DEFAULT CURRENT_DATE,
+            home_tech_type TEXT NOT NULL,
+            home_tech_model TEXT NOT NULL,
+            problem_description TEXT NOT NULL,
+            request_status TEXT NOT NULL DEFAULT 'Новая заявка',
+            completion_date DATE,
+            repair_parts TEXT,
+            master_id INTEGER,
+            client_id INTEGER NOT NULL,
+            FOREIGN KEY (master_id) REFERENCES users(user_id),
+            FOREIGN KEY (client_id) REFERENCES users(user_id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS comments (
+            comment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message TEXT NOT NULL,
+            master_id INTEGER NOT NULL,
+            request_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (master_id) REFERENCES users(user_id),
+            FOREIGN KEY (request_id) REFERENCES requests(request_id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_status ON requests(request_status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_client ON requests(client_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_master ON requests(master_id)')
+
+
+@migration(2, "Индексы справочника пользователей по роли и ФИО")
+def create_user_indexes(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_type_fio ON users(type, fio)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_fio ON users(fio)')
+
+
+def _backfill_deadlines(conn):
+    return backfill_in_batches(conn, 'requests', f"deadline = {sla.deadline_expression('requests')}",
+                               "deadline IS NULL")
+
+
+@migration(3, "Сроки выполнения заявок: колонка deadline, правила и триггеры", backfill=_backfill_deadlines)
+def create_deadlines(cursor):
+    sla.create_sla_schema(cursor)
+
+
+@migration(4, "Частичный индекс открытых заявок по сроку")
+def create_deadline_index(cursor):
+    # После заполнения сроков: индекс строится один раз, а не обновляется на каждой порции
+    sla.create_deadline_index(cursor)
+
+
+@migration(5, "Лента комментариев: индекс (request_id, created_at, comment_id)")
+def create_comment_timeline_index(cursor):
+    cursor.execute('DROP INDEX IF EXISTS idx_comments_request')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_timeline ON comments(request_id, created_at, comment_id)')
+
+
+@migration(6, "Индекс заявок по дате поступления (постраничный вывод)")
+def create_start_date_index(cursor):
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_start ON requests(start_date)')
+
+
+@migration(7, "Пересчет сроков открытых заявок при изменении правил sla_rules")
+def create_sla_rule_triggers(cursor):
+    sla.create_rule_triggers(cursor)
+
+
+# ========== Применение ==========
+
+LATEST_VERSION = max(MIGRATIONS)
+
+
+def _connect(db_name: str) -> sqlite3.Connection:
+    # Транзакциями управляет код миграций
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    conn.execute(f'PRAGMA busy_timeout = {MIGRATION_BUSY_TIMEOUT}')
+    return conn
+
+
+def applied_versions(conn: sqlite3.Connection) -> List[int]:
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return []
+    return [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+
+
+def pending_migrations(conn: sqlite3.Connection) -> List[Dict]:
+    applied = set(applied_versions(conn))
+    return [MIGRATIONS[version] for version in sorted(MIGRATIONS) if version not in applied]
+
+
+def migrate(db_name: str = "repair_service.db", verbose: bool = False) -> List[int]:
+    """Применение недостающих миграций по порядку; возвращает примененные версии"""
+    conn = _connect(db_name)
+    try:
+        # Схема актуальна - одна проверка без блокировок
+        if not pending_migrations(conn):
+            return []
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        applied = []
+        for spec in pending_migrations(conn):
+            started = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Миграцию мог применить другой процесс, пока этот ждал блокировку
+                if spec['version'] in applied_versions(conn):
+                    conn.execute('COMMIT')
+                    continue
+                spec['schema'](conn.cursor())
+                if spec['backfill'] is None:
+                    _record(conn, spec)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+            if spec['backfill'] is not None:
+                # Заполнение порциями вне общей транзакции; версия записывается после него
+                spec['backfill'](conn)
+                with conn:
+                    _record(conn, spec)
+
+            applied.append(spec['version'])
+            if verbose:
+                print(f"✓ {spec['version']}: {spec['description']} "
+                      f"({(time.perf_counter() - started) * 1000:.0f} мс)")
+        return applied
+    finally:
+        conn.close()
+
+
+def _record(conn: sqlite3.Connection, spec: Dict):
+    conn.execute("INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?)",
+                 (spec['version'], spec['description']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции схемы базы данных")
+    parser.add_argument('database', nargs='?', default="repair_service.db")
+    parser.add_argument('--status', action='store_true', help="Только показать примененные и ожидающие миграции")
+    args = parser.parse_args()
+
+    if args.status:
+        if not os.path.exists(args.database):
+            print(f"✗ База данных {args.database} не найдена", file=sys.stderr)
+            sys.exit(1)
+        conn = _connect(args.database)
+        try:
+            applied = set(applied_versions(conn))
+        finally:
+            conn.close()
+        for version in sorted(MIGRATIONS):
+            mark = '✓' if version in applied else ' '
+            print(f"  {mark} {version}: {MIGRATIONS[version]['description']}")
+        return
+
+    applied = migrate(args.database, verbose=True)
+    if not applied:
+        print(f"✓ Схема актуальна (версия {LATEST_VERSION})")
+    else:
+        print(f"✓ Применено миграций: {len(applied)}, версия схемы {LATEST_VERSION}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr, Field
-from datetime import date, datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from datetime import date, datetime, timezone
 from typing import Optional, List
-from enum import Enum
+from enum import Enum, IntFlag
 
 class RequestStatus(str, Enum):
     NEW = "Новая заявка"
@@ -33,6 +33,17 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class LoginResponse(UserResponse):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
+class CurrentUser(BaseModel):
+    """Пользователь, восстановленный из токена доступа"""
+    user_id: int
+    fio: str
+    type: UserRole
+
 class RequestCreate(BaseModel):
     home_tech_type: str = Field(..., description="Вид бытовой техники")
     home_tech_model: str = Field(..., description="Модель бытовой техники")
@@ -58,6 +69,7 @@ class RequestResponse(BaseModel):
     repair_parts: Optional[str] = None
     master_id: Optional[int] = None
     client_id: int
+    deadline: Optional[date] = None
     client_fio: Optional[str] = None
     master_fio: Optional[str] = None
     
@@ -79,6 +91,27 @@ class CommentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def comment_cursor(comment: dict) -> str:
+    """Курсор ленты комментариев: "created_at|comment_id" """
+    return f"{comment['created_at']}|{comment['comment_id']}"
+
+def parse_comment_cursor(cursor: str) -> tuple:
+    """Разбор курсора; без "|comment_id" курсор - просто момент времени
+    
+    Время принимается в любом формате ISO 8601 (с "T" или пробелом, только дата) и
+    приводится к формату CURRENT_TIMESTAMP в SQLite (UTC), с которым сравнивается.
+    """
+    created_at, _, comment_id = cursor.partition('|')
+    if comment_id and not comment_id.isdigit():
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    try:
+        moment = datetime.fromisoformat(created_at.strip())
+    except ValueError:
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime('%Y-%m-%d %H:%M:%S'), int(comment_id or 0)
+
 class StatisticsResponse(BaseModel):
     total_requests: int
     completed_requests: int
@@ -87,49 +120,82 @@ class StatisticsResponse(BaseModel):
     requests_by_tech_type: dict
 
 class UserUpdate(BaseModel):
+    # Лишние ключи - ошибка, а не молча пропущенные поля
+    model_config = ConfigDict(extra='forbid')
+    
     fio: Optional[str] = None
     phone: Optional[str] = None
     login: Optional[str] = None
     password: Optional[str] = None
     type: Optional[UserRole] = None
 
+class Action(IntFlag):
+    """Действия, на которые выдаются права"""
+    VIEW_ALL_REQUESTS = 1
+    CREATE_REQUEST = 2
+    EDIT_REQUEST = 4
+    MANAGE_USERS = 8
+    VIEW_CLIENT_REQUESTS = 16
+    VIEW_MASTER_REQUESTS = 32
+    ADD_COMMENTS = 64
+    VIEW_STATISTICS = 128
+    SEARCH_REQUESTS = 256
+    EXPORT_DATA = 512
+    ARCHIVE_REQUESTS = 1024
+
+# Матрица прав: единый источник для backend и frontend
+PERMISSION_MATRIX = {
+    UserRole.MANAGER: [
+        Action.VIEW_ALL_REQUESTS, Action.CREATE_REQUEST, Action.EDIT_REQUEST, Action.MANAGE_USERS,
+        Action.ADD_COMMENTS, Action.VIEW_STATISTICS, Action.SEARCH_REQUESTS, Action.EXPORT_DATA,
+        Action.ARCHIVE_REQUESTS
+    ],
+    UserRole.OPERATOR: [
+        Action.VIEW_ALL_REQUESTS, Action.CREATE_REQUEST, Action.EDIT_REQUEST,
+        Action.ADD_COMMENTS, Action.VIEW_STATISTICS, Action.SEARCH_REQUESTS
+    ],
+    UserRole.QUALITY_MANAGER: [
+        Action.VIEW_ALL_REQUESTS, Action.EDIT_REQUEST,
+        Action.ADD_COMMENTS, Action.VIEW_STATISTICS, Action.SEARCH_REQUESTS, Action.EXPORT_DATA
+    ],
+    UserRole.MASTER: [
+        Action.VIEW_ALL_REQUESTS, Action.VIEW_MASTER_REQUESTS,
+        Action.ADD_COMMENTS, Action.SEARCH_REQUESTS
+    ],
+    UserRole.CLIENT: [
+        Action.CREATE_REQUEST, Action.VIEW_CLIENT_REQUESTS
+    ],
+}
+
+def _compile_role_masks(matrix: dict) -> dict:
+    """Сборка битовой маски для каждой роли (ключи - и член перечисления, и строка)"""
+    masks = {}
+    for role, actions in matrix.items():
+        mask = 0
+        for action in actions:
+            mask |= int(action)
+        masks[role] = mask
+        masks[role.value] = mask
+    return masks
+
+_ROLE_MASKS = _compile_role_masks(PERMISSION_MATRIX)
+
 class Permission:
     """Класс для проверки прав доступа"""
     
     @staticmethod
-    def can_view_all_requests(user_role: UserRole) -> bool:
-        """Может ли пользователь просматривать все заявки"""
-        return user_role in [UserRole.MANAGER, UserRole.OPERATOR, UserRole.QUALITY_MANAGER, UserRole.MASTER]
-    
-    @staticmethod
-    def can_create_request(user_role: UserRole) -> bool:
-        """Может ли пользователь создавать заявки"""
-        return user_role in [UserRole.CLIENT, UserRole.MANAGER, UserRole.OPERATOR]
-    
-    @staticmethod
-    def can_edit_request(user_role: UserRole) -> bool:
-        """Может ли пользователь редактировать заявки"""
-        return user_role in [UserRole.MANAGER, UserRole.OPERATOR, UserRole.QUALITY_MANAGER, UserRole.MASTER]
-    
-    @staticmethod
-    def can_manage_users(user_role: UserRole) -> bool:
-        """Может ли пользователь управлять пользователями"""
-        return user_role in [UserRole.MANAGER]
-    
-    @staticmethod
-    def can_view_client_requests(user_role: UserRole) -> bool:
-        """Может ли пользователь просматривать заявки клиента"""
-        return user_role == UserRole.CLIENT
-    
-    @staticmethod
-    def can_view_master_requests(user_role: UserRole) -> bool:
-        """Может ли мастер просматривать свои заявки"""
-        return user_role == UserRole.MASTER
+    def mask(*actions: Action) -> int:
+        """Битовая маска набора действий"""
+        required = 0
+        for action in actions:
+            required |= int(action)
+        return required
     
     @staticmethod
-    def can_add_comments(user_role: UserRole) -> bool:
-        """Может ли пользователь добавлять комментарии"""
-        return user_role in [UserRole.MASTER, UserRole.MANAGER, UserRole.QUALITY_MANAGER, UserRole.OPERATOR]
+    def check(user_role, *actions: Action) -> bool:
+        """Разрешены ли роли все перечисленные действия"""
+        required = Permission.mask(*actions)
+        return _ROLE_MASKS.get(user_role, 0) & required == required
     
 class CommentCreateRequest(BaseModel):
     message: str = Field(..., description="Текст комментария")
@@ -0,0 +1,171 @@
+"""
+Построитель запросов: конечный набор проверенных форм SQL для заявок и
+пользователей и соединения чтения, переиспользующие подготовленные выражения
+
+Имена колонок и фильтров берутся только из белых списков, значения всегда
+передаются параметрами. Форма запроса (набор полей, фильтров, колонок SET)
+приводится к каноническому порядку и компилируется в текст SQL один раз;
+одинаковый текст на постоянном соединении находит готовое выражение в кеше
+sqlite3 (cached_statements) без повторного разбора.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import archive
+
+# Размер кеша подготовленных выражений на соединение и кеша скомпилированных форм
+STATEMENT_CACHE_SIZE = int(os.environ.get('REPAIR_STATEMENT_CACHE_SIZE', 256))
+
+# Поля заявки -> выражения SELECT (выбираются только запрошенные поля)
+REQUEST_FIELDS = {
+    'request_id': 'r.request_id',
+    'start_date': 'r.start_date',
+    'home_tech_type': 'r.home_tech_type',
+    'home_tech_model': 'r.home_tech_model',
+    'problem_description': 'r.problem_description',
+    'request_status': 'r.request_status',
+    'completion_date': 'r.completion_date',
+    'repair_parts': 'r.repair_parts',
+    'master_id': 'r.master_id',
+    'client_id': 'r.client_id',
+    'deadline': 'r.deadline',
+    'client_fio': 'c.fio AS client_fio',
+    'master_fio': 'm.fio AS master_fio',
+}
+
+USER_FIELDS = ('user_id', 'fio', 'phone', 'login', 'type')
+
+# Фильтры списка заявок: имя -> (условие, параметры из значения)
+REQUEST_FILTERS = {
+    'request_id': ("r.request_id = ?", lambda value: (value,)),
+    # Список ID одним параметром (без ограничения на число "?" в запросе)
+    'request_ids': ("r.request_id IN (SELECT value FROM json_each(?))", lambda value: (json.dumps(value),)),
+    'client_id': ("r.client_id = ?", lambda value: (value,)),
+    'master_id': ("r.master_id = ?", lambda value: (value,)),
+    'status': ("r.request_status = ?", lambda value: (value,)),
+    'search': ("(r.home_tech_type LIKE ? OR r.home_tech_model LIKE ? OR r.problem_description LIKE ?)",
+               lambda value: (f"%{value}%",) * 3),
+}
+
+# Изменяемые колонки: таблица -> (ключ строки, разрешенные колонки SET)
+UPDATABLE_COLUMNS = {
+    'requests': ('request_id', ('request_status', 'problem_description', 'master_id',
+                                'repair_parts', 'completion_date')),
+    'users': ('user_id', ('fio', 'phone', 'login', 'password', 'type')),
+}
+
+
+def check_fields(fields: Optional[List[str]], allowed) -> List[str]:
+    """Проверка списка полей (по умолчанию - все поля) в порядке allowed"""
+    if not fields:
+        return list(allowed)
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+    # Канонический порядок: перестановки одних и тех же полей дают одну форму запроса
+    requested = set(fields)
+    return [field for field in allowed if field in requested]
+
+
+def request_filters(filters: Optional[Dict]) -> Tuple[tuple, list]:
+    """Форма фильтров (имена в каноническом порядке) и параметры; пустые значения не фильтруют"""
+    filters = filters or {}
+    unknown = [name for name in filters if name not in REQUEST_FILTERS]
+    if unknown:
+        raise ValueError(f"Неизвестные фильтры: {', '.join(unknown)}")
+    shape, params = [], []
+    for name, (_, to_params) in REQUEST_FILTERS.items():
+        if filters.get(name):
+            shape.append(name)
+            params.extend(to_params(filters[name]))
+    return tuple(shape), params
+
+
+def _where(filter_shape: tuple) -> str:
+    if not filter_shape:
+        return ""
+    return " WHERE " + " AND ".join(REQUEST_FILTERS[name][0] for name in filter_shape)
+
+
+def select_requests(fields: List[str], source: str = 'requests') -> str:
+    """SELECT заявок с нужными полями (соединения с users только если нужны ФИО)"""
+    query = f"SELECT {', '.join(REQUEST_FIELDS[field] for field in fields)} FROM {source} r"
+    if 'client_fio' in fields:
+        query += " LEFT JOIN users c ON r.client_id = c.user_id"
+    if 'master_fio' in fields:
+        query += " LEFT JOIN users m ON r.master_id = m.user_id"
+    return query
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def requests_page_sql(fields: tuple, filter_shape: tuple, include_archived: bool, paged: bool) -> str:
+    """Список заявок; параметры - значения фильтров, затем LIMIT и OFFSET при paged"""
+    source = archive.union_source('requests') if include_archived else 'requests'
+    # request_id - второй ключ сортировки: страницы не пересекаются при равных датах
+    query = (select_requests(list(fields), source) + _where(filter_shape)
+             + " ORDER BY r.start_date DESC, r.request_id DESC")
+    if paged:
+        query += " LIMIT ? OFFSET ?"
+    return query
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def count_requests_sql(filter_shape: tuple, include_archived: bool) -> str:
+    source = archive.union_source('requests') if include_archived else 'requests'
+    return f"SELECT COUNT(*) FROM {source} r" + _where(filter_shape)
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def update_sql(table: str, columns: tuple) -> str:
+    key, _ = UPDATABLE_COLUMNS[table]
+    return f"UPDATE {table} SET {', '.join(f'{column} = ?' for column in columns)} WHERE {key} = ?"
+
+
+def build_update(table: str, row_id: int, data: Dict) -> Optional[Tuple[str, list]]:
+    """UPDATE по разрешенным колонкам (None не изменяет колонку); None, если менять нечего"""
+    _, allowed = UPDATABLE_COLUMNS[table]
+    unknown = [column for column in data if column not in allowed]
+    if unknown:
+        raise ValueError(f"Неизменяемые или неизвестные поля: {', '.join(unknown)}")
+    columns = tuple(column for column in allowed if data.get(column) is not None)
+    if not columns:
+        return None
+    return update_sql(table, columns), [data[column] for column in columns] + [row_id]
+
+
+class ConnectionPool:
+    """Постоянные соединения чтения по потокам (свой кеш подготовленных выражений у каждого)
+
+    Соединение с архивом подключает его один раз, а не на каждый запрос.
+    """
+
+    def __init__(self, db_name: str):
+        self.db_name = db_name
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def get(self, include_archived: bool = False) -> sqlite3.Connection:
+        connections = self._local.__dict__.setdefault('connections', {})
+        conn = connections.get(include_archived)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, cached_statements=STATEMENT_CACHE_SIZE,
+                                   check_same_thread=False)
+            if include_archived:
+                archive.attach_archive(conn, self.db_name)
+            connections[include_archived] = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
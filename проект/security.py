@@ -0,0 +1,261 @@
+"""
+Хеширование паролей, кэш успешных проверок и подписанные токены доступа
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+# Параметры scrypt (N можно подобрать под бюджет задержки через calibrate_cost)
+SCRYPT_N = int(os.environ.get('REPAIR_SCRYPT_N', 2 ** 14))
+SCRYPT_R = 8
+SCRYPT_P = 1
+# Запасной вариант для сборок Python без hashlib.scrypt
+PBKDF2_ITERATIONS = int(os.environ.get('REPAIR_PBKDF2_ITERATIONS', 200_000))
+# Если задан бюджет (мс), стоимость подбирается при старте
+HASH_BUDGET_MS = os.environ.get('REPAIR_PASSWORD_HASH_BUDGET_MS')
+
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+# Пул потоков для KDF, чтобы проверка пароля не блокировала event loop
+KDF_WORKERS = int(os.environ.get('REPAIR_KDF_WORKERS', 4))
+# Время жизни записи в кэше успешных проверок (секунды)
+VERIFY_CACHE_TTL = int(os.environ.get('REPAIR_VERIFY_CACHE_TTL', 300))
+VERIFY_CACHE_SIZE = 1024
+
+# Секрет для подписи токенов; при нескольких воркерах его нужно задать явно
+SECRET_KEY = os.environ.get('REPAIR_SECRET_KEY')
+# Время жизни токена доступа (секунды)
+TOKEN_TTL = int(os.environ.get('REPAIR_TOKEN_TTL', 8 * 3600))
+
+HAS_SCRYPT = hasattr(hashlib, 'scrypt')
+HASH_PREFIXES = ('scrypt$', 'pbkdf2_sha256$')
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _scrypt(password: bytes, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem с запасом: scrypt требует около 128 * r * n байт
+    return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n, dklen=KEY_SIZE)
+
+
+def calibrate_cost(budget_ms: float, r: int = SCRYPT_R, p: int = SCRYPT_P) -> int:
+    """Подбор максимального N для scrypt, укладывающегося в бюджет (мс)"""
+    n = 2 ** 10
+    salt = os.urandom(SALT_SIZE)
+    while n < 2 ** 20:
+        start = time.perf_counter()
+        _scrypt(b'calibration', salt, n * 2, r, p)
+        if (time.perf_counter() - start) * 1000 > budget_ms:
+            break
+        n *= 2
+    return n
+
+
+class PasswordHasher:
+    """Хеширование и проверка паролей с настраиваемой стоимостью"""
+
+    def __init__(self, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P,
+                 iterations: int = PBKDF2_ITERATIONS):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.iterations = iterations
+
+    def hash(self, password: str) -> str:
+        """Хеширование пароля"""
+        salt = os.urandom(SALT_SIZE)
+        if HAS_SCRYPT:
+            key = _scrypt(password.encode(), salt, self.n, self.r, self.p)
+            return f"scrypt${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}"
+
+        key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, self.iterations, KEY_SIZE)
+        return f"pbkdf2_sha256${self.iterations}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, password: str, stored: str) -> Tuple[bool, bool]:
+        """Проверка пароля, возвращает (совпадает, нужно_перехешировать)"""
+        stored = str(stored)
+
+        if not is_hashed(stored):
+            # Старые записи хранят пароль открытым текстом
+            ok = hmac.compare_digest(stored.encode(), password.encode())
+            return ok, ok
+
+        try:
+            algorithm, *params = stored.split('$')
+            if algorithm == 'scrypt':
+                n, r, p, salt, key = params
+                n, r, p = int(n), int(r), int(p)
+                candidate = _scrypt(password.encode(), _b64decode(salt), n, r, p)
+                needs_rehash = (n, r, p) != (self.n, self.r, self.p)
+            else:
+                iterations, salt, key = params
+                iterations = int(iterations)
+                candidate = hashlib.pbkdf2_hmac('sha256', password.encode(), _b64decode(salt),
+                                                iterations, KEY_SIZE)
+                needs_rehash = HAS_SCRYPT or iterations != self.iterations
+        except (ValueError, TypeError):
+            return False, False
+
+        ok = hmac.compare_digest(candidate, _b64decode(key))
+        return ok, ok and needs_rehash
+
+
+class VerificationCache:
+    """Кэш успешных проверок пароля с ограниченным временем жизни
+
+    Ключ включает сохраненный хеш, поэтому смена пароля автоматически
+    делает старые записи недействительными.
+    """
+
+    def __init__(self, ttl: int = VERIFY_CACHE_TTL, maxsize: int = VERIFY_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._key = secrets.token_bytes(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _make_key(self, login: str, password: str, stored: str) -> bytes:
+        message = '\0'.join((login, password, str(stored))).encode()
+        return hmac.new(self._key, message, hashlib.sha256).digest()
+
+    def contains(self, login: str, password: str, stored: str) -> bool:
+        """Есть ли свежая успешная проверка для этой пары логин/пароль"""
+        if self.ttl <= 0:
+            return False
+        key = self._make_key(login, password, stored)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, login: str, password: str, stored: str):
+        """Запоминание успешной проверки"""
+        if self.ttl <= 0:
+            return
+        key = self._make_key(login, password, stored)
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def is_hashed(stored: Optional[str]) -> bool:
+    """Хранится ли пароль в виде хеша"""
+    return bool(stored) and str(stored).startswith(HASH_PREFIXES)
+
+
+if HASH_BUDGET_MS and HAS_SCRYPT:
+    password_hasher = PasswordHasher(n=calibrate_cost(float(HASH_BUDGET_MS)))
+else:
+    password_hasher = PasswordHasher()
+
+verification_cache = VerificationCache()
+
+_kdf_executor = ThreadPoolExecutor(max_workers=KDF_WORKERS, thread_name_prefix="kdf")
+
+
+async def run_in_kdf_pool(func, *args):
+    """Выполнение функции (с KDF внутри) в отдельном пуле потоков"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_kdf_executor, func, *args)
+
+
+def migrate_plaintext_passwords(db_name: str = "repair_service.db") -> int:
+    """Перехеширование паролей, хранящихся открытым текстом"""
+    conn = sqlite3.connect(db_name)
+    try:
+        rows = [
+            (user_id, password)
+            for user_id, password in conn.execute("SELECT user_id, password FROM users")
+            if not is_hashed(password)
+        ]
+        if not rows:
+            return 0
+
+        # KDF считается параллельно, запись одной транзакцией
+        hashes = list(_kdf_executor.map(lambda row: password_hasher.hash(str(row[1])), rows))
+        with conn:
+            # Условие на старый пароль не даёт затереть пароль, измененный во время миграции
+            conn.executemany(
+                "UPDATE users SET password = ? WHERE user_id = ? AND password = ?",
+                [(hashed, user_id, password) for (user_id, password), hashed in zip(rows, hashes)]
+            )
+        return len(rows)
+    finally:
+        conn.close()
+
+
+class TokenError(Exception):
+    """Недействительный или просроченный токен"""
+
+
+# Без REPAIR_SECRET_KEY ключ случайный, и токены живут до перезапуска процесса
+_token_key = (SECRET_KEY or secrets.token_hex(32)).encode()
+
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(_token_key, body.encode('ascii'), hashlib.sha256).digest())
+
+
+def issue_token(user: dict, ttl: int = TOKEN_TTL) -> str:
+    """Выпуск подписанного токена с ролью пользователя"""
+    now = int(time.time())
+    payload = {
+        'sub': user['user_id'],
+        'fio': user['fio'],
+        'role': user['type'],
+        'iat': now,
+        'exp': now + ttl
+    }
+    body = _b64encode(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode())
+    return f"{body}.{_sign(body)}"
+
+
+def decode_token(token: str) -> dict:
+    """Проверка подписи и срока действия токена (без обращения к БД)"""
+    try:
+        body, signature = token.split('.')
+        valid = hmac.compare_digest(signature.encode(), _sign(body).encode())
+    except ValueError:
+        raise TokenError("Неверный формат токена")
+
+    if not valid:
+        raise TokenError("Неверная подпись токена")
+
+    try:
+        claims = json.loads(_b64decode(body))
+    except ValueError:
+        raise TokenError("Неверный формат токена")
+
+    if claims.get('exp', 0) < time.time():
+        raise TokenError("Срок действия токена истек")
+    return claims
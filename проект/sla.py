@@ -0,0 +1,194 @@
+"""
+Сроки выполнения заявок (SLA): колонка deadline, частичный индекс открытых
+заявок по сроку и фоновый поиск просроченных заявок
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from models import RequestStatus
+
+# Срок ремонта по умолчанию (дней от даты поступления)
+SLA_DEFAULT_DAYS = int(os.environ.get('REPAIR_SLA_DEFAULT_DAYS', 14))
+# Период фоновой проверки просроченных заявок (секунды)
+SLA_SCAN_INTERVAL = int(os.environ.get('REPAIR_SLA_SCAN_INTERVAL', 60))
+# Период полной проверки всех открытых заявок без нижней границы срока (секунды)
+SLA_FULL_SCAN_INTERVAL = int(os.environ.get('REPAIR_SLA_FULL_SCAN_INTERVAL', 3600))
+
+# Начальные сроки по видам техники (редактируются в таблице sla_rules, '*' - по умолчанию)
+DEFAULT_SLA_RULES = {
+    '*': SLA_DEFAULT_DAYS,
+    'Фен': 3,
+    'Тостер': 3,
+    'Мультиварка': 5,
+    'Холодильник': 10,
+    'Стиральная машина': 10,
+}
+
+COMPLETED_STATUS = RequestStatus.READY.value
+
+# Условие "заявка открыта" - то же, что в частичном индексе (иначе индекс не используется)
+OPEN_CONDITION = f"request_status != '{COMPLETED_STATUS}'"
+
+
+def deadline_expression(row: str) -> str:
+    """SQL-выражение срока заявки row (NEW в триггере или имя таблицы)"""
+    return f'''date({row}.start_date, '+' || COALESCE(
+        (SELECT days FROM sla_rules WHERE home_tech_type = {row}.home_tech_type),
+        (SELECT days FROM sla_rules WHERE home_tech_type = '*'),
+        {SLA_DEFAULT_DAYS}
+    ) || ' days')'''
+
+
+def create_sla_schema(cursor):
+    """Колонка deadline, правила сроков и триггеры пересчета (миграция схемы)"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(requests)")}
+    if 'deadline' not in columns:
+        cursor.execute("ALTER TABLE requests ADD COLUMN deadline DATE")
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sla_rules (
+            home_tech_type TEXT PRIMARY KEY,
+            days INTEGER NOT NULL CHECK (days > 0)
+        )
+    ''')
+    cursor.executemany("INSERT OR IGNORE INTO sla_rules (home_tech_type, days) VALUES (?, ?)",
+                       list(DEFAULT_SLA_RULES.items()))
+
+    # Срок считается самой БД, поэтому он верен для любого источника записи (API, импорт, архив)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_requests_deadline_insert
+        AFTER INSERT ON requests WHEN NEW.deadline IS NULL
+        BEGIN
+            UPDATE requests SET deadline = {deadline_expression('NEW')} WHERE request_id = NEW.request_id;
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_requests_deadline_update
+        AFTER UPDATE OF start_date, home_tech_type ON requests
+        BEGIN
+            UPDATE requests SET deadline = {deadline_expression('NEW')} WHERE request_id = NEW.request_id;
+        END
+    ''')
+
+
+def create_rule_triggers(cursor):
+    """Пересчет сроков открытых заявок при изменении правил (правило '*' - для всех видов техники)"""
+    recompute = f"UPDATE requests SET deadline = {deadline_expression('requests')} WHERE {OPEN_CONDITION}"
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sla_rules_insert
+        AFTER INSERT ON sla_rules
+        BEGIN
+            {recompute} AND (NEW.home_tech_type = '*' OR home_tech_type = NEW.home_tech_type);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sla_rules_update
+        AFTER UPDATE ON sla_rules
+        BEGIN
+            {recompute} AND ('*' IN (OLD.home_tech_type, NEW.home_tech_type)
+                              OR home_tech_type IN (OLD.home_tech_type, NEW.home_tech_type));
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sla_rules_delete
+        AFTER DELETE ON sla_rules
+        BEGIN
+            {recompute} AND (OLD.home_tech_type = '*' OR home_tech_type = OLD.home_tech_type);
+        END
+    ''')
+
+
+def create_deadline_index(cursor):
+    """Частичный индекс открытых заявок по сроку"""
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_requests_open_deadline
+        ON requests(deadline) WHERE {OPEN_CONDITION}
+    ''')
+
+
+class SlaMonitor:
+    """Фоновая проверка: находит заявки, срок которых истек с прошлой проверки
+
+    Обычная проверка читает только окно сроков с прошлой проверки. Заявки, срок
+    которых оказался в прошлом задним числом (изменена дата поступления или
+    правило срока), находит полная проверка раз в full_scan_interval секунд.
+    """
+
+    def __init__(self, db, interval: int = SLA_SCAN_INTERVAL, history: int = 1000,
+                 full_scan_interval: int = SLA_FULL_SCAN_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self.full_scan_interval = full_scan_interval
+        # Граница уже просмотренных сроков: следующая проверка читает только [watermark, сегодня)
+        self.watermark: Optional[str] = None
+        self.last_scan: Optional[datetime] = None
+        self.overdue_count = 0
+        self.recently_overdue = deque(maxlen=history)
+        # Уже найденные просроченные заявки (чтобы полная проверка не сообщала о них повторно)
+        self._reported = set()
+        self._last_full_scan: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def scan(self, full: bool = False) -> List[Dict]:
+        """Проверка окна сроков с прошлой проверки (первая и периодическая полная - все открытые заявки)"""
+        today = date.today().isoformat()
+        with self._lock:
+            full = (full or self._last_full_scan is None
+                    or time.monotonic() - self._last_full_scan >= self.full_scan_interval)
+            overdue = self.db.get_overdue_requests(
+                as_of=today, due_after=None if full else self.watermark,
+                fields=['request_id', 'deadline', 'home_tech_type', 'master_id']
+            )
+            newly_due = [request for request in overdue if request['request_id'] not in self._reported]
+            if full:
+                # Закрытые и больше не просроченные заявки выходят из множества
+                self._reported = {request['request_id'] for request in overdue}
+                self._last_full_scan = time.monotonic()
+            else:
+                self._reported.update(request['request_id'] for request in newly_due)
+            self.overdue_count = self.db.count_overdue_requests(today)
+            detected_at = datetime.now().replace(microsecond=0).isoformat()
+            for request in newly_due:
+                self.recently_overdue.append(dict(request, detected_at=detected_at))
+            if newly_due and self.watermark is not None:
+                print(f"⚠ Просрочено новых заявок: {len(newly_due)} "
+                      f"({', '.join(str(r['request_id']) for r in newly_due[:10])})")
+            # Сроки до сегодняшнего уже просмотрены; срок "сегодня" попадет в окно следующего дня
+            self.watermark = today
+            self.last_scan = datetime.now().replace(microsecond=0)
+        return newly_due
+
+    def status(self) -> Dict:
+        return {
+            'last_scan': self.last_scan.isoformat() if self.last_scan else None,
+            'overdue_count': self.overdue_count,
+            'recently_overdue': list(self.recently_overdue)[-50:],
+        }
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sla-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"✗ Ошибка при проверке сроков заявок: {e}")
+            if self._stop.wait(self.interval):
+                break
@@ -0,0 +1,45 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули проекта импортируются по имени, как при запуске из папки проекта
+sys.path.insert(0, PROJECT_DIR)
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    """Клиент API на копии учебной базы (рабочая база не изменяется)"""
+    from fastapi.testclient import TestClient
+
+    folder = tmp_path_factory.mktemp('api')
+    shutil.copy(os.path.join(PROJECT_DIR, 'repair_service.db'), folder)
+    previous = os.getcwd()
+    # main открывает repair_service.db в текущей папке при импорте
+    os.chdir(folder)
+    try:
+        import main
+        with TestClient(main.app) as client:
+            yield client
+    finally:
+        os.chdir(previous)
+
+
+def login(api, user_login: str, password: str) -> dict:
+    """Заголовок авторизации пользователя"""
+    response = api.post('/auth/login', json={'login': user_login, 'password': password})
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope='session')
+def manager(api):
+    return login(api, 'kasoo', 'root')
+
+
+@pytest.fixture(scope='session')
+def master(api):
+    return login(api, 'login1', 'pass1')
@@ -0,0 +1,24 @@
+def _create(api, manager, master_id=None):
+    response = api.post('/requests/', headers=manager,
+                        json={'home_tech_type': 'Фен', 'home_tech_model': 'Проверка', 'problem_description': 'Не включается',
+                              'client_id': 7, 'master_id': master_id})
+    assert response.status_code == 201
+    return response.json()['request_id']
+
+
+def _master_of(api, manager, request_id):
+    return api.get(f'/requests/{request_id}', headers=manager).json()['master_id']
+
+
+def test_rebalance_keeps_manual_assignments(api, manager):
+    manual = _create(api, manager, master_id=6)
+    unassigned = _create(api, manager)
+
+    response = api.post('/assignment/rebalance', headers=manager)
+    assert response.status_code == 200
+    changed = {item['request_id'] for item in response.json()['assignments']}
+
+    assert manual not in changed
+    assert _master_of(api, manager, manual) == 6
+    assert unassigned in changed
+    assert _master_of(api, manager, unassigned) is not None
@@ -0,0 +1,28 @@
+def test_since_accepts_created_at_returned_by_api(api, master):
+    created = api.post('/comments/', headers=master,
+                       json={'message': 'Проверка курсора', 'master_id': 6, 'request_id': 1})
+    assert created.status_code == 201
+    comment = created.json()
+
+    # Курсор "сразу перед" созданным комментарием из значения created_at, которое вернул API
+    response = api.get(f"/comments/1?since={comment['created_at']}|{comment['comment_id'] - 1}", headers=master)
+    assert response.status_code == 200
+    assert [c['comment_id'] for c in response.json()] == [comment['comment_id']]
+
+
+def test_since_timestamp_formats_are_equivalent(api, master):
+    comments = api.get('/comments/1?limit=500', headers=master).json()
+    oldest = comments[-1]['created_at']
+    # Момент времени без comment_id включает комментарии той же секунды
+    expected = [c['comment_id'] for c in comments if c['created_at'] >= oldest]
+
+    for since in (oldest, oldest.replace('T', ' '), oldest.replace(' ', 'T')):
+        response = api.get('/comments/1', params={'since': since, 'limit': 500}, headers=master)
+        assert response.status_code == 200
+        assert [c['comment_id'] for c in response.json()] == expected
+
+
+def test_invalid_cursor_is_rejected(api, master):
+    assert api.get('/comments/1?before=garbage', headers=master).status_code == 400
+    assert api.get('/comments/1?since=2025-13-01', headers=master).status_code == 400
+    assert api.get('/comments/1?before=2025-01-01|x', headers=master).status_code == 400
@@ -0,0 +1,24 @@
+import pytest
+
+import fast_json
+
+ENDPOINTS = [
+    '/requests/',
+    '/requests/?limit=3&fields=request_id,start_date,deadline',
+    '/requests/bulk?ids=1,2,3',
+    '/comments/1',
+    '/comments/bulk?request_ids=1,2',
+    '/users/',
+]
+
+
+@pytest.mark.parametrize('url', ENDPOINTS)
+def test_trusted_rows_match_validated_response(api, manager, monkeypatch, url):
+    # Ответ без проверки строк должен совпадать с ответом, прошедшим модели, байт в байт
+    fast = api.get(url, headers=manager)
+    monkeypatch.setattr(fast_json, 'VALIDATE_RESPONSES', True)
+    validated = api.get(url, headers=manager)
+
+    assert fast.status_code == validated.status_code == 200
+    assert fast.json()
+    assert fast.content == validated.content
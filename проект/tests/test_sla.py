@@ -0,0 +1,38 @@
+import sqlite3
+
+import migrations
+
+
+def _deadlines(conn):
+    return dict(conn.execute("SELECT request_id, deadline FROM requests ORDER BY request_id"))
+
+
+def test_rule_change_recomputes_open_deadlines(tmp_path):
+    db_name = str(tmp_path / 'sla.db')
+    migrations.migrate(db_name)
+    conn = sqlite3.connect(db_name)
+    conn.execute("INSERT INTO users (fio, phone, login, password, type) VALUES ('К', '1', 'k', 'p', 'Заказчик')")
+    conn.executemany(
+        "INSERT INTO requests (start_date, home_tech_type, home_tech_model, problem_description, "
+        "request_status, client_id) VALUES ('2025-01-01', ?, 'м', 'п', ?, 1)",
+        [('Фен', 'Новая заявка'), ('Фен', 'Готова к выдаче'), ('Утюг', 'Новая заявка')]
+    )
+    conn.commit()
+    assert _deadlines(conn) == {1: '2025-01-04', 2: '2025-01-04', 3: '2025-01-15'}
+
+    # Правило вида техники: пересчитываются только открытые заявки этого вида
+    conn.execute("UPDATE sla_rules SET days = 7 WHERE home_tech_type = 'Фен'")
+    assert _deadlines(conn) == {1: '2025-01-08', 2: '2025-01-04', 3: '2025-01-15'}
+
+    # Новое правило для вида без своего срока
+    conn.execute("INSERT INTO sla_rules (home_tech_type, days) VALUES ('Утюг', 2)")
+    assert _deadlines(conn)[3] == '2025-01-03'
+
+    # Удаление правила - возврат к сроку по умолчанию ('*')
+    conn.execute("DELETE FROM sla_rules WHERE home_tech_type = 'Утюг'")
+    assert _deadlines(conn)[3] == '2025-01-15'
+
+    # Срок по умолчанию
+    conn.execute("UPDATE sla_rules SET days = 20 WHERE home_tech_type = '*'")
+    assert _deadlines(conn) == {1: '2025-01-08', 2: '2025-01-04', 3: '2025-01-21'}
+    conn.close()
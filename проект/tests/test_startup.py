@@ -0,0 +1,14 @@
+import tempfile
+
+from bench_startup import FORBIDDEN_MODULES, IMPORT_BUDGET_MS, import_main, main_import_ms
+
+
+def test_main_import_within_budget_without_heavy_modules():
+    # Первый импорт создает схему в пустой папке, замеряется импорт с актуальной схемой
+    with tempfile.TemporaryDirectory() as folder:
+        import_main(folder)
+        modules = min((import_main(folder) for _ in range(3)), key=main_import_ms)
+
+    loaded = {name.split('.')[0] for name, _, _ in modules}
+    assert not loaded & set(FORBIDDEN_MODULES)
+    assert main_import_ms(modules) <= IMPORT_BUDGET_MS
@@ -0,0 +1,27 @@
+from importers import TABLE_SPECS
+from validation import validate_batch
+
+USERS = TABLE_SPECS['users']
+HEADER = ['userID', 'fio', 'phone', 'login', 'password', 'type']
+
+
+def user_row(user_id, login):
+    return (str(user_id), f"Пользователь {user_id}", '89990000000', login, 'pass', 'Заказчик')
+
+
+def test_repeated_row_keeps_last_copy():
+    rows = [user_row(10, 'login10'), user_row(11, 'login11'), user_row(11, 'login11')]
+    records, rejected = validate_batch(USERS, HEADER, rows, 2, {}, {'login': {}})
+
+    assert [record[0] for record in records] == [10, 11]
+    assert list(rejected['line']) == [3]
+    assert 'повтор user_id' in rejected['reason'].iloc[0]
+
+
+def test_repeated_login_with_different_keys_rejects_later_row():
+    rows = [user_row(10, 'same'), user_row(11, 'same')]
+    records, rejected = validate_batch(USERS, HEADER, rows, 2, {}, {'login': {}})
+
+    assert [record[0] for record in records] == [10]
+    assert list(rejected['line']) == [3]
+    assert 'повтор login' in rejected['reason'].iloc[0]
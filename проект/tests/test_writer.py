@@ -0,0 +1,25 @@
+import sqlite3
+
+import pytest
+
+from writer import WriteQueue
+
+
+def test_connection_setup_failure_fails_operation_and_restarts(tmp_path):
+    attempts = []
+
+    def on_connect(conn):
+        attempts.append(conn)
+        if len(attempts) == 1:
+            raise sqlite3.OperationalError("ошибка настройки соединения")
+
+    writer = WriteQueue(str(tmp_path / 'writer.db'), on_connect=on_connect)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            writer.submit(lambda cursor: cursor.execute("CREATE TABLE items (value)")).result(timeout=5)
+
+        # Следующая операция запускает новый поток записи
+        writer.submit(lambda cursor: cursor.execute("CREATE TABLE items (value)")).result(timeout=5)
+        assert len(attempts) == 2
+    finally:
+        writer.close()
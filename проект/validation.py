@@ -0,0 +1,116 @@
+"""
+Векторная проверка порций импорта до записи в БД: типы, даты, допустимые
+значения, внешние ключи и уникальность. Отклоненные строки с причинами
+сохраняются в отдельный CSV рядом с исходным файлом.
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Значения, означающие пустое поле
+NULL_VALUES = ['', 'null', 'none', 'nan', '<na>']
+
+
+def rejected_path(source_path: str) -> str:
+    """Файл отклоненных строк: inputDataRequests.csv -> inputDataRequests.rejected.csv"""
+    return os.path.splitext(source_path)[0] + '.rejected.csv'
+
+
+def _frame(header: List[str], rows: List[tuple]) -> pd.DataFrame:
+    """Порция строк файла как DataFrame со строковыми колонками"""
+    width = len(header)
+    # Строки CSV могут быть длиннее заголовка - лишние поля отбрасываются
+    rows = [row[:width] for row in rows]
+    frame = pd.DataFrame.from_records(rows, columns=header, coerce_float=False)
+    return frame.astype('string')
+
+
+def validate_batch(spec: Dict, header: List[str], rows: List[tuple], first_line: int,
+                   references: Dict, unique: Dict) -> Tuple[List[tuple], pd.DataFrame]:
+    """Проверка и приведение порции к колонкам БД
+
+    references: колонка -> множество существующих ключей связанной таблицы,
+    unique: колонка -> словарь "значение -> ключ строки" для уже записанных данных.
+    Возвращает строки для записи (кортежи в порядке колонок спецификации) и
+    DataFrame отклоненных строк с колонками line и reason.
+    """
+    header = [str(name).strip() for name in header]
+    positions = {name.lower(): name for name in header}
+    missing = [file_header for file_header, _, _, required in spec['columns']
+               if required and file_header.lower() not in positions]
+    if missing:
+        raise ValueError(f"В файле нет колонок: {', '.join(missing)}")
+
+    frame = _frame(header, rows)
+    reasons = pd.Series('', index=frame.index, dtype=object)
+
+    def reject(mask, message):
+        mask = np.asarray(mask, dtype=bool)
+        if mask.any():
+            reasons[mask] += message + '; '
+
+    values = {}
+    for file_header, column, kind, required in spec['columns']:
+        source = positions.get(file_header.lower())
+        if source is None:
+            values[column] = pd.Series(pd.NA, index=frame.index, dtype='string')
+            continue
+
+        text = frame[source].str.strip()
+        is_null = (text.isna() | text.str.lower().isin(NULL_VALUES)).fillna(True).to_numpy()
+        text = text.mask(is_null)
+        if required:
+            reject(is_null, f"пустое поле {column}")
+
+        if kind == 'int':
+            numbers = pd.to_numeric(text, errors='coerce')
+            bad = ~is_null & (numbers.isna() | (numbers % 1 != 0)).to_numpy()
+            reject(bad, f"некорректное число {column}")
+            values[column] = numbers.mask(bad).astype('Int64')
+        elif kind == 'date':
+            # XLSX отдает datetime ("2023-06-06 00:00:00") - берется только дата
+            dates = pd.to_datetime(text.str.slice(0, 10), format='%Y-%m-%d', errors='coerce')
+            bad = ~is_null & dates.isna().to_numpy()
+            reject(bad, f"некорректная дата {column}")
+            values[column] = dates.dt.strftime('%Y-%m-%d').astype('string')
+        else:
+            values[column] = text
+
+        choices = spec.get('choices', {}).get(column)
+        if choices is not None:
+            reject(values[column].notna() & ~values[column].isin(choices),
+                   f"недопустимое значение {column}")
+
+    for column, keys in references.items():
+        column_values = values[column]
+        reject(column_values.notna() & ~column_values.isin(keys),
+               f"{column} ссылается на несуществующую запись")
+
+    key = values[spec['key']]
+    superseded = (key.duplicated(keep='last') & key.notna()).to_numpy()
+    reject(superseded, f"повтор {spec['key']} в файле (используется последняя строка)")
+    for column, owners in unique.items():
+        column_values = values[column]
+        owner = column_values.map(owners)
+        reject(owner.notna() & (owner != key).fillna(True), f"{column} уже занят другой записью")
+        # Среди строк, оставшихся после повторов ключа, первая со значением принимается, следующие - нет
+        candidates = column_values.mask(superseded)
+        reject(candidates.duplicated(keep='first') & candidates.notna(), f"повтор {column} в файле")
+
+    valid = (reasons == '').to_numpy()
+    result = pd.DataFrame({column: series[valid] for column, series in values.items()})
+    records = list(result.astype(object).where(result.notna(), None).itertuples(index=False, name=None))
+
+    rejected = frame[~valid].copy()
+    rejected.insert(0, 'line', np.arange(first_line, first_line + len(frame))[~valid])
+    rejected['reason'] = reasons[~valid].str.rstrip('; ')
+    return records, rejected
+
+
+def write_rejected(rejected: pd.DataFrame, path: str, append: bool):
+    """Дозапись отклоненных строк в CSV (формат разделителей как во входных файлах)"""
+    rejected.to_csv(path, sep=';', index=False, mode='a' if append else 'w',
+                    header=not append, encoding='utf-8')
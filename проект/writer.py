@@ -0,0 +1,150 @@
+"""
+Единственный поток записи в SQLite с групповой фиксацией транзакций
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+# Окно накопления операций перед фиксацией (мс); 0 - брать только то, что уже в очереди
+GROUP_COMMIT_WINDOW_MS = float(os.environ.get('REPAIR_GROUP_COMMIT_WINDOW_MS', 2))
+# Максимум операций в одной транзакции
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get('REPAIR_GROUP_COMMIT_MAX_BATCH', 256))
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Очередь операций записи, выполняемых одним потоком
+
+    Операция - функция operation(cursor, *args). Операции, пришедшие в пределах
+    окна, выполняются в одной транзакции (каждая в своей точке сохранения), а
+    результат каждой возвращается через собственный Future после COMMIT.
+    """
+
+    def __init__(self, db_name: str, window_ms: float = GROUP_COMMIT_WINDOW_MS,
+                 max_batch: int = GROUP_COMMIT_MAX_BATCH, on_connect=None):
+        self.db_name = db_name
+        # Настройка соединения потока записи (например, ATTACH архива)
+        self.on_connect = on_connect
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, operation, *args) -> Future:
+        """Постановка операции в очередь записи"""
+        future = Future()
+        # Под блокировкой: операция не попадет в очередь потока, который уже завершается с ошибкой
+        with self._lock:
+            self._ensure_started()
+            self._queue.put((operation, args, future))
+        return future
+
+    def execute(self, operation, *args):
+        """Выполнение операции записи с ожиданием результата"""
+        return self.submit(operation, *args).result()
+
+    def close(self):
+        """Остановка потока записи после выполнения уже поставленных операций"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self):
+        # Вызывается под self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        conn = None
+        try:
+            # isolation_level=None: транзакциями управляем сами (BEGIN IMMEDIATE ... COMMIT)
+            conn = sqlite3.connect(self.db_name, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout = 5000")
+            if self.on_connect is not None:
+                self.on_connect(conn)
+
+            stop = False
+            while not stop:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+
+                batch = [item]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    try:
+                        timeout = deadline - time.monotonic()
+                        item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+
+                self._commit_batch(conn, batch)
+        except Exception as e:
+            self._fail_pending(e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _fail_pending(self, error: Exception):
+        """Аварийное завершение потока: ошибка всем ожидающим операциям, следующая запустит новый поток"""
+        with self._lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
+            elif self._thread is not None:
+                # Очередь уже обслуживает новый поток
+                return
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP and item[2].set_running_or_notify_cancel():
+                    item[2].set_exception(error)
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list):
+        """Выполнение группы операций в одной транзакции"""
+        outcomes = []
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for operation, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                # Ошибка одной операции откатывает только ее точку сохранения
+                cursor.execute("SAVEPOINT operation")
+                try:
+                    result = operation(cursor, *args)
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO operation")
+                    cursor.execute("RELEASE operation")
+                    outcomes.append((future, None, e))
+                else:
+                    cursor.execute("RELEASE operation")
+                    outcomes.append((future, result, None))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)